@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Stress benchmark for concurrent bookmark writers.
+
+Runs several processes that each add and delete their own bookmarks in a
+shared ~/.markrc (in a temporary HOME) at the same time, then checks the
+result against what every worker expects to have survived.
+
+    python bench_concurrency.py --workers 8 --ops 200
+    python bench_concurrency.py --backend journal
+    python bench_concurrency.py --no-lock      # show what the lock prevents
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker(worker_id, ops, target, use_lock, start):
+    """Add `ops` bookmarks, deleting every other one right after adding it."""
+    from dirmarks import locking
+    from dirmarks.marks_enhanced import Marks
+
+    if not use_lock:
+        locking.fcntl = None
+    marks = Marks()
+    start.wait()
+    for i in range(ops):
+        key = f"w{worker_id}-{i}"
+        marks.add_mark(key, target)
+        if i % 2:
+            marks.del_mark(key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=100, help='adds per worker')
+    parser.add_argument('--backend', default='text', choices=('text', 'journal', 'sqlite'))
+    parser.add_argument('--no-lock', action='store_true', help='disable the write lock')
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix='dirmarks-bench-')
+    os.environ.update({'HOME': home, 'DIRMARKS_BACKEND': args.backend,
+                       'XDG_CACHE_HOME': os.path.join(home, '.cache'),
+                       'XDG_RUNTIME_DIR': home})
+    try:
+        ctx = multiprocessing.get_context('fork')
+        start = ctx.Event()
+        procs = [ctx.Process(target=worker, args=(w, args.ops, home, not args.no_lock, start))
+                 for w in range(args.workers)]
+        for proc in procs:
+            proc.start()
+        began = time.perf_counter()
+        start.set()
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - began
+
+        from dirmarks.marks_enhanced import Marks
+        present = set(Marks().marks)
+        expected = {f"w{w}-{i}" for w in range(args.workers) for i in range(0, args.ops, 2)}
+        mutations = args.workers * (args.ops + args.ops // 2)
+        print(f"backend={args.backend} lock={'off' if args.no_lock else 'on'} "
+              f"workers={args.workers} mutations={mutations}")
+        print(f"elapsed {elapsed:.2f}s, {mutations / elapsed:.0f} mutations/s")
+        print(f"lost updates: {len(expected - present)} missing, "
+              f"{len(present - expected)} resurrected")
+    finally:
+        shutil.rmtree(home)
+
+
+if __name__ == '__main__':
+    main()
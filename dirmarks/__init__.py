@@ -1,2 +1,6 @@
-from importlib.resources import files
-DATA_PATH = str(files("dirmarks") / "data")
+def __getattr__(name):
+    # Resolved on first access: importlib.resources is too slow to pay for on every `dir <name>`
+    if name == "DATA_PATH":
+        from importlib.resources import files
+        return str(files("dirmarks") / "data")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Resident bookmark daemon for dirmarks.
+Keeps a parsed MarksEnhanced instance in memory and answers lookups over a
+per-user Unix socket, so the shell function does not have to start Python
+for every `dir <name>`.
+
+Protocol: the client sends one request line with tab-separated fields and
+reads the reply until the server closes the connection. Every reply line
+starts with '+' (success, followed by the payload) or '-' (failure,
+followed by an error message).
+
+    get <name>                             -> +<path>
+    get <word> [<word>...]                 -> +<path> of the best multi-token match
+    list                                   -> +<index> => <key>:<path> (one line per mark)
+    add <name> <abs-path> [<category> [<tags>]]
+    del <name>
+    ping                                   -> +pong
+    quit                                   -> +bye, then the daemon exits
+"""
+
+import os
+import sys
+import socket
+import socketserver
+import threading
+from typing import List, Optional
+
+from dirmarks import typos, usage
+from dirmarks.locking import UnsafeDirectory, private_dir, runtime_dir
+from dirmarks.marks_enhanced import Marks, MarksEnhanced
+
+
+def socket_path() -> str:
+    """Return the per-user socket path ($DIRMARKS_SOCKET or $XDG_RUNTIME_DIR/dirmarks.sock)."""
+    if os.environ.get('DIRMARKS_SOCKET'):
+        return os.environ['DIRMARKS_SOCKET']
+    return os.path.join(runtime_dir(), 'dirmarks.sock')
+
+
+class MarksDaemon:
+    """Holds the resident bookmark state and executes protocol requests."""
+
+    def __init__(self, marks: Optional[MarksEnhanced] = None):
+        """Initialize the daemon with an existing Marks instance or a fresh one."""
+        self.marks = marks if marks is not None else Marks()
+        self.lock = threading.Lock()
+
+    def maybe_reload(self):
+        """Pick up changes to the bookmark files made since the last request."""
+        self.marks.refresh()
+
+    def dispatch(self, fields: List[str]) -> List[str]:
+        """Execute one request and return the reply lines."""
+        if not fields or not fields[0]:
+            return ['-Empty request']
+
+        command, args = fields[0], fields[1:]
+        with self.lock:
+            self.maybe_reload()
+
+            if command == 'get' and args:
+                path = self.marks.get_mark(args[0]) if len(args) == 1 else None
+                key = self.marks.bookmark_key(args[0]) if path else None
+                if not path:
+                    found = self.marks.matches(args)
+                    key, path = (found[0]['name'], found[0]['path']) if found else (None, None)
+                suggestions = self.marks.suggest(args[0]) if not path and len(args) == 1 else []
+                if len(suggestions) == 1 and typos.enabled_autocorrect():
+                    key, path = suggestions[0], self.marks.get_mark(suggestions[0])
+                if not path:
+                    return [f"-Bookmark not found.{typos.hint(suggestions)}"]
+                usage.record(self.marks.rc, key)
+                return [f"+{path}"]
+
+            if command == 'list' and not args:
+                return [f"+{i} => {mark}" for i, mark in enumerate(self.marks.list)]
+
+            if command == 'add' and 2 <= len(args) <= 4:
+                key, path = args[0], args[1]
+                if not os.path.isabs(path):
+                    return ['-Path must be absolute']
+                category = args[2] if len(args) > 2 and args[2] else None
+                tags = args[3].split(',') if len(args) > 3 and args[3] else []
+                if category and not self.marks.is_valid_category(category):
+                    return [f"-Invalid category name: {category}"]
+                if not self.marks.add_mark_with_metadata(key, path, category=category, tags=tags):
+                    return ['-Failed to add bookmark']
+                return ['+']
+
+            if command == 'del' and len(args) == 1:
+                if not self.marks.del_mark(args[0]):
+                    return ['-Bookmark not found']
+                return ['+']
+
+            if command == 'ping' and not args:
+                return ['+pong']
+
+        return [f"-Unknown request: {command}"]
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one request line and writes the reply."""
+
+    def handle(self):
+        line = self.rfile.readline().decode('utf-8', 'replace').rstrip('\r\n')
+        fields = line.split('\t')
+        if fields == ['quit']:
+            self.wfile.write(b'+bye\n')
+            # shutdown() blocks until serve_forever returns, so hand it off
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        reply = self.server.marks_daemon.dispatch(fields)
+        self.wfile.write(''.join(f"{r}\n" for r in reply).encode('utf-8'))
+
+
+class _UnixServer(socketserver.UnixStreamServer):
+    """Unix stream server carrying a reference to the MarksDaemon."""
+
+    def __init__(self, path: str, marks_daemon: MarksDaemon):
+        self.marks_daemon = marks_daemon
+        super().__init__(path, _RequestHandler)
+
+
+def _prepare_socket(path: str) -> bool:
+    """Create the socket directory and remove a stale socket. Returns False if a daemon is running.
+    
+    The directory must be private to the user (see locking.private_dir);
+    UnsafeDirectory is raised otherwise.
+    """
+    private_dir(os.path.dirname(path))
+    if os.path.lexists(path):
+        if is_running(path):
+            return False
+        os.unlink(path)
+    return True
+
+
+def serve(path: Optional[str] = None, marks: Optional[MarksEnhanced] = None) -> bool:
+    """Run the daemon in the foreground until a quit request arrives."""
+    path = path or socket_path()
+    try:
+        ready = _prepare_socket(path)
+    except UnsafeDirectory as error:
+        sys.stderr.write(f"Not starting the dirmarks daemon: {error}\n")
+        return False
+    if not ready:
+        sys.stderr.write(f"dirmarks daemon already running on {path}\n")
+        return False
+
+    old_umask = os.umask(0o077)
+    try:
+        server = _UnixServer(path, MarksDaemon(marks))
+    finally:
+        os.umask(old_umask)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return True
+
+
+def start(path: Optional[str] = None) -> bool:
+    """Start the daemon in the background (double fork, detached from the terminal)."""
+    path = path or socket_path()
+    if is_running(path):
+        return True
+
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return True
+
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.chdir('/')
+    try:
+        serve(path)
+    finally:
+        os._exit(0)
+
+
+def request(fields: List[str], path: Optional[str] = None, timeout: float = 2.0) -> Optional[List[str]]:
+    """Send one request to the daemon. Returns the reply lines, or None if it is not reachable."""
+    path = path or socket_path()
+    try:
+        # A socket someone else created is not our daemon
+        if os.stat(path).st_uid != os.getuid():
+            return None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(('\t'.join(fields) + '\n').encode('utf-8'))
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except OSError:
+        return None
+    return b''.join(chunks).decode('utf-8', 'replace').splitlines()
+
+
+def is_running(path: Optional[str] = None) -> bool:
+    """Check whether a daemon answers on the socket."""
+    return request(['ping'], path, timeout=0.5) == ['+pong']
+
+
+def stop(path: Optional[str] = None) -> bool:
+    """Ask a running daemon to exit."""
+    return request(['quit'], path) == ['+bye']
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cached subdirectory listings for completing `name/sub/path`.
+
+Completing `dir proj/src/<Tab>` lists the subdirectories of the bookmark's
+src directory. On network filesystems a listing costs a round trip per
+entry whose type is not reported by readdir, so listings are kept in
+$XDG_CACHE_HOME/dirmarks/subdirs keyed by directory and reused while the
+directory's (inode, mtime_ns) is unchanged: a Tab press then costs a single
+stat. Directories modified within the racy window are listed but not
+cached, as entries created in the same mtime tick would go unnoticed.
+"""
+
+import os
+import time
+import marshal
+from typing import Dict, List, Optional, Tuple
+
+from dirmarks import snapshot
+from dirmarks.fileutil import atomic_write
+
+# Bump when the layout of the cache file changes
+CACHE_VERSION = 1
+
+# Directories remembered; the least recently listed are dropped first
+MAX_ENTRIES = 512
+
+# (cache file, directory -> ((inode, mtime_ns), names)) as loaded by this process
+_loaded: Optional[Tuple[str, Dict[str, Tuple[Tuple[int, int], List[str]]]]] = None
+
+
+def cache_file() -> str:
+    """Path of the listing cache."""
+    return os.path.join(snapshot.cache_dir(), 'subdirs')
+
+
+def _load() -> Dict[str, Tuple[Tuple[int, int], List[str]]]:
+    global _loaded
+    path = cache_file()
+    if _loaded is None or _loaded[0] != path:
+        entries = {}
+        try:
+            with open(path, 'rb') as file:
+                version, stored = marshal.loads(file.read())
+            if version == CACHE_VERSION and isinstance(stored, dict):
+                entries = stored
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        _loaded = (path, entries)
+    return _loaded[1]
+
+
+def _save(entries):
+    try:
+        os.makedirs(snapshot.cache_dir(), mode=0o700, exist_ok=True)
+        atomic_write(cache_file(), marshal.dumps((CACHE_VERSION, entries)), mode=0o600)
+    except (OSError, ValueError):
+        pass
+
+
+def subdirs(path: str) -> List[str]:
+    """Sorted names of the subdirectories of path (following symlinks)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return []
+    stamp = (st.st_ino, st.st_mtime_ns)
+    entries = _load() if snapshot.enabled() else {}
+    cached = entries.get(path)
+    if cached is not None and tuple(cached[0]) == stamp:
+        return list(cached[1])
+
+    names = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    names.sort()
+
+    if snapshot.enabled() and time.time_ns() - st.st_mtime_ns >= snapshot.RACY_WINDOW_NS:
+        entries.pop(path, None)
+        entries[path] = (stamp, names)
+        while len(entries) > MAX_ENTRIES:
+            del entries[next(iter(entries))]
+        _save(entries)
+    return names
+
+
+def complete_subpath(name: str, base: str, rest: str) -> List[str]:
+    """Completions of `name/rest` where name is a bookmark resolving to base.
+
+    Each completion names a directory and ends in '/'. Hidden directories
+    are offered only when the last component typed starts with a dot.
+    """
+    head, sep, partial = rest.rpartition('/')
+    directory = os.path.join(base, head) if sep else base
+    prefix = f"{name}/{head}{sep}"
+    show_hidden = partial.startswith('.')
+    return [f"{prefix}{sub}/" for sub in subdirs(directory)
+            if sub.startswith(partial) and (show_hidden or not sub.startswith('.'))]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Small file helpers shared by the bookmark store and its derived caches.
+"""
+
+import os
+from typing import Optional, Tuple, Union
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """Return (inode, size, mtime_ns) of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def join_subpath(base: str, rest: str) -> str:
+    """Resolve the `sub/dir` part of a `name/sub/dir` lookup against the bookmark's path."""
+    return os.path.normpath(os.path.join(base, rest))
+
+
+def resolve_symlinks(path: str) -> str:
+    """Follow symlinks so that replacing a dotfile-managed ~/.markrc keeps the link intact."""
+    for _ in range(40):
+        if not os.path.islink(path):
+            break
+        target = os.readlink(path)
+        if not os.path.isabs(target):
+            target = os.path.join(os.path.dirname(path), target)
+        path = target
+    return path
+
+
+def atomic_write(path: str, data: Union[str, bytes], mode: int = 0o644):
+    """Write data to path via a temporary file and os.replace.
+
+    Readers see either the old or the new content, never a partial file.
+    The permissions of an existing target are preserved.
+    """
+    import tempfile
+
+    path = resolve_symlinks(path)
+    directory = os.path.dirname(path) or '.'
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        pass
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data.encode('utf-8') if isinstance(data, str) else data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
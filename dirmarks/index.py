@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped lookup index for bookmark paths.
+Lets `dirmarks --get` and the bare-name lookup answer in constant time,
+and `dirmarks --complete` list keys by prefix in logarithmic time,
+without reading or parsing the markrc files.
+
+Layout (little-endian):
+
+    header   magic 'DMIX', version, slot count, list length, key count,
+             (present, inode, size, mtime_ns) of every source file,
+             CRC32 of all preceding header bytes
+    slots    slot count x (crc32 of key, record offset + 1); 0 marks an empty slot
+    list     list length x record offset, for numeric lookups (records carry the key)
+    sorted   key count x record offset, in key order, for prefix lookups
+    records  (crc32 of key+path, key length, path length, key, path)
+
+Keys are placed with open addressing and linear probing into a power-of-two
+table kept at most half full. The index is trusted only if the header CRC
+is intact and the stored source stamps equal the current ones, and every
+record read is checked against its own CRC.
+"""
+
+import os
+import mmap
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from dirmarks.fileutil import atomic_write, file_stamp, join_subpath
+
+MAGIC = b'DMIX'
+VERSION = 3
+
+_HEAD = struct.Struct('<4sHHIII')       # magic, version, source count, slots, list length, keys
+_STAMP = struct.Struct('<BQQq')          # present, inode, size, mtime_ns
+_CRC = struct.Struct('<I')
+_SLOT = struct.Struct('<II')             # key hash, record offset + 1
+_OFFSET = struct.Struct('<I')
+_RECORD = struct.Struct('<III')          # crc, key length, path length
+
+
+class IndexCorrupt(ValueError):
+    """Raised when a record does not match its checksum."""
+
+
+def _header(stamps: tuple, nslots: int, nlist: int, nkeys: int = 0) -> bytes:
+    """Pack the header for the given source stamps and table sizes."""
+    parts = [_HEAD.pack(MAGIC, VERSION, len(stamps), nslots, nlist, nkeys)]
+    for stamp in stamps:
+        parts.append(_STAMP.pack(1, *stamp) if stamp is not None else _STAMP.pack(0, 0, 0, 0))
+    head = b''.join(parts)
+    return head + _CRC.pack(zlib.crc32(head))
+
+
+def build(stamps: tuple, marks: Dict[str, str], list_paths: List[str],
+          list_keys: Optional[List[str]] = None) -> bytes:
+    """Serialize an index for key -> path, position -> (key, path) and prefix lookups."""
+    nslots = 8
+    while nslots < 2 * len(marks):
+        nslots *= 2
+    nlist = len(list_paths)
+    nkeys = len(marks)
+    header = _header(stamps, nslots, nlist, nkeys)
+    records_start = len(header) + nslots * _SLOT.size + (nlist + nkeys) * _OFFSET.size
+
+    records = bytearray()
+
+    def add_record(key: bytes, path: bytes) -> int:
+        offset = records_start + len(records)
+        records.extend(_RECORD.pack(zlib.crc32(key + path), len(key), len(path)))
+        records.extend(key)
+        records.extend(path)
+        return offset
+
+    slots = bytearray(nslots * _SLOT.size)
+    mask = nslots - 1
+    key_offsets = {}
+    for key, path in marks.items():
+        key_bytes = key.encode('utf-8')
+        offset = key_offsets[key] = add_record(key_bytes, path.encode('utf-8'))
+        h = zlib.crc32(key_bytes)
+        i = h & mask
+        while _SLOT.unpack_from(slots, i * _SLOT.size)[1]:
+            i = (i + 1) & mask
+        _SLOT.pack_into(slots, i * _SLOT.size, h, offset + 1)
+
+    offsets = bytearray()
+    for i, path in enumerate(list_paths):
+        key = list_keys[i] if list_keys else ''
+        offsets.extend(_OFFSET.pack(add_record(key.encode('utf-8'), path.encode('utf-8'))))
+    for key in sorted(key_offsets):
+        offsets.extend(_OFFSET.pack(key_offsets[key]))
+
+    return header + bytes(slots) + bytes(offsets) + bytes(records)
+
+
+def write(path: str, stamps: tuple, marks: Dict[str, str], list_paths: List[str],
+          list_keys: Optional[List[str]] = None) -> bool:
+    """Build the index and replace the file at path atomically."""
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        atomic_write(path, build(stamps, marks, list_paths, list_keys), mode=0o600)
+        return True
+    except OSError:
+        return False
+
+
+class MarksIndex:
+    """Read-only view of an index file."""
+
+    def __init__(self, buffer, nslots: int, nlist: int, slots_offset: int, nkeys: int = 0):
+        self.buffer = buffer
+        self.nslots = nslots
+        self.nlist = nlist
+        self.nkeys = nkeys
+        self.slots_offset = slots_offset
+        self.list_offset = slots_offset + nslots * _SLOT.size
+        self.sorted_offset = self.list_offset + nlist * _OFFSET.size
+
+    @classmethod
+    def open(cls, path: str, source_files: List[str]) -> Optional['MarksIndex']:
+        """Map the index at path, or return None if it is missing, damaged or stale."""
+        try:
+            with open(path, 'rb') as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, version, nsources, nslots, nlist, nkeys = _HEAD.unpack_from(buffer, 0)
+            if magic != MAGIC or version != VERSION or nsources != len(source_files):
+                return None
+            head_size = _HEAD.size + nsources * _STAMP.size
+            if _CRC.unpack_from(buffer, head_size)[0] != zlib.crc32(buffer[:head_size]):
+                return None
+            stamps = tuple(file_stamp(p) for p in source_files)
+            if buffer[_HEAD.size:head_size] != _header(stamps, nslots, nlist)[_HEAD.size:head_size]:
+                return None
+        except struct.error:
+            return None
+
+        return cls(buffer, nslots, nlist, head_size + _CRC.size, nkeys)
+
+    def _record(self, offset: int):
+        """Return (key, path) stored at offset, verifying its checksum."""
+        try:
+            crc, key_len, path_len = _RECORD.unpack_from(self.buffer, offset)
+        except struct.error:
+            raise IndexCorrupt(offset)
+        start = offset + _RECORD.size
+        data = self.buffer[start:start + key_len + path_len]
+        if len(data) != key_len + path_len or zlib.crc32(data) != crc:
+            raise IndexCorrupt(offset)
+        return data[:key_len].decode('utf-8'), data[key_len:].decode('utf-8')
+
+    def get(self, key: str) -> Optional[str]:
+        """Resolve a key or numeric index like MarksEnhanced.get_mark."""
+        found = self.lookup(key)
+        return found[1] if found is not None else None
+
+    def lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        """(key of the bookmark, path) for a key, numeric index or name/sub/dir.
+
+        The key is that of the bookmark the lookup went through, as with
+        MarksEnhanced.bookmark_key.
+        """
+        key_bytes = key.encode('utf-8')
+        h = zlib.crc32(key_bytes)
+        mask = self.nslots - 1
+        i = h & mask
+        for _ in range(self.nslots):
+            slot_hash, offset = _SLOT.unpack_from(self.buffer, self.slots_offset + i * _SLOT.size)
+            if not offset:
+                break
+            if slot_hash == h:
+                stored_key, path = self._record(offset - 1)
+                if stored_key == key:
+                    return stored_key, path
+            i = (i + 1) & mask
+
+        if key.isdigit():
+            idx = int(key)
+            if idx < self.nlist:
+                offset = _OFFSET.unpack_from(self.buffer, self.list_offset + idx * _OFFSET.size)[0]
+                return self._record(offset)
+        name, sep, rest = key.partition('/')
+        if sep and name:
+            base = self.lookup(name)
+            if base is not None:
+                return base[0], join_subpath(base[1], rest)
+        return None
+
+    def _sorted_key(self, i: int) -> str:
+        offset = _OFFSET.unpack_from(self.buffer, self.sorted_offset + i * _OFFSET.size)[0]
+        return self._record(offset)[0]
+
+    def complete(self, prefix: str) -> List[str]:
+        """Keys starting with prefix, sorted, found by binary search."""
+        lo, hi = 0, self.nkeys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._sorted_key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        keys = []
+        for i in range(lo, self.nkeys):
+            key = self._sorted_key(i)
+            if not key.startswith(prefix):
+                break
+            keys.append(key)
+        return keys
+
+    def close(self):
+        """Unmap the index."""
+        self.buffer.close()
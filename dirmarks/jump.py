@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Multi-token jumps: `dir proj api` goes to the best bookmark matching all words.
+
+As in zoxide, the tokens must occur in order, case-insensitively, in the
+bookmark's path, and the last token must fall in its last component, so
+`proj api` finds /srv/projects/api but not /srv/api/projects. The tokens
+may also occur in order in the key. Matches are ranked by quality first
+(key matches before path matches, whole or leading components before
+infixes) and then by frecency, shorter paths breaking the remaining ties.
+
+Matching runs over the lowercased (key, path) table that MetadataIndex
+keeps current, so a jump is a few str.find calls per bookmark.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Match qualities, best last
+PATH_INFIX = 1
+PATH_PREFIX = 2
+PATH_EXACT = 3
+KEY_INFIX = 4
+KEY_PREFIX = 5
+
+
+def _in_order(tokens: List[str], text: str) -> int:
+    """Offset where the last token starts if all tokens occur in order in text, else -1."""
+    at = start = 0
+    for token in tokens:
+        start = text.find(token, at)
+        if start < 0:
+            return -1
+        at = start + len(token)
+    return start
+
+
+def quality(tokens: List[str], key: str, path: str) -> int:
+    """How well lowercased tokens match a lowercased key and path; 0 for no match."""
+    start = _in_order(tokens, key)
+    if start >= 0:
+        return KEY_PREFIX if key.startswith(tokens[0]) else KEY_INFIX
+    path = path.rstrip('/')
+    start = _in_order(tokens, path)
+    if start < 0:
+        return 0
+    last = path.rfind('/') + 1
+    if start < last:
+        # The last token must match the last component; find a later occurrence
+        start = path.rfind(tokens[-1])
+        if start < last or _in_order(tokens[:-1], path[:start]) < 0:
+            return 0
+    if start == last:
+        return PATH_EXACT if len(path) - last == len(tokens[-1]) else PATH_PREFIX
+    return PATH_INFIX
+
+
+def rank(tokens: Iterable[str], table: Dict[str, Tuple[str, str]],
+         scores: Optional[Dict[str, float]] = None) -> List[str]:
+    """Keys of table matching the tokens, best first.
+
+    table maps keys to their lowercased (key, path); scores, if given,
+    holds frecency by key.
+    """
+    tokens = [token.lower() for token in tokens if token]
+    if not tokens:
+        return []
+    matched = []
+    for key, (folded_key, folded_path) in table.items():
+        level = quality(tokens, folded_key, folded_path)
+        if level:
+            matched.append((level, key, len(folded_path)))
+    scores = scores or {}
+    matched.sort(key=lambda match: (-match[0], -scores.get(match[1], 0.0), match[2]))
+    return [key for _, key, _ in matched]
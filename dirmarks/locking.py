@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Inter-process write lock for a bookmark store.
+
+Writers take an exclusive fcntl lock on a lock file in the per-user
+runtime directory before reading, changing and writing the store, so
+concurrent shells and cron jobs serialize instead of losing updates.
+The lock file lives outside the store's directory because text rewrites
+replace ~/.markrc with os.replace and a lock held on the old inode would
+not exclude anyone. Readers do not lock; atomic replaces keep them safe.
+
+On platforms without fcntl the lock is a no-op.
+"""
+
+import os
+import stat
+import time
+import zlib
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from dirmarks.fileutil import resolve_symlinks
+
+# Give up waiting for another writer after this many seconds
+LOCK_TIMEOUT = 10.0
+
+
+class LockTimeout(OSError):
+    """Raised when another process holds the lock for longer than LOCK_TIMEOUT."""
+
+
+class UnsafeDirectory(OSError):
+    """Raised when a per-user directory could be controlled by someone else."""
+
+
+def runtime_dir() -> str:
+    """Per-user runtime directory ($XDG_RUNTIME_DIR, else /tmp/dirmarks-$UID)."""
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return runtime
+    # Same fallback the shell function uses
+    return os.path.join('/tmp', f"dirmarks-{os.getuid()}")
+
+
+def private_dir(path: str) -> str:
+    """Create path (mode 0700) if needed and make sure only the user controls it.
+    
+    The /tmp fallback of runtime_dir can be created first by another user,
+    who could then answer for the daemon or hold the lock, so the directory
+    must be a real directory (not a symlink) owned by the user and closed
+    to everyone else; UnsafeDirectory is raised otherwise.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise UnsafeDirectory(f"{path} must be a directory owned by you with mode 0700")
+    return path
+
+
+def lock_path(rc: str) -> str:
+    """Path of the lock file guarding the store behind the marks file rc."""
+    key = resolve_symlinks(rc)
+    return os.path.join(runtime_dir(), f"dirmarks-{zlib.crc32(key.encode()):08x}.lock")
+
+
+class FileLock:
+    """Exclusive, non-reentrant lock on a lock file, usable as a context manager."""
+
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = LOCK_TIMEOUT if timeout is None else timeout
+        self.fd = None
+
+    def acquire(self):
+        """Block until the lock is held, polling with backoff up to the timeout."""
+        if fcntl is None:
+            return
+        try:
+            private_dir(os.path.dirname(self.path))
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        except OSError:
+            # An unwritable runtime directory must not make bookmarks read-only,
+            # and one held by another user is not used at all
+            return
+        deadline = time.monotonic() + self.timeout
+        delay = 0.001
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise LockTimeout(f"timed out waiting for {self.path}")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        self.fd = fd
+
+    def release(self):
+        """Release the lock."""
+        if self.fd is not None:
+            # Closing the descriptor drops the flock
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -1,15 +1,41 @@
 #!/usr/bin/env python3
-from dirmarks import DATA_PATH
-from dirmarks.marks_enhanced import Marks
-from dirmarks.colors import get_color_manager
+from dirmarks.marks_enhanced import Marks, marks_source_files, index_file
+from dirmarks.index import MarksIndex, IndexCorrupt
+from dirmarks.query import QueryError
+from dirmarks.fileutil import file_stamp
+from dirmarks import dircache, pathcheck, relocate, scan, snapshot, storage, typos
 import os
 import sys
-import fileinput
-import subprocess
 
 
 # The Marks class is now imported from marks_enhanced.py
 # which provides both backward compatibility and new category features
+#
+# Colour support (colorama) and package resources are imported lazily so the
+# lookup and mutation commands used by the shell function stay cheap to start.
+
+
+class PlainColors:
+    """Stand-in for ColorManager when output is not a terminal."""
+    
+    colors_enabled = False
+    
+    def colorize_category(self, category: str) -> str:
+        return category
+    
+    def colorize_tag(self, tag: str) -> str:
+        return tag
+    
+    def colorize_tags(self, tags):
+        return tags
+
+
+def get_color_manager():
+    """Return the colour manager for terminal output, without loading colorama otherwise."""
+    if os.environ.get('NO_COLOR') or not sys.stdout.isatty():
+        return PlainColors()
+    from dirmarks.colors import get_color_manager as get_terminal_color_manager
+    return get_terminal_color_manager()
 
 
 def get_current_shell():
@@ -22,6 +48,7 @@ def get_current_shell():
         return 'Unknown'
     
 def check_dir_function_exists():
+    import subprocess
     try:
         # Try to get the definition of the 'dir' function
         shell = get_current_shell()
@@ -116,12 +143,35 @@ def parse_optional_args(args, start_index):
     return category, tags
 
 
-def enhanced_list_marks(marks, category_filter=None, tag_filter=None):
-    """Enhanced list function with category/tag display and filtering with colors."""
+def path_accepted(marks, path):
+    """Check that path can be bookmarked, explaining on stderr why not."""
+    status = marks.verify_path(path)
+    if status == pathcheck.OK:
+        return True
+    if status == pathcheck.TIMED_OUT:
+        sys.stderr.write(f"{path} did not answer in time; use --no-verify to bookmark it anyway\n")
+    else:
+        sys.stderr.write(f"Cannot bookmark {path}: {status}\n")
+    return False
+
+
+def enhanced_list_marks(marks, category_filter=None, tag_filter=None, match_all=True, sort=None):
+    """Enhanced list function with category/tag display and filtering with colors.
+    
+    tag_filter may be a comma-separated list of tags; match_all selects
+    bookmarks carrying all of them, otherwise any of them. sort='frecency'
+    lists the most used bookmarks first; indexes shown stay those of dir <n>.
+    """
     color_manager = get_color_manager()
+    scores = marks.frecency() if sort == "frecency" else None
+    
+    def ranked(entries):
+        if scores is None:
+            return entries
+        return sorted(entries, key=lambda mark: -scores.get(mark['name'], 0.0))
     
     if category_filter:
-        filtered_marks = marks.list_by_category(category_filter)
+        filtered_marks = ranked(marks.list_by_category(category_filter))
         colored_category = color_manager.colorize_category(category_filter)
         print(f"Bookmarks in category '{colored_category}':")
         for mark in filtered_marks:
@@ -132,12 +182,14 @@ def enhanced_list_marks(marks, category_filter=None, tag_filter=None):
                 tags_str = ""
             print(f"  {mark['name']} => {mark['path']}{tags_str}")
     elif tag_filter:
-        filtered_marks = marks.list_by_tag(tag_filter)
-        colored_tag = color_manager.colorize_tag(tag_filter)
-        print(f"Bookmarks with tag '{colored_tag}':")
+        tags = [t for t in tag_filter.split(',') if t]
+        filtered_marks = ranked(marks.list_by_tags(tags, match_all))
+        joiner = " and " if match_all else " or "
+        colored_tags = joiner.join(f"'{color_manager.colorize_tag(t)}'" for t in tags)
+        print(f"Bookmarks with tag{'s' if len(tags) > 1 else ''} {colored_tags}:")
         for mark in filtered_marks:
             category_str = f" [category: {color_manager.colorize_category(mark['category'])}]" if mark.get('category') else ""
-            other_tags = [t for t in mark.get('tags', []) if t != tag_filter]
+            other_tags = [t for t in mark.get('tags', []) if t not in tags]
             if other_tags:
                 colored_other_tags = color_manager.colorize_tags(other_tags)
                 tags_str = f" [tags: {', '.join(colored_other_tags)}]"
@@ -146,7 +198,11 @@ def enhanced_list_marks(marks, category_filter=None, tag_filter=None):
             print(f"  {mark['name']} => {mark['path']}{category_str}{tags_str}")
     else:
         # Enhanced default listing with categories and tags
-        for i, mark in enumerate(marks.list):
+        order = list(range(len(marks.list)))
+        if scores is not None:
+            order.sort(key=lambda i: -scores.get(marks.list[i].split(':')[0], 0.0))
+        for i in order:
+            mark = marks.list[i]
             mark_name = mark.split(':')[0]
             mark_data = marks.get_mark_with_metadata(mark_name)
             
@@ -162,6 +218,101 @@ def enhanced_list_marks(marks, category_filter=None, tag_filter=None):
                 print(f"{i} => {mark}")
 
 
+def record_visit(key):
+    """Count a successful lookup towards the bookmark's frecency (see dirmarks.usage)."""
+    from dirmarks import usage
+    usage.record(os.path.expanduser("~/.markrc"), key)
+
+
+def resolve_bookmark(shortname):
+    """Resolve a bookmark, answering from the lookup index when it is current."""
+    return lookup_bookmark(shortname)[1]
+
+
+def lookup_bookmark(shortname):
+    """(key, path, marks) of a name, index or name/sub/dir; key and path may be None.
+    
+    The key is that of the bookmark resolved through, so that `dir 2` is
+    recorded as a visit of the bookmark at index 2. marks is the Marks
+    loaded when the lookup index could not answer (None when it did), for
+    the caller to reuse rather than load the store again.
+    """
+    rc = os.path.expanduser("~/.markrc")
+    backend = storage.configured_backend(os.path.expanduser("~/.markrc.config"))
+    source_files = marks_source_files(rc, backend)
+    if snapshot.enabled():
+        mapped = MarksIndex.open(index_file(rc, backend), source_files)
+        if mapped is not None:
+            try:
+                return (*(mapped.lookup(shortname) or (None, None)), None)
+            except IndexCorrupt:
+                pass
+            finally:
+                mapped.close()
+    
+    # Stamps are taken before reading so a concurrent change leaves the index stale
+    stamps = tuple(file_stamp(path) for path in source_files)
+    marks = Marks()
+    bookmark = marks.get_mark(shortname)
+    key = marks.bookmark_key(shortname) if bookmark else None
+    marks.write_index(stamps)
+    return key, bookmark, marks
+
+
+def find_bookmark(tokens):
+    """Resolve `dir <tokens...>` to (key, path, suggestions).
+    
+    A single token is looked up as a name, index or name/sub/path first;
+    several tokens, or a miss, jump to the best bookmark matching them all
+    (see dirmarks.jump). When nothing matches, key and path are None and
+    suggestions lists the keys a single mistyped name was probably meant
+    to be; with DIRMARKS_AUTOCORRECT=1 the only closest key is used.
+    """
+    marks = None
+    if len(tokens) == 1:
+        key, bookmark, marks = lookup_bookmark(tokens[0])
+        if bookmark:
+            return key, bookmark, []
+    marks = marks or Marks()
+    found = marks.matches(tokens)
+    if found:
+        return found[0]['name'], found[0]['path'], []
+    suggestions = marks.suggest(tokens[0]) if len(tokens) == 1 else []
+    if len(suggestions) == 1 and typos.enabled_autocorrect():
+        return suggestions[0], marks.get_mark(suggestions[0]), []
+    return None, None, suggestions
+
+
+def complete_bookmarks(prefix):
+    """Bookmark names starting with prefix, from the lookup index when it is current.
+    
+    After `name/`, subdirectories of the bookmark are completed instead.
+    """
+    rc = os.path.expanduser("~/.markrc")
+    backend = storage.configured_backend(os.path.expanduser("~/.markrc.config"))
+    source_files = marks_source_files(rc, backend)
+    if snapshot.enabled():
+        mapped = MarksIndex.open(index_file(rc, backend), source_files)
+        if mapped is not None:
+            try:
+                names = mapped.complete(prefix)
+                name, sep, rest = prefix.partition('/')
+                base = mapped.get(name) if sep and name else None
+                if base is not None:
+                    names += dircache.complete_subpath(name, base, rest)
+                return names
+            except IndexCorrupt:
+                pass
+            finally:
+                mapped.close()
+    
+    stamps = tuple(file_stamp(path) for path in source_files)
+    marks = Marks()
+    names = marks.complete(prefix)
+    marks.write_index(stamps)
+    return names
+
+
 def main():
     if len(sys.argv) == 1:
         # Call the function to check
@@ -186,8 +337,180 @@ def main():
             if idx + 1 < len(sys.argv):
                 tag_filter = sys.argv[idx + 1]
         
+        sort = None
+        if "--sort" in sys.argv:
+            idx = sys.argv.index("--sort")
+            sort = sys.argv[idx + 1] if idx + 1 < len(sys.argv) else None
+            if sort != "frecency":
+                sys.stderr.write("Usage: dirmarks --list --sort frecency\n")
+                return
+        
+        marks = Marks()
+        enhanced_list_marks(marks, category_filter, tag_filter, match_all="--any" not in sys.argv, sort=sort)
+        
+    elif command == "--query":
+        if len(sys.argv) < 3:
+            sys.stderr.write("Usage: dirmarks --query '<expression>'\n")
+            return
+        expression = " ".join(sys.argv[2:])
+        marks = Marks()
+        try:
+            results = marks.query(expression)
+        except QueryError as e:
+            sys.stderr.write(f"Invalid query: {e}\n")
+            return
+        color_manager = get_color_manager()
+        print(f"Bookmarks matching {expression}:")
+        for mark in results:
+            category_str = f" [category: {color_manager.colorize_category(mark['category'])}]" if mark.get('category') else ""
+            tags_str = f" [tags: {', '.join(color_manager.colorize_tags(mark['tags']))}]" if mark.get('tags') else ""
+            print(f"  {mark['name']} => {mark['path']}{category_str}{tags_str}")
+        
+    elif command == "--search":
+        if len(sys.argv) < 3:
+            sys.stderr.write("Usage: dirmarks --search <text> [--limit N]\n")
+            return
+        args = sys.argv[2:]
+        limit = 10
+        if "--limit" in args:
+            idx = args.index("--limit")
+            try:
+                limit = int(args[idx + 1])
+            except (IndexError, ValueError):
+                sys.stderr.write("--limit needs a number\n")
+                return
+            del args[idx:idx + 2]
+        text = " ".join(args)
+        marks = Marks()
+        color_manager = get_color_manager()
+        results = marks.search(text, limit)
+        if not results:
+            print(f"No bookmarks match '{text}'.")
+        for mark in results:
+            category_str = f" [category: {color_manager.colorize_category(mark['category'])}]" if mark.get('category') else ""
+            tags_str = f" [tags: {', '.join(color_manager.colorize_tags(mark['tags']))}]" if mark.get('tags') else ""
+            print(f"  {mark['name']} => {mark['path']}{category_str}{tags_str}")
+        
+    elif command == "--complete":
+        prefix = sys.argv[2] if len(sys.argv) > 2 else ""
+        names = complete_bookmarks(prefix)
+        if names:
+            print("\n".join(names))
+        
+    elif command == "--where":
+        path = sys.argv[2] if len(sys.argv) > 2 else os.getcwd()
+        marks = Marks()
+        results = marks.where(path)
+        if not results:
+            sys.stderr.write(f"No bookmark contains {path}\n")
+            return
+        for mark in results:
+            print(f"  {mark['name']} => {mark['path']}")
+        
+    elif command == "--prompt":
+        segment = Marks().prompt_segment(sys.argv[2] if len(sys.argv) > 2 else None)
+        if segment:
+            print(segment)
+        
+    elif command == "--top":
+        try:
+            count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        except ValueError:
+            sys.stderr.write("Usage: dirmarks --top [N]\n")
+            return
+        marks = Marks()
+        results = marks.top(count)
+        if not results:
+            print("No bookmark has been visited yet.")
+        for mark in results:
+            print(f"  {mark['name']} => {mark['path']} ({mark['score']:.2f})")
+        
+    elif command == "--check":
+        timeout = pathcheck.DEFAULT_TIMEOUT
+        if "--timeout" in sys.argv:
+            idx = sys.argv.index("--timeout")
+            try:
+                timeout = float(sys.argv[idx + 1])
+            except (IndexError, ValueError):
+                sys.stderr.write("Usage: dirmarks --check [--timeout SECONDS] [--prune]\n")
+                return
+        marks = Marks()
+        problems = marks.check(timeout)
+        for mark in problems:
+            print(f"  {mark['name']} => {mark['path']} ({mark['status']})")
+        if not problems:
+            print(f"All {len(marks.marks_metadata)} bookmarks point to directories.")
+        elif "--prune" in sys.argv:
+            # Timeouts and permission errors may be transient; only drop what is gone
+            gone = [mark['name'] for mark in problems
+                    if mark['status'] in (pathcheck.MISSING, pathcheck.NOT_DIR)]
+            print(f"Pruned {marks.bulk_delete(gone)} bookmarks.")
+        
+    elif command == "--relocate-missing":
+        usage_line = "Usage: dirmarks --relocate-missing [--depth N] [--timeout SECONDS]\n"
+        options = {"--depth": str(relocate.DEFAULT_DEPTH), "--timeout": str(pathcheck.DEFAULT_TIMEOUT)}
+        for option in options:
+            if option in sys.argv:
+                idx = sys.argv.index(option)
+                if idx + 1 >= len(sys.argv):
+                    sys.stderr.write(usage_line)
+                    return
+                options[option] = sys.argv[idx + 1]
+        try:
+            depth = int(options["--depth"])
+            timeout = float(options["--timeout"])
+        except ValueError:
+            sys.stderr.write(usage_line)
+            return
         marks = Marks()
-        enhanced_list_marks(marks, category_filter, tag_filter)
+        relocated = marks.relocate_missing(depth, timeout)
+        for mark in relocated:
+            print(f"  {mark['name']}: {mark['old_path']} -> {mark['path']}")
+        print(f"Relocated {len(relocated)} bookmarks.")
+        
+    elif command == "--rewrite-prefix":
+        if len(sys.argv) < 4 or sys.argv[2].startswith("--") or sys.argv[3].startswith("--"):
+            sys.stderr.write("Usage: dirmarks --rewrite-prefix <old> <new> [--dry-run]\n")
+            return
+        dry_run = "--dry-run" in sys.argv
+        marks = Marks()
+        rewritten = marks.rewrite_prefix(sys.argv[2], sys.argv[3], dry_run)
+        for mark in rewritten:
+            print(f"  {mark['name']}: {mark['old_path']} -> {mark['path']}")
+        print(f"{'Would rewrite' if dry_run else 'Rewrote'} {len(rewritten)} bookmarks.")
+        
+    elif command == "--scan":
+        usage_line = "Usage: dirmarks --scan <root> [--depth N] [--match '.git|pyproject.toml'] [--category <cat>|auto]\n"
+        if len(sys.argv) < 3 or sys.argv[2].startswith("--"):
+            sys.stderr.write(usage_line)
+            return
+        root = sys.argv[2]
+        options = {"--depth": str(scan.DEFAULT_DEPTH), "--match": scan.DEFAULT_MATCH, "--category": None}
+        for option in options:
+            if option in sys.argv:
+                idx = sys.argv.index(option)
+                if idx + 1 >= len(sys.argv):
+                    sys.stderr.write(usage_line)
+                    return
+                options[option] = sys.argv[idx + 1]
+        try:
+            depth = int(options["--depth"])
+        except ValueError:
+            sys.stderr.write(usage_line)
+            return
+        if not os.path.isdir(root):
+            sys.stderr.write(f"Not a directory: {root}\n")
+            return
+        marks = Marks()
+        category = options["--category"]
+        if category and category != "auto" and not marks.is_valid_category(category):
+            sys.stderr.write(f"Invalid category name: {category}\n")
+            return
+        added = marks.discover(root, options["--match"], depth, category)
+        for mark in added:
+            category_str = f" [category: {mark['category']}]" if mark['category'] else ""
+            print(f"  {mark['name']} => {mark['path']}{category_str}")
+        print(f"Added {len(added)} bookmarks.")
         
     elif command == "--help":
         sys.stderr.write("""Usage:
@@ -199,11 +522,15 @@ dir -h   ------------------ prints this help
 dir -l	------------------ list marks (with colors!)
 dir <[0-9]+> -------------- go to mark[x] where is x is the index
 dir <name> ---------------- go to mark where key=<shortname>
+dir <name>/<sub/dir> ------ go to a directory below a mark
+dir <word> [<word>...] ---- go to the best mark whose key or path holds the words in order
+                            (a mistyped name gets a "did you mean"; DIRMARKS_AUTOCORRECT=1 follows it)
 dir -a <name> <path> ------ add new mark
 dir -d <name>|[0-9]+ ------ delete mark
 dir -u <name> <path> ------ update mark
 dir -m <name> ------------- add mark for PWD
 dir -p <name> ------------- prints mark
+dir -w [path] ------------- show the bookmark containing path (default: PWD)
 
 === CATEGORY & TAG COMMANDS ===
 dir -c   ------------------ list all categories (with colors!)
@@ -218,13 +545,33 @@ dir --tag <tag> ----------- list bookmarks with tag (shortcut)
 dir -a <name> <path> --category <cat> --tag <tag1,tag2>  -- add with metadata
 dir -u <name> <path> --category <cat> --tag <tag1,tag2>  -- update with metadata
 dir -m <name> --category <cat> --tag <tag1,tag2> ------- mark PWD with metadata
+dir -a|-u <name> <path> ... --no-verify ----------------- skip the directory check (e.g. on a slow mount)
+                            (the check waits DIRMARKS_VERIFY_TIMEOUT or config verify_timeout, default 2s)
 
 === DIRECT COMMANDS (bypass shell function) ===
 dirmarks --categories ----------------------------------- list all categories
 dirmarks --tags ----------------------------------------- list all tags
 dirmarks --stats ---------------------------------------- show category/tag statistics
+dirmarks --stats --tree --------------------------------- show categories as a tree with rolled-up counts
 dirmarks --list --category <cat> ----------------------- list by category
+dirmarks --list --category <cat>/ ---------------------- list by category, including subcategories
 dirmarks --list --tag <tag> ----------------------------- list by tag
+dirmarks --list --tag <t1,t2> [--all|--any] ------------- list by all (default) or any of several tags
+dirmarks --list --sort frecency ------------------------- list most frequently and recently used first
+dirmarks --top [N] -------------------------------------- the N (default 10) most used bookmarks
+dirmarks --query '<expr>' -------------------------------- e.g. 'category:work/** AND tag:urgent AND NOT path:/tmp/**'
+dirmarks --scan <root> [--depth N] [--match P] [--category C|auto]  bookmark every dir under root holding P (default .git)
+dirmarks --check [--timeout S] [--prune] ---------------- report (and delete) bookmarks of missing directories
+dirmarks --relocate-missing [--depth N] ---------------- follow renamed or moved directories (found by inode)
+dirmarks --rewrite-prefix <old> <new> [--dry-run] ------ move every bookmark under old to the same place under new
+dirmarks --where [path] --------------------------------- bookmark whose path is, or is the deepest ancestor of, path
+dirmarks --prompt [path] -------------------------------- print name or name/sub/dir of path, for PS1
+dirmarks --complete <prefix> ---------------------------- print bookmark names starting with prefix
+dirmarks --search <text> [--limit N] -------------------- fuzzy search keys, paths, categories and tags
+dirmarks --migrate <text|journal|sqlite> ---------------- copy bookmarks to another storage backend
+dirmarks --compact -------------------------------------- fold pending journal records into ~/.markrc
+dirmarks --emit-shell-cache [file] ---------------------- write the zero-fork lookup table for dir
+dirmarks --daemon [serve|start|stop|status] ------------- resident daemon for fast lookups
 
 === FEATURES ===
 • Color-coded categories and tags (auto-detects terminal support)
@@ -234,6 +581,7 @@ dirmarks --list --tag <tag> ----------------------------- list by tag
 • Cross-platform support (Linux, macOS, Windows)
 """)
     elif command == "--shell":
+        from dirmarks import DATA_PATH
         with open(os.path.join(f"{DATA_PATH}","dirmarks.function"), "r") as fb:
             for line in fb.readlines():
                 print(line, end='')
@@ -250,17 +598,19 @@ dirmarks --list --tag <tag> ----------------------------- list by tag
         if category and not marks.is_valid_category(category):
             sys.stderr.write(f"Invalid category name: {category}\n")
             return
+        if "--no-verify" not in sys.argv and not path_accepted(marks, path):
+            return
             
         if category or tags:
-            success = marks.add_mark_with_metadata(shortname, path, category=category, tags=tags)
+            success = marks.add_mark_with_metadata(shortname, path, category=category, tags=tags, verify=False)
             if not success:
                 sys.stderr.write("Failed to add bookmark\n")
         else:
-            marks.add_mark(shortname, path)
+            marks.add_mark(shortname, path, verify=False)
             
     elif command == "--add":
         if len(sys.argv) < 4:
-            sys.stderr.write("Usage: dirmarks --add <name> <path> [--category <category>] [--tag <tags>]\n")
+            sys.stderr.write("Usage: dirmarks --add <name> <path> [--category <category>] [--tag <tags>] [--no-verify]\n")
             return
             
         shortname, path = sys.argv[2], sys.argv[3]
@@ -270,13 +620,15 @@ dirmarks --list --tag <tag> ----------------------------- list by tag
         if category and not marks.is_valid_category(category):
             sys.stderr.write(f"Invalid category name: {category}\n")
             return
+        if "--no-verify" not in sys.argv and not path_accepted(marks, path):
+            return
             
         if category or tags:
-            success = marks.add_mark_with_metadata(shortname, path, category=category, tags=tags)
+            success = marks.add_mark_with_metadata(shortname, path, category=category, tags=tags, verify=False)
             if not success:
                 sys.stderr.write("Failed to add bookmark\n")
         else:
-            marks.add_mark(shortname, path)
+            marks.add_mark(shortname, path, verify=False)
             
     elif command == "--delete":
         shortname = sys.argv[2]
@@ -284,7 +636,7 @@ dirmarks --list --tag <tag> ----------------------------- list by tag
         
     elif command == "--update":
         if len(sys.argv) < 4:
-            sys.stderr.write("Usage: dirmarks --update <name> <path> [--category <category>] [--tag <tags>]\n")
+            sys.stderr.write("Usage: dirmarks --update <name> <path> [--category <category>] [--tag <tags>] [--no-verify]\n")
             return
             
         shortname, path = sys.argv[2], sys.argv[3]
@@ -294,25 +646,25 @@ dirmarks --list --tag <tag> ----------------------------- list by tag
         if category and not marks.is_valid_category(category):
             sys.stderr.write(f"Invalid category name: {category}\n")
             return
+        # Checked before the delete so a bad path leaves the bookmark alone
+        if "--no-verify" not in sys.argv and not path_accepted(marks, path):
+            return
         
-        # For update, we first delete then re-add with new metadata
-        if marks.del_mark(shortname):
-            if category or tags:
-                success = marks.add_mark_with_metadata(shortname, path, category=category, tags=tags)
-                if not success:
-                    sys.stderr.write("Failed to update bookmark\n")
+        # Replaced with the new metadata under one write lock
+        if not marks.update_mark(shortname, path, verify=False, category=category, tags=tags):
+            if shortname in marks.marks:
+                sys.stderr.write("Failed to update bookmark\n")
             else:
-                marks.add_mark(shortname, path)
-        else:
-            sys.stderr.write("Bookmark not found\n")
+                sys.stderr.write("Bookmark not found\n")
             
     elif command == "--get":
-        shortname = sys.argv[2]
-        bookmark = Marks().get_mark(shortname)
+        key, bookmark, suggestions = find_bookmark(sys.argv[2:])
         if bookmark:
             print(bookmark)
+            sys.stdout.flush()
+            record_visit(key)
         else:
-            sys.stderr.write("Bookmark not found.\n")
+            sys.stderr.write(f"Bookmark not found.{typos.hint(suggestions)}\n")
     
     elif command == "--categories":
         marks = Marks()
@@ -348,7 +700,13 @@ dirmarks --list --tag <tag> ----------------------------- list by tag
         print("Bookmark Statistics:")
         print("=" * 40)
         
-        if category_stats:
+        if category_stats and "--tree" in sys.argv:
+            print(f"\nCategories ({len(category_stats)}):")
+            for category, depth, own, total in marks.category_tree():
+                name = color_manager.colorize_category(category.rsplit('/', 1)[-1])
+                detail = f" ({own} here)" if own and own != total else ""
+                print(f"  {'  ' * depth}{name}: {total} bookmark{'s' if total != 1 else ''}{detail}")
+        elif category_stats:
             print(f"\nCategories ({len(category_stats)}):")
             for category, count in category_stats.items():
                 colored_category = color_manager.colorize_category(category)
@@ -373,13 +731,55 @@ dirmarks --list --tag <tag> ----------------------------- list by tag
         print(f"  With categories: {categorized}")
         print(f"  With tags: {tagged}")
             
+    elif command == "--emit-shell-cache":
+        marks = Marks()
+        path = sys.argv[2] if len(sys.argv) > 2 else marks.shell_cache_path()
+        if marks.emit_shell_cache(path):
+            print(path)
+        else:
+            sys.stderr.write(f"Failed to write shell cache {path}\n")
+            
+    elif command == "--migrate":
+        if len(sys.argv) < 3 or sys.argv[2] not in storage.BACKENDS:
+            sys.stderr.write(f"Usage: dirmarks --migrate <{'|'.join(storage.BACKENDS)}>\n")
+            return
+        marks = Marks()
+        if marks.migrate_storage(sys.argv[2]):
+            print(f"Migrated {len(marks.marks_metadata)} bookmarks to the {sys.argv[2]} backend.")
+        else:
+            sys.stderr.write("Migration failed\n")
+            
+    elif command == "--compact":
+        marks = Marks()
+        if not marks.compact():
+            sys.stderr.write("Compaction failed\n")
+            
+    elif command == "--daemon":
+        from dirmarks import daemon
+        action = sys.argv[2] if len(sys.argv) > 2 else "serve"
+        if action == "serve":
+            daemon.serve()
+        elif action == "start":
+            daemon.start()
+        elif action == "stop":
+            if not daemon.stop():
+                sys.stderr.write("dirmarks daemon is not running\n")
+        elif action == "status":
+            if daemon.is_running():
+                print(f"dirmarks daemon running on {daemon.socket_path()}")
+            else:
+                print("dirmarks daemon not running")
+        else:
+            sys.stderr.write("Usage: dirmarks --daemon [serve|start|stop|status]\n")
+            
     else:
-        shortname = sys.argv[1]
-        bookmark = Marks().get_mark(shortname)
+        key, bookmark, suggestions = find_bookmark(sys.argv[1:])
         if bookmark:
             print(bookmark)
+            sys.stdout.flush()
+            record_visit(key)
         else:
-            sys.stderr.write("Bookmark not found.\n")
+            sys.stderr.write(f"Bookmark not found.{typos.hint(suggestions)}\n")
 
 
 
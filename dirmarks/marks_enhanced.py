@@ -6,9 +6,50 @@ Extends the original Marks functionality with organizational features.
 
 import os
 import re
-import json
+import zlib
+import functools
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Any
 
+from dirmarks import dircache, index, jump, locking, pathcheck, query, relocate, scan, snapshot, storage, usage
+from dirmarks.fileutil import atomic_write, file_stamp, join_subpath
+from dirmarks.metaindex import MetadataIndex
+from dirmarks.search import TrigramIndex
+from dirmarks.typos import BKTree
+
+
+def marks_source_files(rc: str, backend: str = storage.DEFAULT_BACKEND) -> List[str]:
+    """Files bookmarks are read from, in load order."""
+    return ["/etc/markrc"] + storage.storage_files(backend, rc)
+
+
+def index_file(rc: str, backend: str = storage.DEFAULT_BACKEND) -> str:
+    """Path of the memory-mapped lookup index for a marks file and backend."""
+    return snapshot.cache_path(rc, f"index-{backend}")
+
+
+# Bytes before the end of a marks file compared by refresh() to tell an
+# append from a rewrite in place
+TAIL_CHECK_BYTES = 64
+
+# Keys that can be used unquoted as a bash/zsh associative array subscript
+SHELL_SAFE_KEY = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+# Layout of the shell cache; part of its generation so older files are rewritten
+SHELL_CACHE_FORMAT = 2
+
+# Paths that can be used unquoted as a subscript of the reverse (path -> name) table
+SHELL_SAFE_PATH = re.compile(r'^/[A-Za-z0-9_./+-]*$')
+
+
+def _locked(method):
+    """Run a mutator under the store's write lock; see MarksEnhanced._write_lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class MarksEnhanced:
     """Enhanced bookmark manager with category and tag support."""
@@ -21,30 +62,67 @@ class MarksEnhanced:
         self.rc = os.path.expanduser("~/.markrc")
         self.config_file = os.path.expanduser("~/.markrc.config")
         self.category_colors = {}
+        self.backend = None  # Storage backend from the config; see backend_name
+        self.verify_timeout = None  # Seconds a new bookmark's directory may take to answer
+        self._storage = None
+        self._storage_key = None
+        self._system_keys = set()  # Keys only defined in /etc/markrc
+        self._batch_depth = 0
+        self._batch_dirty = False
+        self._lock_depth = 0
+        self._unidentified = []  # New bookmark paths to record for relocate_missing; see _write_lock
+        self._stamps = None  # source_stamps() of the files the state was read from
+        self._positions = {}  # path -> (inode, bytes read, last bytes read), for refresh()
+        self._index = None  # Tag and category indexes, built on first query; see _indexes
+        self._trigrams = None  # Fuzzy search index, built on first search; see _trigram_index
+        self._typos = None  # BK-tree over keys, built on the first miss; see _typo_tree
         self.load_config()
-        self.read_marks("/etc/markrc", self.rc)
+        self.load()
+        self._refresh_shell_cache()
     
     def load_config(self):
         """Load configuration including category colors."""
         if os.path.exists(self.config_file):
+            import json
             try:
                 with open(self.config_file, 'r') as f:
                     config = json.load(f)
                     self.category_colors = config.get('category_colors', {})
+                    self.backend = config.get('backend')
+                    self.verify_timeout = config.get('verify_timeout')
             except:
                 self.category_colors = {}
     
     def save_config(self):
         """Save configuration to file."""
+        import json
+        
         config = {
             'category_colors': self.category_colors
         }
+        if self.backend:
+            config['backend'] = self.backend
+        if self.verify_timeout is not None:
+            config['verify_timeout'] = self.verify_timeout
         try:
             with open(self.config_file, 'w') as f:
                 json.dump(config, f, indent=2)
         except:
             pass
     
+    @property
+    def backend_name(self) -> str:
+        """Active storage backend ('text' or 'sqlite')."""
+        return storage.backend_name(self.backend)
+    
+    def storage(self):
+        """Storage object for the active backend and current marks file."""
+        key = (self.backend_name, self.rc)
+        if self._storage_key != key:
+            self._storage = storage.open_storage(*key)
+            self._storage_key = key
+        return self._storage
+    
     def read_marks(self, *files):
         """Read marks from files, supporting both old and new formats."""
         for f in files:
@@ -54,13 +132,272 @@ class MarksEnhanced:
                         line = line.strip()
                         if not line:
                             continue
-                        
-                        # Try to parse new format with metadata
-                        if '|' in line:
-                            self._parse_new_format(line)
-                        else:
-                            # Old format: key:path
-                            self._parse_old_format(line)
+                        self._parse_line(line)
+                    self._remember_position(f, file.buffer)
+    
+    def _remember_position(self, path: str, file=None):
+        """Note how far path has been read, so refresh() can parse only what is appended.
+        
+        file is a binary handle positioned at the end of what was read; when
+        omitted the whole current file counts as read.
+        """
+        try:
+            if file is None:
+                with open(path, 'rb') as file:
+                    file.seek(0, os.SEEK_END)
+                    return self._remember_position(path, file)
+            end = file.tell()
+            start = max(0, end - TAIL_CHECK_BYTES)
+            file.seek(start)
+            tail = file.read(end - start)
+            inode = os.fstat(file.fileno()).st_ino
+        except OSError:
+            tail = None
+        if tail is None or (tail and not tail.endswith(b'\n')):
+            # A last line without newline may still be growing; re-read it all next time
+            self._positions.pop(path, None)
+        else:
+            self._positions[path] = (inode, end, tail)
+    
+    def _parse_line(self, line: str):
+        """Parse one bookmark line in either format."""
+        # Try to parse new format with metadata
+        if '|' in line:
+            self._parse_new_format(line)
+        else:
+            # Old format: key:path
+            self._parse_old_format(line)
+    
+    def _apply_journal(self, records):
+        """Replay (op, payload) journal records over the loaded bookmarks.
+        
+        A 'put' of an existing key keeps its position, as rewriting the
+        marks file would; the list is rebuilt once at the end.
+        """
+        for op, payload in records:
+            if op == 'put':
+                self._parse_line(payload)
+                self._system_keys.discard(storage.line_key(payload))
+            elif op == 'del':
+                self._drop_entry(payload)
+                self._system_keys.discard(payload)
+        self.list = [f"{key}:{metadata['path']}" for key, metadata in self.marks_metadata.items()]
+    
+    def load(self):
+        """Load bookmarks from the snapshot cache, or parse the files and cache the result."""
+        stamps = self._stamps = self.source_stamps()
+        path = snapshot.cache_path(self.rc, f"state-{self.backend_name}")
+        state = snapshot.load(path, stamps)
+        if state is not None:
+            self._restore_snapshot_state(state)
+            return
+        
+        self._read_sources()
+        snapshot.save(path, stamps, self._snapshot_state())
+    
+    def _read_sources(self):
+        """Read /etc/markrc, then the user's bookmarks from the active backend."""
+        self.read_marks("/etc/markrc")
+        system = dict(self.marks_metadata)
+        self.storage().load(self)
+        self._system_keys = {key for key, metadata in system.items()
+                             if self.marks_metadata.get(key) is metadata}
+    
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """Parsed state stored in the snapshot cache."""
+        return {
+            'marks': self.marks,
+            'marks_metadata': self.marks_metadata,
+            'list': self.list,
+            'system_keys': list(self._system_keys),
+        }
+    
+    def _restore_snapshot_state(self, state: Dict[str, Any]):
+        """Install parsed state loaded from the snapshot cache."""
+        self.marks = state['marks']
+        self.marks_metadata = state['marks_metadata']
+        self.list = state['list']
+        self._system_keys = set(state['system_keys'])
+    
+    def reload(self):
+        """Discard in-memory state and re-read all bookmark files."""
+        self._stamps = self.source_stamps()
+        self._positions = {}
+        self.marks = {}
+        self.marks_metadata = {}
+        self.list = []
+        self._read_sources()
+    
+    def refresh(self) -> bool:
+        """Pick up changes other processes made since the state was read.
+        
+        For long-lived instances. If the user's marks file only grew, just
+        the appended lines are parsed (for the journal backend, just the
+        appended records are replayed); after any other change, such as a
+        rewrite, truncation or an edit of /etc/markrc, everything is
+        re-read. Returns True if anything changed.
+        """
+        stamps = self.source_stamps()
+        if stamps == self._stamps:
+            return False
+        if self._stamps is not None and len(self._stamps) == len(stamps):
+            paths = marks_source_files(self.rc, self.backend_name) + [self.config_file]
+            changed = [path for path, old, new in zip(paths, self._stamps, stamps) if old != new]
+            if self._load_appended(changed):
+                self._stamps = stamps
+                return True
+        self.load_config()
+        self.reload()
+        return True
+    
+    def _load_appended(self, changed: List[str]) -> bool:
+        """Apply what was appended to the changed files, if appending is all that happened."""
+        backend = self.storage()
+        if changed == [getattr(backend, 'journal_path', None)]:
+            return backend.load_appended(self)
+        if changed != [self.rc] or backend.name != 'text':
+            return False
+        
+        position = self._positions.get(self.rc)
+        if position is None:
+            return False
+        inode, end, tail = position
+        try:
+            with open(self.rc) as file:
+                if os.fstat(file.fileno()).st_ino != inode:
+                    return False
+                # Nothing has been decoded yet, so text reads start where the buffer is
+                file.buffer.seek(end - len(tail))
+                if file.buffer.read(len(tail)) != tail:
+                    return False
+                for line in file:
+                    line = line.strip()
+                    if line:
+                        self._parse_line(line)
+                        self._system_keys.discard(storage.line_key(line))
+                self._remember_position(self.rc, file.buffer)
+        except OSError:
+            return False
+        return True
+    
+    def source_stamps(self) -> tuple:
+        """Return (inode, size, mtime_ns) for every file the state was built from.
+        
+        Missing files stamp as None, so creating or deleting one is also a change.
+        """
+        paths = marks_source_files(self.rc, self.backend_name) + [self.config_file]
+        return tuple(file_stamp(path) for path in paths)
+    
+    def shell_cache_path(self) -> str:
+        """Path of the shell lookup table generated next to the marks file."""
+        return os.environ.get('DIRMARKS_SHELL_CACHE') or f"{self.rc}.sh"
+    
+    def _shell_cache_generation(self) -> str:
+        """Token identifying the current state of the source files."""
+        return format(zlib.crc32(repr((SHELL_CACHE_FORMAT, self.source_stamps())).encode()), '08x')
+    
+    def emit_shell_cache(self, path: Optional[str] = None) -> bool:
+        """Write a bash/zsh-sourceable table of key and index -> path, and path -> key.
+        
+        The first line carries a generation token so the shell function can
+        tell with a single `read` whether it has to source the file again.
+        Keys that are not safe as unquoted subscripts are left out; the
+        shell function falls back to dirmarks for those.
+        """
+        import shlex
+        
+        path = path or self.shell_cache_path()
+        generation = self._shell_cache_generation()
+        lines = [
+            f"# dirmarks-shell-cache {generation}",
+            "typeset -gA _DIRMARKS 2>/dev/null || declare -A _DIRMARKS",
+            "_DIRMARKS=()",
+        ]
+        # Index entries first so that a literally numeric key wins, as in get_mark
+        names = []
+        for idx in range(len(self.list)):
+            mark_path = self._list_path(idx)
+            if mark_path:
+                lines.append(f"_DIRMARKS[{idx}]={shlex.quote(mark_path)}")
+                name = self.list[idx].split(':', 1)[0]
+                if SHELL_SAFE_KEY.match(name):
+                    names.append(f"_DIRMARKS_NAME[{idx}]={name}")
+        for key, mark_path in self.marks.items():
+            if SHELL_SAFE_KEY.match(key):
+                lines.append(f"_DIRMARKS[{key}]={shlex.quote(mark_path)}")
+                if key.isdigit():
+                    names.append(f"_DIRMARKS_NAME[{key}]={key}")
+        # Hits are logged as visits of the bookmark (not of its index) by the
+        # shell function; index hits on keys left out here are not logged
+        lines.append("typeset -gA _DIRMARKS_NAME 2>/dev/null || declare -A _DIRMARKS_NAME")
+        lines.append("_DIRMARKS_NAME=()")
+        lines.extend(names)
+        if usage.enabled() and usage.start_tracking(self.rc):
+            lines.append(f"_DIRMARKS_USAGE_LOG={shlex.quote(usage.usage_file(self.rc) + '.log')}")
+        else:
+            lines.append("_DIRMARKS_USAGE_LOG=")
+        # Reverse table for dir_prompt; the first bookmark of a path wins, as in where()
+        lines.append("typeset -gA _DIRMARKS_WHERE 2>/dev/null || declare -A _DIRMARKS_WHERE")
+        lines.append("_DIRMARKS_WHERE=()")
+        seen = set()
+        complete = 1
+        for key, mark_path in self.marks.items():
+            if not (SHELL_SAFE_PATH.match(mark_path) and SHELL_SAFE_KEY.match(key)):
+                # An ancestor could be reported instead; dir_prompt asks dirmarks
+                complete = 0
+            elif mark_path not in seen:
+                seen.add(mark_path)
+                lines.append(f"_DIRMARKS_WHERE[{mark_path}]={shlex.quote(key)}")
+        lines.append(f"_DIRMARKS_WHERE_COMPLETE={complete}")
+        lines.append(f"_DIRMARKS_FORMAT={SHELL_CACHE_FORMAT}")
+        lines.append(f"_DIRMARKS_GEN={generation}")
+        
+        try:
+            atomic_write(path, '\n'.join(lines) + '\n')
+            return True
+        except OSError:
+            return False
+    
+    def _refresh_shell_cache(self):
+        """Regenerate the shell lookup table if one exists and is out of date."""
+        path = self.shell_cache_path()
+        try:
+            with open(path) as file:
+                header = file.readline().split()
+        except OSError:
+            return
+        if header[-1:] != [self._shell_cache_generation()]:
+            self.emit_shell_cache(path)
+    
+    def index_path(self) -> str:
+        """Path of the memory-mapped lookup index for this marks file."""
+        return index_file(self.rc, self.backend_name)
+    
+    def write_index(self, stamps: Optional[tuple] = None) -> bool:
+        """Rebuild the lookup index used by `dirmarks --get`.
+        
+        stamps are those of the marks files the in-memory state was read
+        from; when omitted the state is assumed to have just been written
+        by this instance. Small marks files are not indexed.
+        """
+        just_written = stamps is None
+        if just_written:
+            stamps = tuple(file_stamp(path) for path in marks_source_files(self.rc, self.backend_name))
+        if not snapshot.worth_caching(stamps, just_written=just_written):
+            return False
+        list_paths = [self._list_path(idx) for idx in range(len(self.list))]
+        list_keys = [line.split(':', 1)[0] for line in self.list]
+        return index.write(self.index_path(), stamps, self.marks, list_paths, list_keys)
+    
+    def _after_write(self):
+        """Bring derived artifacts up to date after the marks file changed."""
+        self._stamps = self.source_stamps()
+        if self.backend_name == 'text':
+            # Writers hold the lock, so memory matches the file as it is now
+            self._remember_position(self.rc)
+        self._refresh_shell_cache()
+        if not getattr(self.storage(), 'append_only', False):
+            self.write_index()
     
     def read_marks_with_metadata(self, *files):
         """Alias for read_marks that explicitly handles metadata."""
@@ -76,15 +413,11 @@ class MarksEnhanced:
             return
             
         key, path = parts
-        if key not in self.marks:
-            self.list.append(line)
-        
-        self.marks[key] = path
-        self.marks_metadata[key] = {
+        self._store_entry(key, {
             'path': path,
             'category': None,
             'tags': []
-        }
+        })
     
     def _parse_new_format(self, line: str):
         """Parse new format bookmark with metadata (key:path|category:cat|tags:tag1,tag2)."""
@@ -118,11 +451,88 @@ class MarksEnhanced:
                 elif meta_key == 'tags':
                     metadata['tags'] = meta_value.split(',') if meta_value else []
         
+        self._store_entry(key, metadata)
+    
+    def _store_entry(self, key: str, metadata: Dict[str, Any]):
+        """Install a bookmark read from storage; later definitions of a key win."""
+        previous = self.marks_metadata.get(key)
         if key not in self.marks:
-            self.list.append(f"{key}:{path}")
+            self.list.append(f"{key}:{metadata['path']}")
         
-        self.marks[key] = path
+        self.marks[key] = metadata['path']
         self.marks_metadata[key] = metadata
+        self._reindex(key, previous, metadata)
+    
+    def _drop_entry(self, key: str):
+        """Remove a bookmark from the key and metadata maps (not from the list)."""
+        self.marks.pop(key, None)
+        metadata = self.marks_metadata.pop(key, None)
+        if metadata is not None:
+            self._reindex(key, metadata, None)
+    
+    def _indexes(self) -> MetadataIndex:
+        """Tag, category and path indexes, (re)built if marks_metadata was replaced since."""
+        if self._index is None or self._index.source is not self.marks_metadata:
+            self._index = MetadataIndex(self.marks_metadata)
+        return self._index
+    
+    def _trigram_index(self) -> TrigramIndex:
+        """Fuzzy search index, (re)built like _indexes and cached with the snapshot.
+        
+        The cached postings are only used outside batches, where memory
+        matches the files the stamps were taken from.
+        """
+        if self._trigrams is None or self._trigrams.source is not self.marks_metadata:
+            cacheable = (not self._batch_depth and self._stamps is not None
+                         and snapshot.worth_caching(self._stamps))
+            path = snapshot.cache_path(self.rc, f"trigrams-{self.backend_name}")
+            state = snapshot.load(path, self._stamps) if cacheable else None
+            self._trigrams = TrigramIndex(self.marks_metadata, state)
+            if cacheable and state is None:
+                snapshot.save(path, self._stamps, self._trigrams.state())
+        return self._trigrams
+    
+    def _typo_tree(self) -> BKTree:
+        """BK-tree over the keys, cached like _trigram_index.
+        
+        The cached tree is checked against the keys rather than the stamps
+        (see dirmarks.typos), so after an add or delete it is patched and
+        saved again instead of rebuilt, even within the racy window.
+        """
+        if self._typos is None or self._typos.source is not self.marks_metadata:
+            cacheable = (not self._batch_depth and self._stamps is not None
+                         and snapshot.worth_caching(self._stamps, just_written=True))
+            path = snapshot.cache_path(self.rc, f"bktree-{self.backend_name}")
+            state = snapshot.load(path, None) if cacheable else None
+            self._typos = BKTree(self.marks_metadata, state)
+            if cacheable and (state is None or self._typos.patched):
+                snapshot.save(path, self._stamps, self._typos.state(), just_written=True)
+        return self._typos
+    
+    def _reindex(self, key: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """Keep built indexes current; None means the bookmark is absent.
+        
+        old must hold the category and tags as they were indexed, so callers
+        changing metadata in place pass a copy taken before the change.
+        """
+        index = self._index
+        if index is not None and index.source is self.marks_metadata:
+            if old is not None:
+                index.remove(key, old, forget=new is None)
+            if new is not None:
+                index.add(key, new)
+        trigrams = self._trigrams
+        if trigrams is not None and trigrams.source is self.marks_metadata:
+            if old is not None:
+                trigrams.remove(key)
+            if new is not None:
+                trigrams.add(key, new)
+        typos = self._typos
+        if typos is not None and typos.source is self.marks_metadata:
+            if new is None:
+                typos.remove(key)
+            elif old is None:
+                typos.add(key)
     
     def add_mark_with_category(self, key: str, path: str, category: str) -> bool:
         """Add a bookmark with a category."""
@@ -135,14 +545,39 @@ class MarksEnhanced:
         """Add a bookmark with tags."""
         return self.add_mark_with_metadata(key, path, tags=tags)
     
+    def verify_path(self, path: str) -> str:
+        """Check that path is a directory, within the configured timeout.
+        
+        Returns a dirmarks.pathcheck status. The timeout comes from
+        DIRMARKS_VERIFY_TIMEOUT, else 'verify_timeout' in ~/.markrc.config,
+        else pathcheck.DEFAULT_TIMEOUT seconds.
+        """
+        timeout = os.environ.get('DIRMARKS_VERIFY_TIMEOUT') or self.verify_timeout
+        try:
+            timeout = float(timeout) if timeout is not None else pathcheck.DEFAULT_TIMEOUT
+        except (TypeError, ValueError):
+            timeout = pathcheck.DEFAULT_TIMEOUT
+        return pathcheck.verify_dir(os.path.abspath(path), timeout)
+    
     def add_mark_with_metadata(self, key: str, path: str, category: Optional[str] = None, 
-                               tags: Optional[List[str]] = None) -> bool:
-        """Add a bookmark with metadata (category and/or tags)."""
+                               tags: Optional[List[str]] = None, verify: bool = True) -> bool:
+        """Add a bookmark with metadata (category and/or tags).
+        
+        The path must be a directory answering within the timeout of
+        verify_path; verify=False accepts it unchecked. The check runs
+        before the write lock is taken, so other writers never wait on it.
+        """
         abs_path = os.path.abspath(path)
-        if not os.path.isdir(abs_path):
+        if verify and self.verify_path(abs_path) != pathcheck.OK:
             return False
-        
-        if self.get_mark(key):
+        return self._add_entry(key, abs_path, category, tags)
+    
+    @_locked
+    def _add_entry(self, key: str, abs_path: str, category: Optional[str],
+                   tags: Optional[List[str]]) -> bool:
+        """Store a bookmark whose path has been checked (or need not be)."""
+        # A key or list index already in use; name/sub paths do not count
+        if key in self.marks or (key.isdigit() and self.get_mark(key)):
             return False
         
         # Validate category if provided
@@ -150,45 +585,62 @@ class MarksEnhanced:
             return False
         
         # Store in memory
-        self.marks[key] = abs_path
-        self.marks_metadata[key] = {
+        self._store_entry(key, {
             'path': abs_path,
             'category': category,
             'tags': tags or []
-        }
-        self.list.append(f"{key}:{abs_path}")
+        })
+        self._unidentified.append(abs_path)
         
-        # Write to file
-        try:
-            with open(self.rc, "a") as file:
-                if category or tags:
-                    # New format with metadata
-                    line = f"{key}:{abs_path}"
-                    if category:
-                        line += f"|category:{category}"
-                    if tags:
-                        line += f"|tags:{','.join(tags)}"
-                    file.write(f"{line}\n")
-                else:
-                    # Old format for backward compatibility
-                    file.write(f"{key}:{abs_path}\n")
+        # Write to storage
+        if self._deferred():
             return True
+        try:
+            self.storage().append(key, self.marks_metadata[key])
         except Exception:
             return False
+        self._after_write()
+        return True
     
     def get_mark(self, key: str) -> Optional[str]:
-        """Get bookmark path by key (backward compatible)."""
+        """Get bookmark path by key (backward compatible).
+        
+        `name/sub/dir` resolves name (or an index) and joins the rest to it.
+        """
         if key in self.marks:
             return self.marks[key]
         
         # Check by index
         if key.isdigit():
-            idx = int(key)
-            if 0 <= idx < len(self.list):
-                line = self.list[idx]
-                if ':' in line:
-                    return line.split(':', 1)[1].split('|')[0]
+            return self._list_path(int(key))
         
+        name, sep, rest = key.partition('/')
+        if sep and name:
+            base = self.get_mark(name)
+            if base is not None:
+                return join_subpath(base, rest)
+        return None
+    
+    def bookmark_key(self, key: str) -> Optional[str]:
+        """Key of the bookmark get_mark(key) resolves through.
+        
+        That is key itself, the key at a list index, or name for `name/sub/dir`.
+        """
+        if key in self.marks:
+            return key
+        if key.isdigit():
+            return self.list[int(key)].split(':', 1)[0] if self._list_path(int(key)) else None
+        name, sep, _ = key.partition('/')
+        if sep and name:
+            return self.bookmark_key(name)
+        return None
+    
+    def _list_path(self, idx: int) -> Optional[str]:
+        """Path of the bookmark at position idx of the list."""
+        if 0 <= idx < len(self.list):
+            line = self.list[idx]
+            if ':' in line:
+                return line.split(':', 1)[1].split('|')[0]
         return None
     
     def get_mark_with_metadata(self, key: str) -> Optional[Dict[str, Any]]:
@@ -225,32 +677,112 @@ class MarksEnhanced:
         """Parse hierarchical category path into components."""
         return category_path.split('/') if category_path else []
     
-    def list_by_category(self, category: str) -> List[Dict[str, Any]]:
-        """List all bookmarks in a specific category."""
-        results = []
-        for key, metadata in self.marks_metadata.items():
-            if metadata.get('category') == category:
-                results.append({
-                    'name': key,
-                    'path': metadata['path'],
-                    'category': metadata.get('category'),
-                    'tags': metadata.get('tags', [])
-                })
-        return results
+    def _entry(self, key: str) -> Dict[str, Any]:
+        """Bookmark as returned by the list_by_* queries."""
+        metadata = self.marks_metadata[key]
+        return {
+            'name': key,
+            'path': metadata['path'],
+            'category': metadata.get('category'),
+            'tags': metadata.get('tags', [])
+        }
+    
+    def list_by_category(self, category: str, subtree: bool = False) -> List[Dict[str, Any]]:
+        """List all bookmarks in a specific category.
+        
+        With subtree, or a category ending in '/' (work/), bookmarks in all
+        categories below it are included as well.
+        """
+        index = self._indexes()
+        if subtree or category.endswith('/'):
+            keys = index.categories.subtree(category.rstrip('/'))
+        else:
+            keys = index.categories.keys(category)
+        return [self._entry(key) for key in index.ordered(keys)]
+    
+    def category_tree(self):
+        """Yield (category, depth, own count, subtree count) for every category node, sorted."""
+        return self._indexes().categories.walk()
     
     def list_by_tag(self, tag: str) -> List[Dict[str, Any]]:
         """List all bookmarks with a specific tag."""
-        results = []
-        for key, metadata in self.marks_metadata.items():
-            if tag in metadata.get('tags', []):
-                results.append({
-                    'name': key,
-                    'path': metadata['path'],
-                    'category': metadata.get('category'),
-                    'tags': metadata.get('tags', [])
-                })
-        return results
+        return self.list_by_tags([tag])
+    
+    def list_by_tags(self, tags: List[str], match_all: bool = True) -> List[Dict[str, Any]]:
+        """List bookmarks carrying all (or, with match_all=False, any) of tags."""
+        index = self._indexes()
+        return [self._entry(key) for key in index.ordered(index.tags.match(tags, match_all))]
+    
+    def frecency(self) -> Dict[str, float]:
+        """Decayed visit score of every bookmark; 0 for those never visited."""
+        visited = usage.scores(self.rc)
+        return {key: visited.get(key, 0.0) for key in self.marks}
+    
+    def top(self, count: int = 10) -> List[Dict[str, Any]]:
+        """The count most frequently and recently visited bookmarks, with their 'score'."""
+        scores = self.frecency()
+        order = sorted((key for key, score in scores.items() if score > 0), key=lambda key: -scores[key])
+        return [{**self._entry(key), 'score': scores[key]} for key in order[:count]]
+    
+    def where(self, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Bookmarks of path (default cwd), or else of its deepest bookmarked ancestor."""
+        index = self._indexes()
+        path = os.path.normpath(os.path.abspath(path or os.getcwd()))
+        _, keys = index.paths.deepest(path)
+        return [self._entry(key) for key in index.ordered(keys)]
+    
+    def prompt_segment(self, path: Optional[str] = None) -> Optional[str]:
+        """`name` or `name/sub/dir` for path (default cwd), as accepted by get_mark."""
+        index = self._indexes()
+        path = os.path.normpath(os.path.abspath(path or os.getcwd()))
+        depth, keys = index.paths.deepest(path)
+        if not keys:
+            return None
+        rest = index.paths.split(path)[depth:]
+        return '/'.join([index.ordered(keys)[0]] + rest)
     
+    def complete(self, prefix: str) -> List[str]:
+        """Bookmark names starting with prefix, sorted, for shell completion.
+        
+        After `name/`, subdirectories of the bookmark are completed instead.
+        """
+        names = self._indexes().complete(prefix)
+        name, sep, rest = prefix.partition('/')
+        base = self.get_mark(name) if sep and name else None
+        if base is not None:
+            names += dircache.complete_subpath(name, base, rest)
+        return names
+    
+    def query(self, expression: str) -> List[Dict[str, Any]]:
+        """List bookmarks matching a boolean query (see dirmarks.query).
+        
+        Raises query.QueryError for a malformed expression.
+        """
+        index = self._indexes()
+        return [self._entry(key) for key in query.run(expression, index)]
+    
+    def search(self, text: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Bookmarks fuzzily matching text in key, path, category or tags, best first.
+        
+        Each result carries its similarity in 'score'.
+        """
+        return [{**self._entry(key), 'score': score}
+                for score, key in self._trigram_index().search(text, limit)]
+    
+    def suggest(self, name: str) -> List[str]:
+        """Keys closest to a name that is not a bookmark, within a typo or two."""
+        return self._typo_tree().closest(name)
+    
+    def matches(self, tokens: List[str]) -> List[Dict[str, Any]]:
+        """Bookmarks matching all tokens in order in their key or path, best first.
+        
+        See dirmarks.jump for the rules; frecency (if tracked) breaks ties
+        between matches of the same quality.
+        """
+        keys = jump.rank(tokens, self._indexes().folded, usage.scores(self.rc))
+        return [self._entry(key) for key in keys]
+    
+    @_locked
     def update_mark_category(self, key: str, new_category: str) -> bool:
         """Update the category of an existing bookmark."""
         if key not in self.marks_metadata:
@@ -259,42 +791,315 @@ class MarksEnhanced:
         if not self.is_valid_category(new_category):
             return False
         
-        self.marks_metadata[key]['category'] = new_category
-        self._rewrite_marks_file()
-        return True
+        metadata = self.marks_metadata[key]
+        self._reindex(key, dict(metadata), {**metadata, 'category': new_category})
+        metadata['category'] = new_category
+        return self._persist_update(key)
     
+    @_locked
     def update_mark_tags(self, key: str, new_tags: List[str]) -> bool:
         """Update the tags of an existing bookmark."""
         if key not in self.marks_metadata:
             return False
         
-        self.marks_metadata[key]['tags'] = new_tags
-        self._rewrite_marks_file()
+        metadata = self.marks_metadata[key]
+        self._reindex(key, dict(metadata), {**metadata, 'tags': new_tags})
+        metadata['tags'] = new_tags
+        return self._persist_update(key)
+    
+    def _persist_update(self, key: str) -> bool:
+        """Write changed metadata of one bookmark to storage."""
+        self._system_keys.discard(key)
+        if self._deferred():
+            return True
+        try:
+            self.storage().update(key, self.marks_metadata[key], self.marks_metadata)
+        except Exception:
+            return False
+        self._after_write()
+        return True
+    
+    def _persist_delete(self, key: str) -> bool:
+        """Remove one bookmark from storage."""
+        self._system_keys.discard(key)
+        if self._deferred():
+            return True
+        try:
+            self.storage().delete(key, self.marks_metadata)
+        except Exception:
+            return False
+        self._after_write()
         return True
     
+    @_locked
     def _rewrite_marks_file(self):
         """Rewrite the marks file with current metadata."""
+        if self._deferred():
+            # Entries from /etc/markrc become part of the user's store, as below
+            self._system_keys.clear()
+            return True
         try:
-            with open(self.rc, 'w') as file:
-                for key, metadata in self.marks_metadata.items():
-                    path = metadata['path']
-                    category = metadata.get('category')
-                    tags = metadata.get('tags', [])
-                    
-                    if category or tags:
-                        # New format with metadata
-                        line = f"{key}:{path}"
-                        if category:
-                            line += f"|category:{category}"
-                        if tags:
-                            line += f"|tags:{','.join(tags)}"
-                        file.write(f"{line}\n")
-                    else:
-                        # Old format for backward compatibility
-                        file.write(f"{key}:{path}\n")
+            self.storage().write_all(self.marks_metadata)
+        except Exception:
+            return False
+        # Entries from /etc/markrc are now part of the user's store as well
+        self._system_keys.clear()
+        self._after_write()
+        return True
+    
+    @contextmanager
+    def _write_lock(self):
+        """Hold the inter-process write lock for a read-modify-write of the store.
+        
+        If another process changed the store since it was read, the state is
+        re-read under the lock first, so the change is applied to the latest
+        bookmarks and nothing written meanwhile is lost. Reentrant.
+        
+        The identities of paths bookmarked meanwhile are recorded (see
+        dirmarks.relocate) once the lock is released, so a slow mount does
+        not hold it.
+        """
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        
+        self._unidentified = []
+        with locking.FileLock(locking.lock_path(self.rc)):
+            self._lock_depth = 1
+            try:
+                self.refresh()
+                yield
+            finally:
+                self._lock_depth = 0
+        if self._unidentified:
+            live = {entry.get('path') for entry in self.marks_metadata.values()}
+            relocate.remember(self.rc, self._unidentified, live)
+            self._unidentified = []
+    
+    def _deferred(self) -> bool:
+        """Record a pending change if inside batch(); True means do not write now."""
+        if self._batch_depth:
+            self._batch_dirty = True
             return True
+        return False
+    
+    @contextmanager
+    def batch(self):
+        """Apply changes in memory and write them out once, atomically, at the end.
+        
+            with marks.batch():
+                marks.add_mark('a', '/srv/a')
+                marks.del_mark('b')
+        
+        Mutators return as usual but nothing is persisted until the
+        outermost batch exits, when the user's bookmarks are written with a
+        single write_all. If the block raises, the in-memory changes are
+        rolled back and nothing is written. Batches nest. The write lock is
+        held for the whole block.
+        """
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            return
+        
+        with self._write_lock():
+            saved = (dict(self.marks),
+                     {key: dict(metadata) for key, metadata in self.marks_metadata.items()},
+                     list(self.list), set(self._system_keys), list(self._unidentified))
+            self._batch_depth = 1
+            self._batch_dirty = False
+            try:
+                yield self
+            except BaseException:
+                (self.marks, self.marks_metadata, self.list, self._system_keys,
+                 self._unidentified) = saved
+                raise
+            finally:
+                self._batch_depth = 0
+            
+            if self._batch_dirty:
+                self._batch_dirty = False
+                self.storage().write_all({key: metadata for key, metadata in self.marks_metadata.items()
+                                          if key not in self._system_keys})
+                self._after_write()
+    
+    def bulk_add(self, entries, verify: bool = True) -> int:
+        """Add many bookmarks with a single write; return how many were added.
+        
+        Each entry is a (key, path) or (key, path, category, tags) tuple, as
+        taken by add_mark_with_metadata. Invalid entries are skipped; paths
+        are checked before the batch takes the write lock.
+        """
+        entries = list(entries)
+        if verify:
+            entries = [entry for entry in entries if self.verify_path(entry[1]) == pathcheck.OK]
+        added = 0
+        with self.batch():
+            for entry in entries:
+                if self.add_mark_with_metadata(*entry, verify=False):
+                    added += 1
+        return added
+    
+    def discover(self, root: str, match: str = scan.DEFAULT_MATCH, depth: int = scan.DEFAULT_DEPTH,
+                 category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Bookmark the directories under root that hold an entry matching match.
+        
+        See dirmarks.scan for the walk and how keys are derived; category
+        'auto' names each bookmark's category after its place under root.
+        Directories already bookmarked are left alone. Everything is added
+        with a single write; the added bookmarks are returned.
+        """
+        found = scan.find(root, match, depth)
+        existing_paths = {entry.get('path') for entry in self.marks_metadata.values()}
+        added = []
+        with self.batch():
+            for entry in scan.plan(found, self.marks, existing_paths, root, category):
+                if self.add_mark_with_metadata(*entry, verify=False):
+                    added.append(entry[0])
+        return [self._entry(key) for key in added]
+    
+    def bulk_delete(self, keys) -> int:
+        """Delete many bookmarks with a single write; return how many were deleted."""
+        deleted = 0
+        with self.batch():
+            for key in keys:
+                if self.del_mark(key):
+                    deleted += 1
+        return deleted
+    
+    def check(self, timeout: float = pathcheck.DEFAULT_TIMEOUT,
+              workers: int = pathcheck.DEFAULT_WORKERS) -> List[Dict[str, Any]]:
+        """Bookmarks whose path is not a usable directory, each with its 'status'.
+        
+        Paths are probed concurrently and each gets timeout seconds to
+        answer (see dirmarks.pathcheck), so a dead mount cannot stall the run.
+        The identities of the directories that answered are recorded for
+        relocate_missing.
+        """
+        statuses = pathcheck.check_paths((entry.get('path', '') for entry in self.marks_metadata.values()),
+                                         timeout, workers)
+        self._record_identities(statuses)
+        return [{**self._entry(key), 'status': statuses[entry.get('path', '')]}
+                for key, entry in self.marks_metadata.items()
+                if statuses[entry.get('path', '')] != pathcheck.OK]
+    
+    def _record_identities(self, statuses: Dict[str, str]) -> Dict[str, Any]:
+        """Rewrite the identity table from the paths that answered OK; return it.
+        
+        Identities of paths that did not answer are kept, as those are the
+        ones relocate_missing needs; paths no longer bookmarked are dropped.
+        """
+        bookmarked = {entry.get('path') for entry in self.marks_metadata.values()}
+        table = {path: identity for path, identity in relocate.identities(self.rc).items()
+                 if path in bookmarked}
+        for path, status in statuses.items():
+            if status == pathcheck.OK:
+                identity = pathcheck.identify(path)
+                if identity is not None:
+                    table[path] = identity
+        relocate.save(self.rc, table)
+        return table
+    
+    def relocate_missing(self, depth: int = relocate.DEFAULT_DEPTH,
+                         timeout: float = pathcheck.DEFAULT_TIMEOUT,
+                         workers: int = pathcheck.DEFAULT_WORKERS) -> List[Dict[str, Any]]:
+        """Point bookmarks of missing directories at where those directories went.
+        
+        Only bookmarks whose identity was recorded before the move can be
+        found (see dirmarks.relocate). All moves are written at once; each
+        relocated bookmark is returned with its 'old_path'.
+        """
+        statuses = pathcheck.check_paths((entry.get('path', '') for entry in self.marks_metadata.values()),
+                                         timeout, workers)
+        table = self._record_identities(statuses)
+        missing = {path: table[path] for path, status in statuses.items()
+                   if status == pathcheck.MISSING and path in table}
+        if not missing:
+            return []
+        moved = relocate.find_moved(missing, depth, workers=workers)
+        relocated = []
+        with self.batch():
+            for key, entry in list(self.marks_metadata.items()):
+                old_path = entry.get('path')
+                target = moved.get(old_path)
+                if target and '|' not in target and self.move_mark(key, target):
+                    relocated.append((key, old_path))
+        return [{**self._entry(key), 'old_path': old_path} for key, old_path in relocated]
+    
+    def rewrite_prefix(self, old: str, new: str, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Move every bookmark at or below old to the same place below new.
+        
+        Affected bookmarks are taken from the path index, and all of them
+        are written at once, keeping their metadata. The new paths are not
+        checked, so a volume can be remapped before it is mounted. With
+        dry_run nothing changes. Each bookmark is returned as it would be
+        or was rewritten, with its 'old_path'.
+        """
+        old = os.path.normpath(os.path.abspath(old))
+        new = os.path.normpath(os.path.abspath(new))
+        index = self._indexes()
+        moves = []
+        for key in index.ordered(index.paths.subtree(old)):
+            path = self.marks_metadata[key]['path']
+            target = join_subpath(new, os.path.relpath(path, old))
+            if target != path and '|' not in target:
+                moves.append((key, path, target))
+        if not dry_run:
+            with self.batch():
+                moves = [(key, path, target) for key, path, target in moves
+                         if self.move_mark(key, target)]
+        return [{**self._entry(key), 'path': target, 'old_path': path} for key, path, target in moves]
+    
+    @_locked
+    def compact(self) -> bool:
+        """Fold pending changes into the backend's base store.
+        
+        This folds the journal into ~/.markrc for the journal backend and
+        checkpoints and vacuums the database for SQLite; plain text has
+        nothing to compact.
+        """
+        backend = self.storage()
+        if not hasattr(backend, 'compact'):
+            return True
+        try:
+            backend.compact()
+        except Exception:
+            return False
+        self._after_write()
+        return True
+    
+    def migrate_storage(self, target: str) -> bool:
+        """Copy the user's bookmarks to another backend and make it the configured one.
+        
+        Bookmarks only defined in /etc/markrc are not copied. The current
+        store is compacted first so that no stale journal is left behind; an
+        SQLite database is then left in place, while the text and journal
+        backends share ~/.markrc, which migrating to either rewrites.
+        """
+        if target not in storage.BACKENDS:
+            return False
+        if not self.compact():
+            return False
+        entries = {key: metadata for key, metadata in self.marks_metadata.items()
+                   if key not in self._system_keys}
+        destination = storage.open_storage(target, self.rc)
+        try:
+            destination.write_all(entries)
         except Exception:
             return False
+        finally:
+            if hasattr(destination, 'close'):
+                destination.close()
+        self.backend = target
+        self.save_config()
+        return True
     
     def set_category_color(self, category: str, color: str):
         """Set the color for a category."""
@@ -307,42 +1112,26 @@ class MarksEnhanced:
     
     def list_all_categories(self) -> List[str]:
         """List all unique categories in use."""
-        categories = set()
-        for metadata in self.marks_metadata.values():
-            if metadata.get('category'):
-                categories.add(metadata['category'])
-        return sorted(list(categories))
+        return list(self.get_category_stats())
     
     def list_all_tags(self) -> List[str]:
         """List all unique tags in use."""
-        tags = set()
-        for metadata in self.marks_metadata.values():
-            for tag in metadata.get('tags', []):
-                tags.add(tag)
-        return sorted(list(tags))
+        return sorted(self._indexes().tags.keys_by_tag)
     
     def get_category_stats(self) -> Dict[str, int]:
         """Get usage statistics for categories."""
-        stats = {}
-        for metadata in self.marks_metadata.values():
-            category = metadata.get('category')
-            if category:
-                stats[category] = stats.get(category, 0) + 1
-        return dict(sorted(stats.items()))
+        return self._indexes().categories.counts()
     
     def get_tag_stats(self) -> Dict[str, int]:
         """Get usage statistics for tags."""
-        stats = {}
-        for metadata in self.marks_metadata.values():
-            for tag in metadata.get('tags', []):
-                stats[tag] = stats.get(tag, 0) + 1
-        return dict(sorted(stats.items()))
+        return self._indexes().tags.counts()
     
     def list_marks(self):
         """List all marks (backward compatible)."""
         for i, mark in enumerate(self.list):
             print(f"{i} => {mark}")
     
+    @_locked
     def del_mark(self, key: str) -> bool:
         """Delete a bookmark (backward compatible)."""
         if key.isdigit():
@@ -358,25 +1147,50 @@ class MarksEnhanced:
             return False
         
         # Remove from all data structures
-        del self.marks[key]
-        if key in self.marks_metadata:
-            del self.marks_metadata[key]
+        self._drop_entry(key)
         
         # Remove from list
         self.list = [line for line in self.list if not line.startswith(f"{key}:")]
         
-        # Rewrite file
-        return self._rewrite_marks_file()
+        return self._persist_delete(key)
     
-    def add_mark(self, key: str, path: str) -> bool:
+    def add_mark(self, key: str, path: str, verify: bool = True) -> bool:
         """Add a bookmark without metadata (backward compatible)."""
-        return self.add_mark_with_metadata(key, path)
+        return self.add_mark_with_metadata(key, path, verify=verify)
     
-    def update_mark(self, key: str, path: str) -> bool:
-        """Update a bookmark's path (backward compatible)."""
-        if self.del_mark(key):
-            return self.add_mark_with_metadata(key, path)
-        return False
+    def update_mark(self, key: str, path: str, verify: bool = True, category: Optional[str] = None,
+                    tags: Optional[List[str]] = None) -> bool:
+        """Update a bookmark's path, and its category and tags (backward compatible).
+        
+        The new path is checked, outside the write lock, before the old
+        entry is removed, so a path that fails verification leaves the
+        bookmark as it was. The entry is then replaced under one lock.
+        """
+        if verify and self.verify_path(path) != pathcheck.OK:
+            return False
+        return self._replace_mark(key, path, category, tags)
+    
+    @_locked
+    def _replace_mark(self, key: str, path: str, category: Optional[str] = None,
+                      tags: Optional[List[str]] = None) -> bool:
+        if category and not self.is_valid_category(category):
+            return False
+        return self.del_mark(key) and self.add_mark_with_metadata(key, path, category, tags, verify=False)
+    
+    @_locked
+    def move_mark(self, key: str, path: str) -> bool:
+        """Point a bookmark at another path, keeping its metadata and list position."""
+        if key not in self.marks_metadata:
+            return False
+        abs_path = os.path.abspath(path)
+        metadata = self.marks_metadata[key]
+        old_line = f"{key}:{metadata['path']}"
+        self._reindex(key, dict(metadata), {**metadata, 'path': abs_path})
+        metadata['path'] = abs_path
+        self.marks[key] = abs_path
+        self.list = [f"{key}:{abs_path}" if line == old_line else line for line in self.list]
+        self._unidentified.append(abs_path)
+        return self._persist_update(key)
 
 
 # Create a compatibility layer for the original Marks class
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+In-memory indexes over bookmark metadata for MarksEnhanced.
+
+TagIndex maps every tag to the set of bookmark keys carrying it.
+CategoryTrie arranges hierarchical categories (work/web/frontend) and
+PathTrie bookmark paths in tries with per-node counts rolled up from the
+leaves. Filters, set queries and statistics then cost time proportional
+to the result instead of a scan over all bookmarks. MetadataIndex bundles
+them with the bookmark order used to return results and a sorted key list
+for prefix completion.
+"""
+
+import bisect
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class TagIndex:
+    """Tag -> keys carrying it, with per-tag occurrence counts."""
+
+    def __init__(self):
+        self.keys_by_tag: Dict[str, Set[str]] = {}
+        self.occurrences: Dict[str, int] = {}
+
+    def add(self, key: str, tags: Iterable[str]):
+        """Index the tags of a bookmark."""
+        for tag in tags:
+            self.keys_by_tag.setdefault(tag, set()).add(key)
+            self.occurrences[tag] = self.occurrences.get(tag, 0) + 1
+
+    def remove(self, key: str, tags: Iterable[str]):
+        """Drop the tags of a bookmark."""
+        for tag in tags:
+            keys = self.keys_by_tag.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            self.occurrences[tag] -= 1
+            if not self.occurrences[tag]:
+                del self.keys_by_tag[tag]
+                del self.occurrences[tag]
+
+    def keys(self, tag: str) -> Set[str]:
+        """Keys carrying tag (do not modify the returned set)."""
+        return self.keys_by_tag.get(tag, set())
+
+    def match(self, tags: List[str], match_all: bool = True) -> Set[str]:
+        """Keys carrying all (intersection) or any (union) of tags."""
+        sets = sorted((self.keys(tag) for tag in tags), key=len)
+        if not sets:
+            return set()
+        if match_all:
+            # Start from the smallest set; each step is bounded by its size
+            result = set(sets[0])
+            for keys in sets[1:]:
+                result &= keys
+                if not result:
+                    break
+            return result
+        return set().union(*sets)
+
+    def counts(self) -> Dict[str, int]:
+        """Tag -> number of occurrences, sorted by tag."""
+        return dict(sorted(self.occurrences.items()))
+
+
+class _TrieNode:
+    """One component of a category or path."""
+
+    __slots__ = ('children', 'keys', 'total')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.keys: Set[str] = set()   # bookmarks at exactly this node
+        self.total = 0                # bookmarks at this node and below
+
+
+def has_magic(part: str) -> bool:
+    return any(c in part for c in '*?[')
+
+
+def match_parts(pattern: List[str], parts: List[str]) -> bool:
+    """Glob-match component lists; '*' stays within a component, '**' spans any number."""
+    from fnmatch import fnmatchcase
+
+    if not pattern:
+        return not parts
+    head = pattern[0]
+    if head == '**':
+        return any(match_parts(pattern[1:], parts[i:]) for i in range(len(parts) + 1))
+    if not parts:
+        return False
+    if has_magic(head) and not fnmatchcase(parts[0], head):
+        return False
+    if not has_magic(head) and parts[0] != head:
+        return False
+    return match_parts(pattern[1:], parts[1:])
+
+
+class ComponentTrie:
+    """Trie over values split into components, with subtree totals kept up to date."""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def split(self, value: str) -> List[str]:
+        """Components of a value."""
+        return value.split('/')
+
+    def add(self, key: str, value: Optional[str]):
+        """Index a bookmark under value."""
+        if not value:
+            return
+        node = self.root
+        node.total += 1
+        for part in self.split(value):
+            node = node.children.setdefault(part, _TrieNode())
+            node.total += 1
+        node.keys.add(key)
+
+    def remove(self, key: str, value: Optional[str]):
+        """Drop a bookmark from under value, pruning nodes left empty."""
+        if not value:
+            return
+        path = [(None, self.root)]
+        for part in self.split(value):
+            node = path[-1][1].children.get(part)
+            if node is None:
+                return
+            path.append((part, node))
+        if key not in path[-1][1].keys:
+            return
+        path[-1][1].keys.discard(key)
+        for i in range(len(path) - 1, -1, -1):
+            part, node = path[i]
+            node.total -= 1
+            if i and not node.total:
+                del path[i - 1][1].children[part]
+
+    def _find(self, value: str) -> Optional[_TrieNode]:
+        node = self.root
+        for part in self.split(value):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def deepest(self, value: str) -> Tuple[int, Set[str]]:
+        """(components matched, keys) of the deepest node on value's path holding keys.
+        
+        (0, set()) when no prefix of value holds any; keys at the root (the
+        value with no components, e.g. the path '/') count as 0 matched.
+        """
+        node = self.root
+        best = (0, node.keys)
+        for depth, part in enumerate(self.split(value), 1):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.keys:
+                best = (depth, node.keys)
+        return best
+
+    def keys(self, value: str) -> Set[str]:
+        """Keys stored under exactly value (do not modify the returned set)."""
+        node = self._find(value)
+        return node.keys if node is not None else set()
+
+    @staticmethod
+    def _collect(node: _TrieNode, result: Set[str]):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            result |= node.keys
+            stack.extend(node.children.values())
+
+    def subtree(self, value: str) -> Set[str]:
+        """Keys under value and everything below it."""
+        node = self._find(value) if value else self.root
+        result: Set[str] = set()
+        if node is not None:
+            self._collect(node, result)
+        return result
+
+    def glob(self, pattern: str) -> Set[str]:
+        """Keys whose value matches pattern component-wise (see match_parts).
+
+        Literal components are looked up directly and only children of the
+        nodes reached are tested against wildcards, so the cost follows the
+        part of the trie the pattern can match.
+        """
+        from fnmatch import fnmatchcase
+
+        parts = self.split(pattern)
+        result: Set[str] = set()
+        seen = set()
+        stack = [(self.root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if (id(node), i) in seen:
+                continue
+            seen.add((id(node), i))
+            if i == len(parts):
+                result |= node.keys
+                continue
+            part = parts[i]
+            if part == '**':
+                if i == len(parts) - 1:
+                    self._collect(node, result)
+                    continue
+                stack.append((node, i + 1))
+                stack.extend((child, i) for child in node.children.values())
+            elif has_magic(part):
+                stack.extend((child, i + 1) for name, child in node.children.items()
+                             if fnmatchcase(name, part))
+            elif part in node.children:
+                stack.append((node.children[part], i + 1))
+        return result
+
+    def estimate(self, pattern: str) -> Optional[int]:
+        """Upper bound on the number of glob matches from the literal prefix, if any."""
+        node = self.root
+        for part in self.split(pattern):
+            if part == '**' or has_magic(part):
+                return node.total
+            node = node.children.get(part)
+            if node is None:
+                return 0
+        return len(node.keys)
+
+    def walk(self) -> Iterator[Tuple[str, int, int, int]]:
+        """Yield (value, depth, own count, subtree count) in sorted pre-order."""
+        return self._walk(self.root, '', 0)
+
+    def _walk(self, node: _TrieNode, prefix: str, depth: int):
+        for part in sorted(node.children):
+            child = node.children[part]
+            value = f"{prefix}{part}"
+            yield value, depth, len(child.keys), child.total
+            yield from self._walk(child, f"{value}/", depth + 1)
+
+
+class CategoryTrie(ComponentTrie):
+    """Hierarchical categories (work/web/frontend) split on '/'."""
+
+    def counts(self) -> Dict[str, int]:
+        """Category -> number of bookmarks in exactly that category, sorted."""
+        return dict(sorted((category, own) for category, _, own, _ in self.walk() if own))
+
+
+class PathTrie(ComponentTrie):
+    """Absolute directory paths split into their components."""
+
+    def split(self, value: str) -> List[str]:
+        return [part for part in value.split('/') if part]
+
+
+class MetadataIndex:
+    """Tag, category and path indexes over a marks_metadata dict, plus bookmark order.
+
+    The index remembers which metadata dict it was built from; MarksEnhanced
+    rebuilds it when that dict has been replaced (reload, snapshot restore,
+    batch rollback) and otherwise keeps it current through add and remove.
+    """
+
+    def __init__(self, metadata: Dict[str, Dict[str, Any]]):
+        self.source = metadata
+        self.tags = TagIndex()
+        self.categories = CategoryTrie()
+        self.paths = PathTrie()
+        # Position of each key in metadata, to return results in bookmark order
+        self.rank: Dict[str, int] = {}
+        self.next_rank = 0
+        self.names: List[str] = []  # sorted keys, for complete()
+        # Lowercased (key, path) by key in bookmark order, for multi-token jumps
+        self.folded: Dict[str, Tuple[str, str]] = {}
+        for key, entry in metadata.items():
+            self.add(key, entry)
+
+    def add(self, key: str, entry: Dict[str, Any]):
+        """Index a bookmark; a key seen for the first time goes last in order."""
+        if key not in self.rank:
+            self.rank[key] = self.next_rank
+            self.next_rank += 1
+            bisect.insort(self.names, key)
+        self.tags.add(key, entry.get('tags', []))
+        self.categories.add(key, entry.get('category'))
+        self.paths.add(key, entry.get('path'))
+        self.folded[key] = (key.lower(), (entry.get('path') or '').lower())
+
+    def remove(self, key: str, entry: Dict[str, Any], forget: bool = True):
+        """Unindex a bookmark; forget=False keeps its position for a re-add."""
+        self.tags.remove(key, entry.get('tags', []))
+        self.categories.remove(key, entry.get('category'))
+        self.paths.remove(key, entry.get('path'))
+        if forget and self.rank.pop(key, None) is not None:
+            del self.names[bisect.bisect_left(self.names, key)]
+            self.folded.pop(key, None)
+
+    def complete(self, prefix: str) -> List[str]:
+        """Keys starting with prefix, sorted."""
+        start = bisect.bisect_left(self.names, prefix)
+        end = start
+        while end < len(self.names) and self.names[end].startswith(prefix):
+            end += 1
+        return self.names[start:end]
+
+    def ordered(self, keys: Iterable[str]) -> List[str]:
+        """Keys sorted into bookmark order."""
+        return sorted(keys, key=self.rank.__getitem__)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Checking bookmarked directories without hanging on dead mounts.
+
+A stat on an unresponsive NFS or SSHFS mount can block for minutes and
+cannot be interrupted, so probes run on daemon threads and the caller
+only waits for each until its deadline: a probe still running then is
+reported as timed out and its thread abandoned (it never delays exit).
+Once a path has timed out, other paths on the same mount point, taken
+from /proc/self/mounts without touching the filesystems, are reported as
+timed out without being probed, so one dead server costs one timeout
+rather than one per bookmark (the root filesystem is never written off).
+verify_dir applies the same deadline to the single check made when a
+bookmark is added, and notes each mount's answer in the runtime directory
+so that the next dirmarks process knows too which mounts recently hung.
+"""
+
+import os
+import re
+import stat
+import time
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dirmarks.fileutil import atomic_write
+from dirmarks.locking import private_dir, runtime_dir
+
+# Probe results
+OK = 'ok'
+MISSING = 'missing'
+NOT_DIR = 'not a directory'
+DENIED = 'permission denied'
+TIMED_OUT = 'timed out'
+ERROR = 'error'
+
+# Seconds a single path may take to answer
+DEFAULT_TIMEOUT = 2.0
+
+# Probes in flight at once, not counting abandoned ones
+DEFAULT_WORKERS = 16
+
+MOUNTS_FILE = '/proc/self/mounts'
+
+# Seconds verify_dir takes a mount that timed out to be still hung
+HEALTH_TTL = 60.0
+
+# Mount points as read by this process
+_mounts: Optional[List[str]] = None
+
+_OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def probe(path: str) -> str:
+    """Status of path as a bookmark target: a directory the user can enter."""
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return MISSING
+    except PermissionError:
+        return DENIED
+    except OSError:
+        return ERROR
+    if not stat.S_ISDIR(st.st_mode):
+        return NOT_DIR
+    if not os.access(path, os.X_OK):
+        return DENIED
+    return OK
+
+
+def identify(path: str) -> Optional[Tuple[int, int]]:
+    """(st_dev, st_ino) of path, which stay the same when a directory is renamed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def mount_points() -> List[str]:
+    """Mount points from the kernel's table, longest first; empty if unavailable."""
+    try:
+        with open(MOUNTS_FILE) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return []
+    points = set()
+    for line in lines:
+        fields = line.split()
+        if len(fields) > 1:
+            points.add(_OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), fields[1]))
+    return sorted(points, key=len, reverse=True)
+
+
+def mount_of(path: str, points: List[str]) -> Optional[str]:
+    """The mount point path lives on, by prefix (points as from mount_points)."""
+    for point in points:
+        if path == point or path.startswith(point.rstrip('/') + '/'):
+            return point
+    return None
+
+
+def health_file() -> str:
+    """File in the runtime directory holding verify_dir's recent answers per mount."""
+    return os.path.join(runtime_dir(), 'dirmarks-mounts')
+
+
+def mount_health() -> Dict[str, Tuple[bool, float]]:
+    """mount -> (answered, time.time() of the check), for checks within HEALTH_TTL.
+    
+    Lines are "answered<TAB>time<TAB>mount"; damaged ones are skipped.
+    """
+    try:
+        with open(health_file(), encoding='utf-8') as file:
+            lines = file.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return {}
+    now = time.time()
+    health = {}
+    for line in lines:
+        fields = line.split('\t', 2)
+        try:
+            answered, when, mount = fields[0] == '1', float(fields[1]), fields[2]
+        except (IndexError, ValueError):
+            continue
+        if 0 <= now - when < HEALTH_TTL:
+            health[mount] = (answered, when)
+    return health
+
+
+def _note_health(mount: str, answered: bool):
+    """Record a mount's answer for other processes, dropping expired entries."""
+    if '\n' in mount:
+        return
+    health = mount_health()
+    health[mount] = (answered, time.time())
+    data = ''.join(f"{int(ok)}\t{when:.3f}\t{point}\n" for point, (ok, when) in health.items())
+    try:
+        private_dir(runtime_dir())
+        atomic_write(health_file(), data, mode=0o600)
+    except OSError:
+        # Without the note the next process just probes again
+        pass
+
+
+def verify_dir(path: str, timeout: float = DEFAULT_TIMEOUT) -> str:
+    """Probe a single path, giving up after timeout seconds.
+    
+    Answers are remembered per mount point for HEALTH_TTL seconds, across
+    processes (see mount_health). A mount that answered can hang the next
+    moment, so every probe has its deadline; only a mount that recently
+    timed out is not probed again, so adding many bookmarks under a dead
+    tree pays for one timeout. Like check_paths, the root filesystem is
+    never written off.
+    """
+    global _mounts
+    if _mounts is None:
+        _mounts = mount_points()
+    mount = mount_of(path, _mounts)
+    health = mount_health().get(mount) if mount is not None else None
+    if health is not None and not health[0]:
+        return TIMED_OUT
+    status = check_paths([path], timeout, 1)[path]
+    if mount is not None and mount != '/':
+        _note_health(mount, status != TIMED_OUT)
+    return status
+
+
+def identify_all(paths: Iterable[str], timeout: float = DEFAULT_TIMEOUT) -> Dict[str, Tuple[int, int]]:
+    """Identities of those paths that can be stat'ed, without hanging on dead mounts.
+    
+    Paths on a mount that recently timed out (see mount_health) are
+    skipped. The others are stat'ed on a daemon thread that is given
+    timeout seconds, as a mount that answered can hang the next moment;
+    the paths it has not reached by then are left out.
+    """
+    global _mounts
+    if _mounts is None:
+        _mounts = mount_points()
+    health = mount_health()
+    pending = [path for path in dict.fromkeys(paths)
+               if health.get(mount_of(path, _mounts), (True,))[0]]
+    if not pending:
+        return {}
+    found: List[Tuple[str, Tuple[int, int]]] = []
+
+    def run():
+        for path in pending:
+            identity = identify(path)
+            if identity is not None:
+                found.append((path, identity))
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(timeout)
+    return dict(found[:])
+
+
+def check_paths(paths: Iterable[str], timeout: float = DEFAULT_TIMEOUT,
+                workers: int = DEFAULT_WORKERS) -> Dict[str, str]:
+    """Probe paths concurrently; map each to its status, TIMED_OUT past its deadline."""
+    import queue
+    pending = deque(dict.fromkeys(paths))
+    points = mount_points()
+    results: Dict[str, str] = {}
+    running: Dict[str, float] = {}  # path -> deadline
+    hung = set()
+    done = queue.Queue()
+
+    def run(path):
+        done.put((path, probe(path)))
+
+    while pending or running:
+        while pending and len(running) < workers:
+            path = pending.popleft()
+            mount = mount_of(path, points)
+            if mount is not None and mount in hung:
+                results[path] = TIMED_OUT
+                continue
+            running[path] = time.monotonic() + timeout
+            threading.Thread(target=run, args=(path,), daemon=True).start()
+        if not running:
+            break
+        try:
+            path, status = done.get(timeout=max(0.0, min(running.values()) - time.monotonic()))
+            if running.pop(path, None) is not None:
+                results[path] = status
+        except queue.Empty:
+            now = time.monotonic()
+            for path, deadline in list(running.items()):
+                if deadline <= now:
+                    del running[path]
+                    results[path] = TIMED_OUT
+                    mount = mount_of(path, points)
+                    if mount is not None and mount != '/':
+                        hung.add(mount)
+    return results
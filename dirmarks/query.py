@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Boolean queries over bookmark metadata.
+
+    category:work/** AND tag:urgent AND NOT tag:deprecated AND path:/srv/*
+
+Terms are field:value with field one of tag, category or path. Values may
+use glob patterns matched component by component: '*' stays within one
+component, '**' spans any number of them, and a trailing '/' is short
+for '/**'. Terms combine with AND (also implied between adjacent terms),
+OR, NOT and parentheses; NOT binds tightest, then AND, then OR. Quote
+values containing spaces or parentheses: path:"/srv/my project".
+
+A query is compiled to set algebra over the tag index and the category
+and path tries of a MetadataIndex. Conjunctions start from the term with
+the smallest estimated result; once the candidates are fewer than a
+term's estimate, that term is checked per candidate instead of being
+materialized, so a selective term keeps the whole query cheap.
+"""
+
+import os
+import re
+from fnmatch import fnmatchcase
+from typing import List, Set, Union
+
+from dirmarks.metaindex import MetadataIndex, has_magic, match_parts
+
+FIELDS = ('tag', 'category', 'path')
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|((?:[^\s()"]|"[^"]*")+))')
+
+
+class QueryError(ValueError):
+    """Raised for a query that cannot be parsed."""
+
+
+class Term:
+    """field:value.
+
+    Term, Not, And and Or each answer estimate (an upper bound on the
+    number of matches), evaluate (the keys of all matches) and matches
+    (whether one bookmark matches).
+    """
+
+    def __init__(self, field: str, value: str):
+        if value.endswith('/') and value.strip('/'):
+            value += '**'
+        if field == 'path':
+            value = os.path.expanduser(value) if value.startswith('~') else value
+        self.field = field
+        self.value = value
+
+    def __repr__(self):
+        return f"{self.field}:{self.value}"
+
+    def _trie(self, index: MetadataIndex):
+        return index.categories if self.field == 'category' else index.paths
+
+    def estimate(self, index: MetadataIndex) -> int:
+        if self.field == 'tag':
+            if has_magic(self.value):
+                return len(index.source)
+            return len(index.tags.keys(self.value))
+        return self._trie(index).estimate(self.value)
+
+    def evaluate(self, index: MetadataIndex) -> Set[str]:
+        if self.field == 'tag':
+            if has_magic(self.value):
+                keys: Set[str] = set()
+                for tag, tagged in index.tags.keys_by_tag.items():
+                    if fnmatchcase(tag, self.value):
+                        keys |= tagged
+                return keys
+            return set(index.tags.keys(self.value))
+        return self._trie(index).glob(self.value)
+
+    def matches(self, index: MetadataIndex, key: str) -> bool:
+        entry = index.source[key]
+        if self.field == 'tag':
+            if has_magic(self.value):
+                return any(fnmatchcase(tag, self.value) for tag in entry.get('tags', []))
+            return self.value in entry.get('tags', [])
+        value = entry.get(self.field)
+        if not value:
+            return False
+        trie = self._trie(index)
+        return match_parts(trie.split(self.value), trie.split(value))
+
+
+class Not:
+    """NOT expression."""
+
+    def __init__(self, child: 'Node'):
+        self.child = child
+
+    def __repr__(self):
+        return f"NOT {self.child!r}"
+
+    def estimate(self, index):
+        return len(index.source)
+
+    def evaluate(self, index):
+        return set(index.source).difference(self.child.evaluate(index))
+
+    def matches(self, index, key):
+        return not self.child.matches(index, key)
+
+
+class And:
+    """Conjunction, evaluated from the most selective positive term."""
+
+    def __init__(self, children: List['Node']):
+        self.children = children
+
+    def __repr__(self):
+        return f"({' AND '.join(map(repr, self.children))})"
+
+    def estimate(self, index):
+        return min(child.estimate(index) for child in self.children)
+
+    def evaluate(self, index):
+        positive = [c for c in self.children if not isinstance(c, Not)]
+        negative = [c.child for c in self.children if isinstance(c, Not)]
+        if positive:
+            ranked = sorted(((c.estimate(index), i, c) for i, c in enumerate(positive)),
+                            key=lambda item: item[:2])
+            result = ranked[0][2].evaluate(index)
+            rest = [(size, c) for size, _, c in ranked[1:]]
+        else:
+            result = set(index.source)
+            rest = []
+        rest += [(c.estimate(index), Not(c)) for c in negative]
+        for size, child in rest:
+            if not result:
+                break
+            if len(result) <= size:
+                result = {key for key in result if child.matches(index, key)}
+            elif isinstance(child, Not):
+                result -= child.child.evaluate(index)
+            else:
+                result &= child.evaluate(index)
+        return result
+
+    def matches(self, index, key):
+        return all(child.matches(index, key) for child in self.children)
+
+
+class Or:
+    """Disjunction."""
+
+    def __init__(self, children: List['Node']):
+        self.children = children
+
+    def __repr__(self):
+        return f"({' OR '.join(map(repr, self.children))})"
+
+    def estimate(self, index):
+        return min(len(index.source), sum(child.estimate(index) for child in self.children))
+
+    def evaluate(self, index):
+        result: Set[str] = set()
+        for child in self.children:
+            result |= child.evaluate(index)
+        return result
+
+    def matches(self, index, key):
+        return any(child.matches(index, key) for child in self.children)
+
+
+# A compiled query expression
+Node = Union[Term, Not, And, Or]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a query into parentheses and words, dropping quotes."""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            raise QueryError(f"unbalanced quote at position {pos}")
+        tokens.append(match.group(1) or match.group(2) or match.group(3).replace('"', ''))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the token list."""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ''
+
+    def keyword(self, word: str) -> bool:
+        if self.peek().upper() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise QueryError(f"unexpected '{self.peek()}'")
+        return node
+
+    def parse_or(self) -> Node:
+        children = [self.parse_and()]
+        while self.keyword('OR'):
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self) -> Node:
+        children = [self.parse_not()]
+        while True:
+            if self.keyword('AND'):
+                children.append(self.parse_not())
+            elif self.peek() and self.peek() != ')' and self.peek().upper() != 'OR':
+                children.append(self.parse_not())
+            else:
+                break
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_not(self) -> Node:
+        if self.keyword('NOT'):
+            return Not(self.parse_not())
+        token = self.peek()
+        if not token:
+            raise QueryError("unexpected end of query")
+        self.pos += 1
+        if token == '(':
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise QueryError("missing ')'")
+            self.pos += 1
+            return node
+        if token == ')' or token.upper() in ('AND', 'OR'):
+            raise QueryError(f"unexpected '{token}'")
+        field, sep, value = token.partition(':')
+        if not sep or field.lower() not in FIELDS or not value:
+            raise QueryError(f"expected {', '.join(f + ':<value>' for f in FIELDS)}, got '{token}'")
+        return Term(field.lower(), value)
+
+
+def parse(text: str) -> Node:
+    """Compile a query string; raises QueryError."""
+    return _Parser(tokenize(text)).parse()
+
+
+def run(text: str, index: MetadataIndex) -> List[str]:
+    """Keys matching a query, in bookmark order."""
+    return index.ordered(parse(text).evaluate(index))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Finding bookmarked directories again after they were renamed or moved.
+
+A rename or a move within one filesystem keeps a directory's
+(st_dev, st_ino), so that pair identifies a bookmarked directory wherever
+it went. Identities are kept per marks file in the state directory (see
+dirmarks.usage), not in ~/.markrc, whose lines stay readable by older
+versions. Whenever a bookmark is created or pointed elsewhere (add,
+update, scan, relocation, prefix rewrites) one `dev<TAB>ino<TAB>path`
+line is appended with a single O_APPEND write, creating the table the
+first time; `dirmarks --check` and `--relocate-missing` rewrite it from
+every bookmark that answered. Paths are identified as bounded as
+pathcheck.identify_all allows, so an unchecked path on a dead mount is
+simply not recorded.
+
+For bookmarks whose path is missing, find_moved climbs from the path to
+its nearest existing ancestor and CLIMB levels above it, then lists those
+directories breadth first, DEFAULT_DEPTH levels down, one level at a time
+on a thread pool, stopping once every identity is found. A directory is
+listed once however many bookmarks are looked for under it; os.scandir
+reports inode numbers without a stat, so only entries with a wanted
+inode are stat'ed to confirm the device. Symlinks are not followed and
+hidden directories and scan.IGNORED_DIRS are not entered.
+"""
+
+import os
+import zlib
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+from dirmarks import pathcheck, scan, usage
+from dirmarks.fileutil import atomic_write
+
+# Levels searched below each starting directory
+DEFAULT_DEPTH = 3
+
+# Levels climbed above the nearest existing ancestor of a missing path
+CLIMB = 1
+
+DEFAULT_WORKERS = 16
+
+# Bytes of a table line besides its path: device, inode, two tabs, newline
+LINE_BYTES = 24
+
+
+def identity_file(rc: str) -> str:
+    """Path of the identity table for the marks file rc."""
+    return os.path.join(usage.state_dir(), f"inodes-{zlib.crc32(rc.encode()):08x}")
+
+
+def remember(rc: str, paths: Iterable[str], live: Optional[Collection[str]] = None):
+    """Append the identities of paths, creating the table if needed; errors are ignored.
+    
+    With live, the paths currently bookmarked, a table grown past twice
+    their size is rewritten with only the last line of each live path, so
+    one that is edited often stays bounded.
+    """
+    found = pathcheck.identify_all(path for path in paths if '\n' not in path)
+    if not found:
+        return
+    data = ''.join(f"{dev}\t{ino}\t{path}\n" for path, (dev, ino) in found.items())
+    try:
+        os.makedirs(usage.state_dir(), mode=0o700, exist_ok=True)
+        fd = os.open(identity_file(rc), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    except OSError:
+        return
+    try:
+        os.write(fd, data.encode('utf-8'))
+        size = os.fstat(fd).st_size
+    except OSError:
+        return
+    finally:
+        os.close(fd)
+    if live is not None and size > 2 * sum(len(path.encode('utf-8')) + LINE_BYTES for path in live):
+        # A line appended by another process meanwhile may be lost;
+        # --check records every bookmark again
+        save(rc, {path: identity for path, identity in identities(rc).items() if path in live})
+
+
+def identities(rc: str) -> Dict[str, Tuple[int, int]]:
+    """path -> (st_dev, st_ino) as last recorded."""
+    try:
+        with open(identity_file(rc), 'rb') as file:
+            data = file.read()
+    except OSError:
+        return {}
+    table = {}
+    for line in data.split(b'\n'):
+        fields = line.split(b'\t', 2)
+        if len(fields) != 3 or not fields[2]:
+            continue  # torn or empty line
+        try:
+            table[fields[2].decode('utf-8')] = (int(fields[0]), int(fields[1]))
+        except (ValueError, UnicodeDecodeError):
+            continue
+    return table
+
+
+def save(rc: str, table: Dict[str, Tuple[int, int]]) -> bool:
+    """Replace the identity table, creating it if needed."""
+    path = identity_file(rc)
+    data = ''.join(f"{dev}\t{ino}\t{target}\n" for target, (dev, ino) in table.items()
+                   if '\n' not in target)
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        atomic_write(path, data, mode=0o600)
+    except OSError:
+        return False
+    return True
+
+
+def search_root(path: str, climb: int = CLIMB) -> Optional[str]:
+    """Where to look for the moved path: climb levels above its nearest existing ancestor.
+
+    None if only the root directory exists, which is never searched.
+    """
+    current = os.path.dirname(path.rstrip('/'))
+    while current != '/' and not os.path.isdir(current):
+        current = os.path.dirname(current)
+    for _ in range(climb):
+        if os.path.dirname(current) == '/':
+            break
+        current = os.path.dirname(current)
+    return None if current == '/' else current
+
+
+def _list(path: str, inodes: frozenset, wanted: Dict[Tuple[int, int], List[str]]
+          ) -> Tuple[List[str], Dict[Tuple[int, int], str]]:
+    """(subdirectories to enter, wanted identities found among them)."""
+    subdirs = []
+    found = {}
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    if entry.inode() in inodes:
+                        st = entry.stat(follow_symlinks=False)
+                        if (st.st_dev, st.st_ino) in wanted:
+                            found[(st.st_dev, st.st_ino)] = entry.path
+                except OSError:
+                    continue
+                if not entry.name.startswith('.') and entry.name not in scan.IGNORED_DIRS:
+                    subdirs.append(entry.path)
+    except OSError:
+        return [], {}
+    return sorted(subdirs), found
+
+
+def find_moved(missing: Dict[str, Tuple[int, int]], depth: int = DEFAULT_DEPTH,
+               climb: int = CLIMB, workers: int = DEFAULT_WORKERS) -> Dict[str, str]:
+    """Map each missing path (with its recorded identity) to where it is now, if found."""
+    # Imported here: concurrent.futures pulls in logging, too slow for every `dir`
+    from concurrent.futures import ThreadPoolExecutor
+    wanted: Dict[Tuple[int, int], List[str]] = {}
+    budget: Dict[str, int] = {}  # directory -> levels left below it
+    for path, identity in missing.items():
+        wanted.setdefault(tuple(identity), []).append(path)
+        root = search_root(path, climb)
+        if root is not None:
+            budget[root] = max(budget.get(root, 0), depth)
+    inodes = frozenset(ino for _, ino in wanted)
+    located: Dict[Tuple[int, int], str] = {}
+    seen: Dict[str, int] = {}
+    level = sorted(budget.items())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while level and len(located) < len(wanted):
+            level = [(path, left) for path, left in level if seen.get(path, -1) < left]
+            seen.update(level)
+            listings = pool.map(lambda item: _list(item[0], inodes, wanted), level)
+            following = {}
+            for (path, left), (subdirs, found) in zip(level, listings):
+                for identity, target in found.items():
+                    located.setdefault(identity, target)
+                if left > 0:
+                    for subdir in subdirs:
+                        following[subdir] = max(following.get(subdir, 0), left - 1)
+            level = sorted(following.items())
+    return {path: target for identity, target in located.items() for path in wanted[identity]}
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Trigram index for fuzzy bookmark search.
+
+Every bookmark is broken into words (its key, the components of its path,
+its category and tags) and each word, padded with two leading blanks and
+one trailing blank, into trigrams. The index maps each trigram to the
+bookmarks containing it, as sorted array('I') buffers of document ids.
+A search only counts trigram overlaps for bookmarks appearing in the
+postings of the query's trigrams and rescores the best of those field by
+field, so its cost follows the candidates rather than the bookmark count.
+
+The postings are cached next to the parsed-state snapshot (same stamps,
+same size threshold) so a large store does not rebuild them per process.
+"""
+
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Relative weight of a match in each field
+FIELD_WEIGHTS = {'key': 1.0, 'basename': 0.9, 'category': 0.7, 'tag': 0.7, 'path': 0.6}
+
+# Candidates sharing fewer than this fraction of the best candidate's trigrams are not rescored
+CANDIDATE_RATIO = 0.5
+
+# Results scoring below this are dropped
+MIN_SCORE = 0.2
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def words(text: str) -> List[str]:
+    """Lowercased alphanumeric words of text."""
+    return _WORD.findall(text.lower())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of the words of text, padded like pg_trgm."""
+    result = set()
+    for word in words(text):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def fields(key: str, entry: Dict[str, Any]) -> Iterable[Tuple[str, str]]:
+    """(field, text) pairs of a bookmark that are searched."""
+    yield 'key', key
+    parts = [part for part in entry.get('path', '').split('/') if part]
+    if parts:
+        yield 'basename', parts[-1]
+        for part in parts[:-1]:
+            yield 'path', part
+    if entry.get('category'):
+        yield 'category', entry['category']
+    for tag in entry.get('tags', []):
+        yield 'tag', tag
+
+
+def similarity(query: str, query_grams: Set[str], text: str) -> float:
+    """Score in [0, 1] of text against the query.
+
+    The mean of how much of the query the text covers and the Jaccard
+    similarity, so partial words rank below whole ones; a text containing
+    the query verbatim scores at least 0.9.
+    """
+    grams = trigrams(text)
+    shared = len(query_grams & grams)
+    if not shared:
+        return 0.0
+    score = (shared / len(query_grams) + shared / len(query_grams | grams)) / 2
+    if query in text.lower():
+        score = max(score, 0.9 + 0.1 * (len(query) == len(text)))
+    return score
+
+
+class TrigramIndex:
+    """Trigram -> ids of bookmarks containing it."""
+
+    def __init__(self, metadata: Dict[str, Dict[str, Any]], state: Optional[Dict[str, Any]] = None):
+        self.source = metadata
+        self.keys: List[Optional[str]] = []  # id -> key; None once removed
+        self.ids: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+        if state is not None and state.get('keys') == list(metadata):
+            self._restore(state)
+        else:
+            for key, entry in metadata.items():
+                self.add(key, entry)
+
+    def add(self, key: str, entry: Dict[str, Any]):
+        """Index a bookmark under a new id, so postings stay sorted."""
+        doc = len(self.keys)
+        self.keys.append(key)
+        self.ids[key] = doc
+        grams = set()
+        for _, text in fields(key, entry):
+            grams |= trigrams(text)
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('I')
+            posting.append(doc)
+
+    def remove(self, key: str):
+        """Forget a bookmark; its id stays in the postings and is skipped."""
+        doc = self.ids.pop(key, None)
+        if doc is not None:
+            self.keys[doc] = None
+
+    def state(self) -> Dict[str, Any]:
+        """Compacted, marshal-able form for the cache."""
+        if len(self.ids) != len(self.keys):
+            return TrigramIndex(self.source).state()
+        return {
+            'keys': list(self.keys),
+            'postings': {gram: posting.tobytes() for gram, posting in self.postings.items()},
+        }
+
+    def _restore(self, state: Dict[str, Any]):
+        self.keys = list(state['keys'])
+        self.ids = {key: doc for doc, key in enumerate(self.keys)}
+        for gram, data in state['postings'].items():
+            posting = self.postings[gram] = array('I')
+            posting.frombytes(data)
+
+    def search(self, text: str, limit: int = 10) -> List[Tuple[float, str]]:
+        """Best (score, key) matches for text, highest score first."""
+        query = ' '.join(words(text))
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        counts: Dict[int, int] = {}
+        for gram in query_grams:
+            for doc in self.postings.get(gram, ()):
+                counts[doc] = counts.get(doc, 0) + 1
+        for doc in [doc for doc in counts if self.keys[doc] is None]:
+            del counts[doc]
+        if not counts:
+            return []
+        cutoff = max(counts.values()) * CANDIDATE_RATIO
+        results = []
+        for doc, count in counts.items():
+            if count < cutoff:
+                continue
+            key = self.keys[doc]
+            entry = self.source[key]
+            score = max(FIELD_WEIGHTS[field] * similarity(query, query_grams, value)
+                        for field, value in fields(key, entry))
+            if score >= MIN_SCORE:
+                results.append((score, doc, key))
+        results.sort(key=lambda item: (-item[0], item[1]))
+        return [(round(score, 3), key) for score, _, key in results[:limit]]
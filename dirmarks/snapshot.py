@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Binary snapshot of parsed bookmark state.
+Stores what MarksEnhanced builds from the markrc files under
+$XDG_CACHE_HOME/dirmarks so that unchanged files load with a single read
+instead of being parsed line by line.
+"""
+
+import os
+import time
+import marshal
+import zlib
+from typing import Any, Dict, Optional
+
+from dirmarks.fileutil import atomic_write
+
+# Bump when the layout of the stored state changes
+SNAPSHOT_VERSION = 1
+
+# Below this many bytes of markrc, parsing is cheaper than maintaining a cache file
+MIN_SOURCE_BYTES = 64 * 1024
+
+# Files modified this recently may still change within the same mtime tick
+# without their stamp changing, so they are not snapshotted yet.
+RACY_WINDOW_NS = 1_000_000_000
+
+
+def cache_dir() -> str:
+    """Return the dirmarks cache directory ($XDG_CACHE_HOME/dirmarks)."""
+    base = os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        home = os.environ.get('HOME') or os.path.expanduser('~')
+        base = os.path.join(home, '.cache')
+    return os.path.join(base, 'dirmarks')
+
+
+def cache_path(rc: str, name: str) -> str:
+    """Return the path of a cache file belonging to the marks file rc."""
+    return os.path.join(cache_dir(), f"{name}-{zlib.crc32(rc.encode()):08x}")
+
+
+def enabled() -> bool:
+    """Caching can be switched off with DIRMARKS_NO_CACHE=1."""
+    return not os.environ.get('DIRMARKS_NO_CACHE')
+
+
+def worth_caching(stamps: tuple, just_written: bool = False) -> bool:
+    """Check that the sources are large enough and old enough to be cached safely.
+    
+    just_written skips the racy-mtime check for state we wrote ourselves a
+    moment ago and therefore know to match the files.
+    """
+    if not enabled():
+        return False
+    if sum(stamp[1] for stamp in stamps if stamp is not None) < MIN_SOURCE_BYTES:
+        return False
+    if just_written:
+        return True
+    now = time.time_ns()
+    for stamp in stamps:
+        if stamp is not None and now - stamp[2] < RACY_WINDOW_NS:
+            return False
+    return True
+
+
+def load(path: str, stamps: Optional[tuple]) -> Optional[Dict[str, Any]]:
+    """Return the stored state if the snapshot was taken from files with these stamps.
+    
+    With stamps None any stored state is returned, for callers that check
+    it against the bookmarks themselves.
+    """
+    if not enabled():
+        return None
+    try:
+        with open(path, 'rb') as file:
+            version, stored_stamps, state = marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != SNAPSHOT_VERSION or (stamps is not None and stored_stamps != stamps):
+        return None
+    return state
+
+
+def save(path: str, stamps: tuple, state: Dict[str, Any], just_written: bool = False) -> bool:
+    """Store state together with the stamps of the files it was built from."""
+    if not worth_caching(stamps, just_written):
+        return False
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        atomic_write(path, marshal.dumps((SNAPSHOT_VERSION, stamps, state)), mode=0o600)
+        return True
+    except (OSError, ValueError):
+        return False
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Storage backends for MarksEnhanced.
+
+The text backend keeps the user's bookmarks in the line-oriented ~/.markrc
+and is the default. The journal backend uses the same file as a base and
+appends every change as a small record to ~/.markrc.journal, folding the
+journal back into the base once it grows. The SQLite backend keeps them in
+~/.markrc.db, where single changes no longer rewrite the whole store.
+
+The backend is chosen with DIRMARKS_BACKEND=text|journal|sqlite or the
+"backend" key of ~/.markrc.config. /etc/markrc is always read as text.
+"""
+
+import os
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dirmarks.fileutil import atomic_write
+
+BACKENDS = ('text', 'journal', 'sqlite')
+DEFAULT_BACKEND = 'text'
+
+# The journal is folded into the base file once it is larger than this many
+# bytes and JOURNAL_RATIO times the size of the base file.
+JOURNAL_MIN_BYTES = 16 * 1024
+JOURNAL_RATIO = 0.5
+
+
+def backend_name(configured: Optional[str] = None) -> str:
+    """Resolve the backend from the environment, then the configured value."""
+    name = os.environ.get('DIRMARKS_BACKEND') or configured or DEFAULT_BACKEND
+    return name if name in BACKENDS else DEFAULT_BACKEND
+
+
+def configured_backend(config_file: str) -> str:
+    """Resolve the backend without constructing MarksEnhanced (used by fast lookups)."""
+    if os.environ.get('DIRMARKS_BACKEND') or not os.path.exists(config_file):
+        return backend_name()
+    import json
+    try:
+        with open(config_file) as f:
+            return backend_name(json.load(f).get('backend'))
+    except (OSError, ValueError, AttributeError):
+        return backend_name()
+
+
+def storage_files(backend: str, rc: str) -> List[str]:
+    """Files holding the user's bookmarks for a backend, for change detection."""
+    if backend == 'sqlite':
+        db = f"{rc}.db"
+        # Commits land in the write-ahead log until it is checkpointed
+        return [db, f"{db}-wal"]
+    if backend == 'journal':
+        return [rc, journal_file(rc)]
+    return [rc]
+
+
+def journal_file(rc: str) -> str:
+    """Path of the mutation journal kept next to a markrc base file."""
+    return f"{rc}.journal"
+
+
+def format_line(key: str, metadata: Dict[str, Any]) -> str:
+    """Serialize one bookmark in markrc syntax."""
+    line = f"{key}:{metadata['path']}"
+    category = metadata.get('category')
+    tags = metadata.get('tags', [])
+    if category:
+        line += f"|category:{category}"
+    if tags:
+        line += f"|tags:{','.join(tags)}"
+    return line
+
+
+def line_key(line: str) -> Optional[str]:
+    """Key of a markrc line, as the parsers in MarksEnhanced split it."""
+    head = line.split('|', 1)[0]
+    if ':' not in head:
+        return None
+    return head.split(':', 1)[0]
+
+
+def journal_record(seq: int, op: str, payload: str) -> bytes:
+    """Serialize one journal record: seq, op, payload and CRC32, tab-separated."""
+    body = f"{seq}\t{op}\t{payload}".encode('utf-8')
+    return body + b'\t%08x\n' % zlib.crc32(body)
+
+
+def read_journal(path: str, start: int = 0, last: int = 0) -> Iterator[Tuple[int, str, str, int]]:
+    """Yield (seq, op, payload, end offset) for each intact journal record.
+
+    Reading begins at byte offset start, after the record numbered last.
+    It stops at the first record that is truncated, fails its CRC or
+    does not continue the sequence, since nothing after it can be trusted.
+    """
+    try:
+        file = open(path, 'rb')
+    except OSError:
+        return
+    with file:
+        file.seek(start)
+        offset = start
+        for raw in file:
+            if not raw.endswith(b'\n'):
+                return
+            body, sep, crc = raw[:-1].rpartition(b'\t')
+            if not sep or crc != b'%08x' % zlib.crc32(body):
+                return
+            try:
+                seq, op, payload = body.decode('utf-8').split('\t', 2)
+                seq = int(seq)
+            except ValueError:
+                return
+            if seq <= last:
+                return
+            last = seq
+            offset += len(raw)
+            yield seq, op, payload, offset
+
+
+class TextStorage:
+    """Bookmarks stored one per line in a markrc file."""
+
+    name = 'text'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, marks):
+        """Parse the file into a MarksEnhanced instance."""
+        marks.read_marks(self.path)
+
+    def append(self, key: str, metadata: Dict[str, Any]):
+        """Persist a new bookmark."""
+        with open(self.path, "a") as file:
+            file.write(f"{format_line(key, metadata)}\n")
+
+    def update(self, key: str, metadata: Dict[str, Any], entries: Dict[str, Dict[str, Any]]):
+        """Persist changed metadata of an existing bookmark."""
+        self.write_all(entries)
+
+    def delete(self, key: str, entries: Dict[str, Dict[str, Any]]):
+        """Persist the removal of a bookmark."""
+        self.write_all(entries)
+
+    def write_all(self, entries: Dict[str, Dict[str, Any]]):
+        """Replace the stored bookmarks with entries, in order, atomically."""
+        atomic_write(self.path, ''.join(f"{format_line(key, metadata)}\n"
+                                        for key, metadata in entries.items()))
+
+
+class JournalStorage(TextStorage):
+    """Bookmarks in a markrc base file plus an append-only journal of changes.
+
+    Each change appends one 'put' (a markrc line) or 'del' (a key) record,
+    so the cost of a change does not depend on the number of bookmarks.
+    Loading replays the journal over the base file. Compaction rewrites the
+    base atomically before removing the journal, and replaying a journal
+    over a base it was already folded into gives the same bookmarks, so a
+    crash between the two steps loses nothing.
+    """
+
+    name = 'journal'
+    # Rebuilding the lookup index is O(n); it is left to the next lookup
+    append_only = True
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.journal_path = journal_file(path)
+        self._replayed = None  # (inode, end offset, last seq) of the journal as loaded
+
+    def load(self, marks):
+        """Parse the base file, then replay the journal over it."""
+        marks.read_marks(self.path)
+        self._replayed = None
+        self.load_appended(marks, (0, 0, 0))
+
+    def load_appended(self, marks, since=None) -> bool:
+        """Replay only the records appended since the last load.
+
+        Returns False if that is not possible because the journal was
+        replaced (compacted) or truncated since, or was never loaded.
+        """
+        since = since or self._replayed
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            # Nothing to replay, unless a loaded journal has been folded in since
+            if since is None or since[1]:
+                return False
+            self._replayed = (0, 0, 0)
+            return True
+        if since is None or (since[1] and st.st_ino != since[0]) or st.st_size < since[1]:
+            return False
+        _, offset, seq = since
+        records = []
+        for seq, op, payload, offset in read_journal(self.journal_path, offset, seq):
+            records.append((op, payload))
+        if records:
+            marks._apply_journal(records)
+        self._replayed = (st.st_ino, offset, seq)
+        return True
+
+    def _tail(self) -> Tuple[int, int]:
+        """Return (length of the intact journal prefix, last sequence number).
+
+        Only the end of the file is read unless the last record is damaged.
+        """
+        try:
+            file = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return 0, 0
+        with file:
+            size = file.seek(0, os.SEEK_END)
+            chunk = 4096
+            while True:
+                start = max(0, size - chunk)
+                file.seek(start)
+                data = file.read(size - start)
+                end = data.rfind(b'\n') + 1
+                begin = data.rfind(b'\n', 0, end - 1) + 1 if end else 0
+                if (end and begin) or start == 0:
+                    break
+                chunk *= 2
+        if end:
+            body, sep, crc = data[begin:end - 1].rpartition(b'\t')
+            if sep and crc == b'%08x' % zlib.crc32(body):
+                try:
+                    return start + end, int(body.split(b'\t', 1)[0])
+                except ValueError:
+                    pass
+        elif start == 0:
+            return 0, 0
+        # Damaged tail: keep only the prefix that replays cleanly
+        intact, seq = 0, 0
+        for seq, _, _, intact in read_journal(self.journal_path):
+            pass
+        return intact, seq
+
+    def _log(self, op: str, payload: str):
+        """Append one record, dropping a torn tail left by an interrupted write."""
+        intact, seq = self._tail()
+        record = journal_record(seq + 1, op, payload)
+        with open(self.journal_path, 'ab') as file:
+            if file.tell() != intact:
+                file.truncate(intact)
+            file.write(record)
+            if self._replayed is not None:
+                # The caller holds the write lock, so memory now matches the journal
+                self._replayed = (os.fstat(file.fileno()).st_ino, intact + len(record), seq + 1)
+        self._maybe_compact(intact + len(record))
+
+    def _maybe_compact(self, journal_size: int):
+        """Fold the journal into the base once it outgrows it; amortized O(1) per change."""
+        try:
+            base_size = os.stat(self.path).st_size
+        except OSError:
+            base_size = 0
+        if journal_size > max(JOURNAL_MIN_BYTES, base_size * JOURNAL_RATIO):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the base file with the journal applied and remove the journal."""
+        if not os.path.exists(self.journal_path):
+            return
+        lines: Dict[str, str] = {}
+        if os.path.isfile(self.path):
+            with open(self.path) as file:
+                for line in file:
+                    line = line.strip()
+                    key = line_key(line) if line else None
+                    if key is not None:
+                        lines[key] = line
+        for _, op, payload, _ in read_journal(self.journal_path):
+            if op == 'put':
+                key = line_key(payload)
+                if key is not None:
+                    lines[key] = payload
+            elif op == 'del':
+                lines.pop(payload, None)
+        atomic_write(self.path, ''.join(f"{line}\n" for line in lines.values()))
+        os.remove(self.journal_path)
+        self._replayed = (0, 0, 0)
+
+    def append(self, key: str, metadata: Dict[str, Any]):
+        """Persist a new bookmark."""
+        self._log('put', format_line(key, metadata))
+
+    def update(self, key: str, metadata: Dict[str, Any], entries: Dict[str, Dict[str, Any]]):
+        """Persist changed metadata of an existing bookmark."""
+        self._log('put', format_line(key, metadata))
+
+    def delete(self, key: str, entries: Dict[str, Dict[str, Any]]):
+        """Persist the removal of a bookmark."""
+        self._log('del', key)
+
+    def write_all(self, entries: Dict[str, Dict[str, Any]]):
+        """Replace the base file with entries and discard the journal."""
+        super().write_all(entries)
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        self._replayed = (0, 0, 0)
+
+
+class SqliteStorage:
+    """Bookmarks stored in an SQLite database in WAL mode."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS marks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL UNIQUE,
+            path TEXT NOT NULL,
+            category TEXT
+        );
+        CREATE INDEX IF NOT EXISTS marks_category ON marks(category);
+        CREATE TABLE IF NOT EXISTS tags (
+            mark_id INTEGER NOT NULL,
+            pos INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (mark_id, pos)
+        );
+        CREATE INDEX IF NOT EXISTS tags_tag ON tags(tag);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = None
+
+    @property
+    def connection(self):
+        """Open the database on first use."""
+        if self._connection is None:
+            import sqlite3
+            self._connection = sqlite3.connect(self.path, timeout=10)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    def close(self):
+        """Close the database connection."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def load(self, marks):
+        """Read all bookmarks, in insertion order, into a MarksEnhanced instance."""
+        if not os.path.exists(self.path):
+            return
+        tags: Dict[int, List[str]] = {}
+        for mark_id, tag in self.connection.execute('SELECT mark_id, tag FROM tags ORDER BY mark_id, pos'):
+            tags.setdefault(mark_id, []).append(tag)
+        for mark_id, key, path, category in self.connection.execute(
+                'SELECT id, key, path, category FROM marks ORDER BY id'):
+            marks._store_entry(key, {
+                'path': path,
+                'category': category,
+                'tags': tags.get(mark_id, [])
+            })
+
+    def _upsert(self, key: str, metadata: Dict[str, Any]):
+        """Insert or update one bookmark and its tags (inside a transaction)."""
+        db = self.connection
+        db.execute(
+            'INSERT INTO marks(key, path, category) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET path = excluded.path, category = excluded.category',
+            (key, metadata['path'], metadata.get('category')))
+        mark_id = db.execute('SELECT id FROM marks WHERE key = ?', (key,)).fetchone()[0]
+        db.execute('DELETE FROM tags WHERE mark_id = ?', (mark_id,))
+        db.executemany('INSERT INTO tags(mark_id, pos, tag) VALUES (?, ?, ?)',
+                       [(mark_id, pos, tag) for pos, tag in enumerate(metadata.get('tags') or [])])
+
+    def append(self, key: str, metadata: Dict[str, Any]):
+        """Persist a new bookmark."""
+        with self.connection:
+            self._upsert(key, metadata)
+
+    def update(self, key: str, metadata: Dict[str, Any], entries: Dict[str, Dict[str, Any]]):
+        """Persist changed metadata of an existing bookmark."""
+        with self.connection:
+            self._upsert(key, metadata)
+
+    def delete(self, key: str, entries: Dict[str, Dict[str, Any]]):
+        """Persist the removal of a bookmark."""
+        with self.connection as db:
+            db.execute('DELETE FROM tags WHERE mark_id IN (SELECT id FROM marks WHERE key = ?)', (key,))
+            db.execute('DELETE FROM marks WHERE key = ?', (key,))
+
+    def write_all(self, entries: Dict[str, Dict[str, Any]]):
+        """Replace the stored bookmarks with entries, in order, in one transaction."""
+        with self.connection as db:
+            db.execute('DELETE FROM tags')
+            db.execute('DELETE FROM marks')
+            for key, metadata in entries.items():
+                self._upsert(key, metadata)
+
+    def compact(self):
+        """Checkpoint the write-ahead log into the database and reclaim free pages."""
+        db = self.connection
+        db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.execute('VACUUM')
+
+
+def open_storage(backend: str, rc: str):
+    """Create the storage object for a backend and markrc path."""
+    if backend == 'sqlite':
+        return SqliteStorage(f"{rc}.db")
+    if backend == 'journal':
+        return JournalStorage(rc)
+    return TextStorage(rc)
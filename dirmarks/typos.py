@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+"Did you mean" suggestions for mistyped bookmark names.
+
+Keys are kept in a BK-tree: every node holds a key and files its children
+under their Levenshtein distance to it. By the triangle inequality, keys
+within distance k of a query can only sit under children whose edge
+distance d' satisfies |d - d'| <= k, where d is the query's distance to the
+node, so a lookup computes distances for a small part of the keys, and the
+tolerance shrinks to the distance of the nearest key found so far.
+Distances use the bit-parallel algorithm of Myers and Hyyrö: one pass over
+the longer key with the shorter one's character positions held in an int.
+
+The tree is cached next to the parsed-state snapshot (same size
+threshold), but checked against the keys rather than the files' stamps:
+a tree cached before a few adds and deletes is patched with them and
+saved again instead of being rebuilt. A miss is answered with a
+suggestion, or with DIRMARKS_AUTOCORRECT=1 resolved to the closest key
+when exactly one is closest.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+def enabled_autocorrect() -> bool:
+    """Resolving a miss to its only closest key is switched on with DIRMARKS_AUTOCORRECT=1."""
+    return bool(os.environ.get('DIRMARKS_AUTOCORRECT'))
+
+
+def max_distance(name: str) -> int:
+    """Edits tolerated in name: none for 1-2 characters, one up to 4, else two."""
+    if len(name) <= 2:
+        return 0
+    return 1 if len(name) <= 4 else 2
+
+
+def distance(a: str, b: str) -> int:
+    """Levenshtein distance between a and b."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+    # Bit i of positions[c] is set where b[i] == c; pv/mv hold the +1/-1
+    # vertical differences of the current DP column
+    positions: Dict[str, int] = {}
+    for i, char in enumerate(b):
+        positions[char] = positions.get(char, 0) | 1 << i
+    full = (1 << len(b)) - 1
+    last = 1 << (len(b) - 1)
+    pv, mv, score = full, 0, len(b)
+    for char in a:
+        eq = positions.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = (ph << 1) | 1
+        pv = ((mh << 1) | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+
+def hint(keys: List[str]) -> str:
+    """Suffix for the not-found message naming the suggested keys."""
+    return f" Did you mean: {', '.join(keys)}?" if keys else ""
+
+
+class BKTree:
+    """BK-tree over the keys of a marks_metadata dict."""
+
+    def __init__(self, metadata: Dict[str, Dict[str, Any]], state: Optional[Dict[str, Any]] = None):
+        self.source = metadata
+        self.words: List[str] = []  # node -> key
+        self.children: List[Dict[int, int]] = []  # node -> {distance: child node}
+        self.nodes: Dict[str, int] = {}
+        self.removed: Set[str] = set()  # keys still in the tree but no longer bookmarks
+        self.visited = 0  # distances computed by the last lookup
+        self.patched = 0  # keys added or removed to bring a cached state up to date
+        if state is not None:
+            self.words = list(state['words'])
+            self.children = [dict(edges) for edges in state['children']]
+            self.nodes = {word: node for node, word in enumerate(self.words)}
+            self.removed = set(state.get('removed', ()))
+            live = self.nodes.keys() - self.removed
+            for key in live - metadata.keys():
+                self.remove(key)
+                self.patched += 1
+            for key in metadata:
+                if key not in live:
+                    self.add(key)
+                    self.patched += 1
+        else:
+            for key in metadata:
+                self.add(key)
+
+    def add(self, key: str):
+        """Insert key, or revive it if it was removed."""
+        if key in self.nodes:
+            self.removed.discard(key)
+            return
+        node = len(self.words)
+        self.words.append(key)
+        self.children.append({})
+        self.nodes[key] = node
+        if node == 0:
+            return
+        parent = 0
+        while True:
+            edge = distance(key, self.words[parent])
+            child = self.children[parent].get(edge)
+            if child is None:
+                self.children[parent][edge] = node
+                return
+            parent = child
+
+    def remove(self, key: str):
+        """Forget key; its node stays in place to route lookups and is skipped."""
+        if key in self.nodes:
+            self.removed.add(key)
+
+    def state(self) -> Dict[str, Any]:
+        """Marshal-able form for the cache, rebuilt once most nodes are removed keys."""
+        if len(self.removed) * 2 > len(self.words):
+            return BKTree(self.source).state()
+        return {'words': list(self.words), 'children': list(self.children),
+                'removed': sorted(self.removed)}
+
+    def within(self, name: str, limit: int) -> List[Tuple[int, str]]:
+        """(distance, key) of every key within limit edits of name, nearest first."""
+        self.visited = 0
+        if not self.words:
+            return []
+        found = []
+        pending = [0]
+        while pending:
+            node = pending.pop()
+            word = self.words[node]
+            edge = distance(name, word)
+            self.visited += 1
+            if edge <= limit and word not in self.removed:
+                found.append((edge, word))
+            for child_edge, child in self.children[node].items():
+                if edge - limit <= child_edge <= edge + limit:
+                    pending.append(child)
+        found.sort()
+        return found
+
+    def closest(self, name: str, limit: Optional[int] = None) -> List[str]:
+        """Keys at the smallest distance from name, up to limit (default max_distance(name))."""
+        best = max_distance(name) if limit is None else limit
+        self.visited = 0
+        if not self.words or best < 1:
+            return []
+        found: List[str] = []
+        pending = [0]
+        while pending:
+            node = pending.pop()
+            word = self.words[node]
+            edge = distance(name, word)
+            self.visited += 1
+            if edge <= best and word not in self.removed:
+                if edge < best:
+                    best = edge
+                    found = []
+                found.append(word)
+            for child_edge, child in self.children[node].items():
+                if edge - best <= child_edge <= edge + best:
+                    pending.append(child)
+        return sorted(found)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Visit history for frecency ranking.
+
+Every successful lookup appends one `time<TAB>key` line to a log with a
+single O_APPEND write, so recording a visit costs navigation next to
+nothing and needs no lock. Once the log outgrows COMPACT_BYTES the next
+visit folds it into a table of exponentially decayed scores (one score
+and the time it was last updated per key) and empties it; the fold is
+skipped if another process is already doing it. Scores halve every
+HALF_LIFE seconds, entries that decayed to nothing are dropped and the
+table keeps at most MAX_ENTRIES keys, so the store stays bounded however
+often bookmarks are visited.
+
+Files live in $XDG_STATE_HOME/dirmarks (default ~/.local/state/dirmarks)
+and belong to one marks file; the first visit creates them. Visits come
+from `dirmarks --get` and bare-name lookups, the daemon, and shell-cache
+hits, which the shell function appends to the log itself.
+DIRMARKS_NO_USAGE=1 turns recording off.
+"""
+
+import os
+import time
+import marshal
+import zlib
+from typing import Dict, Iterator, Optional, Tuple
+
+from dirmarks import locking
+from dirmarks.fileutil import atomic_write
+
+# Bump when the layout of the table changes
+USAGE_VERSION = 1
+
+# A visit counts half as much after this many seconds
+HALF_LIFE = 14 * 24 * 3600
+
+# Fold the log into the table once it grows past this many bytes
+COMPACT_BYTES = 32 * 1024
+
+# Keys kept in the table, highest scores first
+MAX_ENTRIES = 1000
+
+# Scores below this are forgotten on compaction
+MIN_SCORE = 0.01
+
+
+def enabled() -> bool:
+    """Recording can be switched off with DIRMARKS_NO_USAGE=1."""
+    return not os.environ.get('DIRMARKS_NO_USAGE')
+
+
+def state_dir() -> str:
+    """Return the dirmarks state directory ($XDG_STATE_HOME/dirmarks)."""
+    base = os.environ.get('XDG_STATE_HOME')
+    if not base:
+        home = os.environ.get('HOME') or os.path.expanduser('~')
+        base = os.path.join(home, '.local', 'state')
+    return os.path.join(base, 'dirmarks')
+
+
+def usage_file(rc: str) -> str:
+    """Path of the score table for the marks file rc; the log is usage_file + '.log'."""
+    return os.path.join(state_dir(), f"usage-{zlib.crc32(rc.encode()):08x}")
+
+
+def decay(score: float, since: float, now: float) -> float:
+    """score as of since, decayed to now."""
+    return score * 0.5 ** (max(now - since, 0) / HALF_LIFE)
+
+
+def start_tracking(rc: str) -> bool:
+    """Create the log (and the state directory) if they do not exist yet."""
+    if not enabled():
+        return False
+    log = usage_file(rc) + '.log'
+    try:
+        os.makedirs(os.path.dirname(log), mode=0o700, exist_ok=True)
+        os.close(os.open(log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600))
+        return True
+    except OSError:
+        return False
+
+
+def record(rc: str, key: str, now: Optional[float] = None):
+    """Log a visit of key; folds the log into the table when it is due."""
+    if not enabled() or not key or '\n' in key or '\t' in key:
+        return
+    now = time.time() if now is None else now
+    line = f"{int(now)}\t{key}\n".encode('utf-8')
+    log = usage_file(rc) + '.log'
+    try:
+        fd = os.open(log, os.O_WRONLY | os.O_APPEND)
+    except FileNotFoundError:
+        # First visit: create the log, then append as usual
+        if not start_tracking(rc):
+            return
+        try:
+            fd = os.open(log, os.O_WRONLY | os.O_APPEND)
+        except OSError:
+            return
+    except OSError:
+        # History is a nicety, never fail a lookup over it
+        return
+    try:
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+    except OSError:
+        return
+    if size > COMPACT_BYTES:
+        compact(rc, now, wait=False)
+
+
+def _read_table(path: str) -> Dict[str, Tuple[float, float]]:
+    try:
+        with open(path, 'rb') as file:
+            version, table = marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return {}
+    return table if version == USAGE_VERSION and isinstance(table, dict) else {}
+
+
+def _read_log(path: str) -> Iterator[Tuple[float, str]]:
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return
+    for line in data.split(b'\n'):
+        stamp, sep, key = line.partition(b'\t')
+        if not sep or not key:
+            continue  # torn or empty line
+        try:
+            yield float(stamp), key.decode('utf-8')
+        except (ValueError, UnicodeDecodeError):
+            continue
+
+
+def _fold(table: Dict[str, Tuple[float, float]], visits: Iterator[Tuple[float, str]]):
+    for when, key in visits:
+        score, since = table.get(key, (0.0, when))
+        if when >= since:
+            table[key] = (decay(score, since, when) + 1.0, when)
+        else:
+            # Logged out of order (clock change, slow writer): count it as of since
+            table[key] = (score + decay(1.0, when, since), since)
+
+
+def scores(rc: str, now: Optional[float] = None) -> Dict[str, float]:
+    """Current frecency score of every visited key."""
+    now = time.time() if now is None else now
+    path = usage_file(rc)
+    table = _read_table(path)
+    _fold(table, _read_log(path + '.old'))
+    _fold(table, _read_log(path + '.log'))
+    return {key: decay(score, since, now) for key, (score, since) in table.items()}
+
+
+def _fold_old(path: str, now: float):
+    """Fold the rotated log into the table, bound the table and remove the log."""
+    table = _read_table(path)
+    _fold(table, _read_log(path + '.old'))
+    current = {key: (decay(score, since, now), now) for key, (score, since) in table.items()}
+    ranked = sorted(current.items(), key=lambda item: -item[1][0])[:MAX_ENTRIES]
+    table = {key: entry for key, entry in ranked if entry[0] >= MIN_SCORE}
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    atomic_write(path, marshal.dumps((USAGE_VERSION, table)), mode=0o600)
+    try:
+        os.remove(path + '.old')
+    except FileNotFoundError:
+        pass
+
+
+def compact(rc: str, now: Optional[float] = None, wait: bool = True) -> bool:
+    """Fold the log into the table and bound its size.
+
+    The log is first renamed aside and a fresh one created, so visits
+    recorded meanwhile are not lost. A rotated log left by a compaction
+    that was interrupted is folded in before the rename would replace it.
+    With wait=False nothing is done if another process holds the
+    compaction lock.
+    """
+    now = time.time() if now is None else now
+    path = usage_file(rc)
+    try:
+        with locking.FileLock(locking.lock_path(path), timeout=None if wait else 0):
+            if os.path.exists(path + '.old'):
+                _fold_old(path, now)
+            try:
+                os.replace(path + '.log', path + '.old')
+            except FileNotFoundError:
+                pass
+            start_tracking(rc)
+            _fold_old(path, now)
+            return True
+    except (locking.LockTimeout, OSError, ValueError):
+        return False
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test suite for batched bookmark changes.
+Tests that batch() and bulk_add() defer persistence to a single write.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks.storage import TextStorage
+
+
+class TestBatch(unittest.TestCase):
+    """Test MarksEnhanced.batch and bulk_add."""
+
+    def setUp(self):
+        """Set up an isolated HOME with a few bookmarks."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.dirs = [tempfile.mkdtemp(dir=self.home) for _ in range(5)]
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache')})
+        self.env.start()
+        with open(self.markrc_file, 'w') as f:
+            f.write(f"keep:{self.dirs[0]}\ndrop:{self.dirs[1]}\n")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def read_markrc(self):
+        with open(self.markrc_file) as f:
+            return f.read()
+
+    def test_changes_are_written_once_at_exit(self):
+        """Test nothing is persisted inside the batch and one write happens at the end."""
+        marks = Marks()
+        before = self.read_markrc()
+        with patch.object(TextStorage, 'write_all', autospec=True,
+                          side_effect=TextStorage.write_all) as write_all, \
+                patch.object(TextStorage, 'append', side_effect=AssertionError('append')):
+            with marks.batch():
+                self.assertTrue(marks.add_mark_with_metadata('new', self.dirs[2], category='work'))
+                self.assertTrue(marks.del_mark('drop'))
+                self.assertTrue(marks.update_mark_tags('keep', ['a', 'b']))
+                self.assertTrue(marks.update_mark('new', self.dirs[3]))
+                self.assertEqual(self.read_markrc(), before)
+            self.assertEqual(write_all.call_count, 1)
+
+        self.assertEqual(self.read_markrc(),
+                         f"keep:{self.dirs[0]}|tags:a,b\nnew:{self.dirs[3]}\n")
+        self.assertEqual(Marks().marks_metadata, marks.marks_metadata)
+
+    def test_exception_rolls_back(self):
+        """Test a failing block leaves memory and the marks file untouched."""
+        marks = Marks()
+        before = self.read_markrc()
+        with self.assertRaises(RuntimeError):
+            with marks.batch():
+                marks.add_mark('new', self.dirs[2])
+                marks.update_mark_category('keep', 'work')
+                marks.del_mark('drop')
+                raise RuntimeError('abort')
+
+        self.assertEqual(self.read_markrc(), before)
+        self.assertEqual(list(marks.marks), ['keep', 'drop'])
+        self.assertIsNone(marks.marks_metadata['keep']['category'])
+        self.assertEqual(marks.list, [f"keep:{self.dirs[0]}", f"drop:{self.dirs[1]}"])
+
+    def test_nested_batches_write_at_outermost_exit(self):
+        """Test an inner batch does not flush on its own."""
+        marks = Marks()
+        with marks.batch():
+            with marks.batch():
+                marks.add_mark('new', self.dirs[2])
+            self.assertNotIn('new:', self.read_markrc())
+        self.assertIn(f"new:{self.dirs[2]}\n", self.read_markrc())
+
+    def test_empty_batch_does_not_write(self):
+        """Test a batch without changes leaves the file alone."""
+        marks = Marks()
+        with patch.object(TextStorage, 'write_all', side_effect=AssertionError('write')):
+            with marks.batch():
+                marks.get_mark('keep')
+
+    def test_bulk_add(self):
+        """Test bulk_add adds valid entries with one write and skips the rest."""
+        marks = Marks()
+        entries = [('a', self.dirs[2]),
+                   ('b', self.dirs[3], 'work', ['x']),
+                   ('keep', self.dirs[4]),
+                   ('missing', os.path.join(self.home, 'nope'))]
+        with patch.object(TextStorage, 'append', side_effect=AssertionError('append')):
+            self.assertEqual(marks.bulk_add(entries), 2)
+
+        fresh = Marks()
+        self.assertEqual(fresh.get_mark('a'), self.dirs[2])
+        self.assertEqual(fresh.get_mark_with_metadata('b')['tags'], ['x'])
+        self.assertEqual(fresh.get_mark('keep'), self.dirs[0])
+        self.assertIsNone(fresh.get_mark('missing'))
+
+    def test_bulk_add_on_sqlite(self):
+        """Test bulk_add writes through other backends too."""
+        with patch.dict(os.environ, {'DIRMARKS_BACKEND': 'sqlite'}):
+            marks = Marks()
+            self.assertEqual(marks.bulk_add((f"k{i}", self.dirs[i]) for i in range(5)), 5)
+            self.assertEqual(len(Marks().marks), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test suite for the category trie.
+Tests subtree listing, rolled-up counts, incremental maintenance and
+--list --category work/ and --stats --tree on the CLI.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks import marks_enhanced
+from dirmarks.metaindex import CategoryTrie
+
+
+class TestCategoryTrie(unittest.TestCase):
+    """Test the trie on its own."""
+
+    def setUp(self):
+        self.trie = CategoryTrie()
+        for key, category in [('a', 'work/web/frontend'), ('b', 'work'), ('c', 'work/web'),
+                              ('d', 'work-old'), ('e', 'personal'), ('f', 'work/web/frontend')]:
+            self.trie.add(key, category)
+
+    def test_exact_and_subtree(self):
+        """Test exact lookups and whole-subtree lookups."""
+        self.assertEqual(self.trie.keys('work/web'), {'c'})
+        self.assertEqual(self.trie.subtree('work'), {'a', 'b', 'c', 'f'})
+        self.assertEqual(self.trie.subtree('work/web'), {'a', 'c', 'f'})
+        self.assertEqual(self.trie.subtree('nope'), set())
+        self.assertEqual(self.trie.keys('work/nope'), set())
+
+    def test_rolled_up_walk(self):
+        """Test per-node own and subtree counts in sorted pre-order."""
+        self.assertEqual(list(self.trie.walk()), [
+            ('personal', 0, 1, 1),
+            ('work', 0, 1, 4),
+            ('work/web', 1, 1, 3),
+            ('work/web/frontend', 2, 2, 2),
+            ('work-old', 0, 1, 1),
+        ])
+
+    def test_counts_sorted_like_strings(self):
+        """Test flat counts keep the plain string order of get_category_stats."""
+        self.assertEqual(list(self.trie.counts()),
+                         sorted(['personal', 'work', 'work/web', 'work/web/frontend', 'work-old']))
+
+    def test_remove_prunes_empty_nodes(self):
+        """Test removing the last bookmark below a node removes the node."""
+        self.trie.remove('a', 'work/web/frontend')
+        self.trie.remove('f', 'work/web/frontend')
+        self.trie.remove('x', 'work/web')  # not indexed: no effect
+        self.assertNotIn('work/web/frontend', dict((c, t) for c, _, _, t in self.trie.walk()))
+        self.assertEqual(self.trie.root.children['work'].total, 2)
+        self.trie.remove('c', 'work/web')
+        self.assertEqual(self.trie.subtree('work'), {'b'})
+        self.assertNotIn('web', self.trie.root.children['work'].children)
+
+
+class TestCategoryQueries(unittest.TestCase):
+    """Test category queries on MarksEnhanced."""
+
+    def setUp(self):
+        """Set up an isolated HOME with categorized bookmarks."""
+        self.home = tempfile.mkdtemp()
+        self.dirs = [tempfile.mkdtemp(dir=self.home) for _ in range(4)]
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        self.marks = Marks()
+        self.marks.add_mark_with_category('front', self.dirs[0], 'work/web/frontend')
+        self.marks.add_mark_with_category('home', self.dirs[1], 'personal')
+        self.marks.add_mark_with_category('api', self.dirs[2], 'work')
+        self.marks.add_mark_with_category('site', self.dirs[3], 'work/web')
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def names(self, results):
+        return [mark['name'] for mark in results]
+
+    def test_exact_match_unchanged(self):
+        """Test a plain category still matches exactly."""
+        self.assertEqual(self.names(self.marks.list_by_category('work')), ['api'])
+
+    def test_subtree_in_bookmark_order(self):
+        """Test a trailing slash or subtree=True returns the whole subtree in order."""
+        self.assertEqual(self.names(self.marks.list_by_category('work/')), ['front', 'api', 'site'])
+        self.assertEqual(self.names(self.marks.list_by_category('work/web', subtree=True)),
+                         ['front', 'site'])
+
+    def test_maintained_by_mutators(self):
+        """Test category changes and deletes update the built trie in place."""
+        self.marks.list_by_category('work/')
+        with patch.object(marks_enhanced, 'MetadataIndex', side_effect=AssertionError('rebuilt')):
+            self.marks.update_mark_category('home', 'work/web/backend')
+            self.marks.del_mark('front')
+            self.assertEqual(self.names(self.marks.list_by_category('work/web/')), ['home', 'site'])
+            self.assertEqual(self.marks.get_category_stats(),
+                             {'work': 1, 'work/web': 1, 'work/web/backend': 1})
+            self.assertEqual(self.marks.list_all_categories(), ['work', 'work/web', 'work/web/backend'])
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print:
+                main()
+        return [str(call.args[0]) if call.args else '' for call in mock_print.call_args_list]
+
+    def test_cli_subtree_listing(self):
+        """Test --list --category work/ lists every bookmark below work."""
+        output = '\n'.join(self.run_main('--list', '--category', 'work/'))
+        for name in ('front', 'api', 'site'):
+            self.assertIn(f"{name} =>", output)
+        self.assertNotIn('home =>', output)
+
+    def test_cli_stats_tree(self):
+        """Test --stats --tree prints rolled-up counts indented by depth."""
+        lines = self.run_main('--stats', '--tree')
+        self.assertIn('  personal: 1 bookmark', lines)
+        self.assertIn('  work: 3 bookmarks (1 here)', lines)
+        self.assertIn('    web: 2 bookmarks (1 here)', lines)
+        self.assertIn('      frontend: 1 bookmark', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test suite for dead-bookmark checking.
+Tests the path probe, the per-path deadline and the hung-mount shortcut in
+pathcheck.check_paths, and --check and --check --prune.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import shutil
+import threading
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks.storage import TextStorage
+from dirmarks import pathcheck
+
+
+class TestProbe(unittest.TestCase):
+    """Test pathcheck on real and simulated paths."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.temp_dir, 'file')
+        open(self.file, 'w').close()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_probe(self):
+        """Test directories, missing paths and files are told apart."""
+        self.assertEqual(pathcheck.probe(self.temp_dir), pathcheck.OK)
+        self.assertEqual(pathcheck.probe(os.path.join(self.temp_dir, 'nope')), pathcheck.MISSING)
+        self.assertEqual(pathcheck.probe(os.path.join(self.file, 'sub')), pathcheck.MISSING)
+        self.assertEqual(pathcheck.probe(self.file), pathcheck.NOT_DIR)
+
+    @unittest.skipIf(hasattr(os, 'geteuid') and os.geteuid() == 0, 'root bypasses permissions')
+    def test_probe_denied(self):
+        """Test a directory the user cannot enter is reported."""
+        locked = os.path.join(self.temp_dir, 'locked')
+        os.mkdir(locked, 0o600)
+        self.assertEqual(pathcheck.probe(locked), pathcheck.DENIED)
+
+    def test_mounts(self):
+        """Test the mount table is parsed with escapes and matched by longest prefix."""
+        table = os.path.join(self.temp_dir, 'mounts')
+        with open(table, 'w') as f:
+            f.write("/dev/sda1 / ext4 rw 0 0\nsrv:/x /mnt/my\\040share nfs rw 0 0\nsrv:/y /mnt/n nfs rw 0 0\n")
+        with patch.object(pathcheck, 'MOUNTS_FILE', table):
+            points = pathcheck.mount_points()
+        self.assertEqual(points[-1], '/')
+        self.assertEqual(pathcheck.mount_of('/mnt/my share/a', points), '/mnt/my share')
+        self.assertEqual(pathcheck.mount_of('/mnt/n', points), '/mnt/n')
+        self.assertEqual(pathcheck.mount_of('/mnt/nfs', points), '/')
+        self.assertIsNone(pathcheck.mount_of('/x', []))
+
+    def test_deadline(self):
+        """Test a hanging probe times out, the rest are answered, and its mount is skipped."""
+        release = threading.Event()
+        probed = []
+
+        def fake_probe(path):
+            probed.append(path)
+            if path.startswith('/dead/'):
+                release.wait(10)
+            return pathcheck.OK
+
+        paths = ['/dead/a', '/dead/b', '/dead/c', '/live/a', '/live/b']
+        with patch.object(pathcheck, 'probe', side_effect=fake_probe), \
+                patch.object(pathcheck, 'mount_points', return_value=['/dead', '/live', '/']):
+            start = time.monotonic()
+            results = pathcheck.check_paths(paths, timeout=0.2, workers=1)
+            elapsed = time.monotonic() - start
+        release.set()
+        self.assertEqual(results, {'/dead/a': pathcheck.TIMED_OUT, '/dead/b': pathcheck.TIMED_OUT,
+                                   '/dead/c': pathcheck.TIMED_OUT, '/live/a': pathcheck.OK,
+                                   '/live/b': pathcheck.OK})
+        self.assertEqual(probed, ['/dead/a', '/live/a', '/live/b'])
+        self.assertLess(elapsed, 2)
+
+
+class TestCheckCommand(unittest.TestCase):
+    """Test --check against a markrc with dead entries."""
+
+    def setUp(self):
+        """Set up an isolated HOME with live, missing and file bookmarks."""
+        self.home = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_STATE_HOME': os.path.join(self.home, '.state'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        self.live = tempfile.mkdtemp(dir=self.home)
+        self.file = os.path.join(self.home, 'file')
+        open(self.file, 'w').close()
+        self.gone = os.path.join(self.home, 'gone')
+        with open(os.path.join(self.home, '.markrc'), 'w') as f:
+            f.write(f"live:{self.live}\ngone:{self.gone}|category:work\nfile:{self.file}\n")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr'):
+                main()
+        return [str(call.args[0]) for call in mock_print.call_args_list]
+
+    def test_check(self):
+        """Test dead bookmarks are reported with their status and nothing is changed."""
+        self.assertEqual([(m['name'], m['status']) for m in Marks().check()],
+                         [('gone', pathcheck.MISSING), ('file', pathcheck.NOT_DIR)])
+        output = self.run_main('--check', '--timeout', '1')
+        self.assertEqual(output, [f"  gone => {self.gone} (missing)",
+                                  f"  file => {self.file} (not a directory)"])
+        self.assertEqual(len(Marks().marks), 3)
+
+    def test_prune(self):
+        """Test --prune deletes missing entries with one rewrite and keeps uncertain ones."""
+        with patch.object(pathcheck, 'probe', side_effect=lambda path: {
+                self.live: pathcheck.TIMED_OUT}.get(path, pathcheck.MISSING)), \
+                patch.object(TextStorage, 'write_all', autospec=True,
+                             side_effect=TextStorage.write_all) as write_all:
+            output = self.run_main('--check', '--prune')
+        self.assertEqual(output[-1], 'Pruned 2 bookmarks.')
+        self.assertEqual(write_all.call_count, 1)
+        self.assertEqual(list(Marks().marks), ['live'])
+
+    def test_all_good(self):
+        """Test a clean store says so."""
+        Marks().bulk_delete(['gone', 'file'])
+        self.assertEqual(self.run_main('--check'), ['All 1 bookmarks point to directories.'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ import unittest
 import tempfile
 import os
 import sys
+import shutil
 import subprocess
 import json
 from unittest.mock import patch, MagicMock
@@ -24,6 +25,10 @@ class TestCLICategoryManagement(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
+        # Identity tables go here, not under the real HOME
+        self.state_dir = tempfile.mkdtemp()
+        self.state_patcher = patch.dict(os.environ, {'XDG_STATE_HOME': self.state_dir})
+        self.state_patcher.start()
         self.markrc_file = os.path.join(self.temp_dir, '.markrc')
         self.test_dir = tempfile.mkdtemp()
         
@@ -34,6 +39,8 @@ class TestCLICategoryManagement(unittest.TestCase):
         
     def tearDown(self):
         """Clean up test fixtures."""
+        self.state_patcher.stop()
+        shutil.rmtree(self.state_dir)
         self.home_patcher.stop()
         if os.path.exists(self.markrc_file):
             os.remove(self.markrc_file)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test suite for bookmark name completion.
+Tests prefix lookups in the sorted key list and the memory-mapped index,
+and the --complete fast path in main().
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks.fileutil import file_stamp
+from dirmarks.index import MarksIndex
+from dirmarks.metaindex import MetadataIndex
+from dirmarks import index, snapshot
+from dirmarks.main import complete_bookmarks, main
+
+
+class TestPrefixLookup(unittest.TestCase):
+    """Test prefix lookups on both sorted key structures."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, 'markrc')
+        with open(self.source, 'w') as f:
+            f.write('x')
+        self.marks = {key: f"/srv/{key}" for key in ('proj', 'prod', 'p', 'home', 'pro', 'Proj', 'zeta')}
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_mapped_index(self):
+        """Test the index answers prefixes from its sorted section."""
+        path = os.path.join(self.temp_dir, 'index')
+        index.write(path, (file_stamp(self.source),), self.marks, list(self.marks.values()))
+        mapped = MarksIndex.open(path, [self.source])
+        self.assertEqual(mapped.complete('pro'), ['pro', 'prod', 'proj'])
+        self.assertEqual(mapped.complete(''), sorted(self.marks))
+        self.assertEqual(mapped.complete('zz'), [])
+        self.assertEqual(mapped.complete('a'), [])
+        self.assertEqual(mapped.get('prod'), '/srv/prod')
+        mapped.close()
+
+    def test_metadata_index_follows_changes(self):
+        """Test the sorted name list is kept current by add and remove."""
+        metadata = {key: {'path': path, 'tags': []} for key, path in self.marks.items()}
+        names = MetadataIndex(metadata)
+        self.assertEqual(names.complete('pro'), ['pro', 'prod', 'proj'])
+        names.remove('prod', metadata['prod'])
+        names.remove('proj', metadata['proj'], forget=False)
+        names.add('proj', metadata['proj'])
+        names.add('prow', {'path': '/srv/prow'})
+        self.assertEqual(names.complete('pro'), ['pro', 'proj', 'prow'])
+        self.assertEqual(names.complete('P'), ['Proj'])
+
+
+class TestCompleteCommand(unittest.TestCase):
+    """Test --complete against a real markrc."""
+
+    def setUp(self):
+        """Set up an isolated HOME with an old markrc."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        with open(self.markrc_file, 'w') as f:
+            f.write(f"proj:{self.home}|category:work\nprod:{self.home}\nhome:{self.home}\n")
+        past = time.time() - 10
+        os.utime(self.markrc_file, (past, past))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def test_small_store_parsed(self):
+        """Test completion works without any cache file."""
+        self.assertEqual(complete_bookmarks('pr'), ['prod', 'proj'])
+        self.assertEqual(Marks().complete(''), ['home', 'prod', 'proj'])
+        self.assertFalse(os.path.exists(os.path.join(self.home, '.cache')))
+
+    def test_answered_from_index(self):
+        """Test the first completion indexes, later ones do not parse."""
+        with patch.object(snapshot, 'MIN_SOURCE_BYTES', 0):
+            self.assertEqual(complete_bookmarks('pro'), ['prod', 'proj'])
+            with patch.object(Marks, '__init__', side_effect=AssertionError('parsed')):
+                self.assertEqual(complete_bookmarks('pro'), ['prod', 'proj'])
+                self.assertEqual(complete_bookmarks('x'), [])
+
+    def test_cli(self):
+        """Test dirmarks --complete prints one name per line and nothing for no match."""
+        for args, expected in ((['pro'], 'prod\nproj'), ([], 'home\nprod\nproj'), (['x'], None)):
+            with patch.object(sys, 'argv', ['dirmarks', '--complete', *args]):
+                with patch('builtins.print') as mock_print:
+                    main()
+            printed = [call.args[0] for call in mock_print.call_args_list]
+            self.assertEqual(printed, [expected] if expected else [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test suite for the resident dirmarks daemon.
+Runs the daemon on a temporary socket and talks to it through the client.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import shutil
+import threading
+import unittest.mock
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks import daemon, usage
+
+
+class TestMarksDaemon(unittest.TestCase):
+    """Test daemon request handling over a real Unix socket."""
+
+    def setUp(self):
+        """Start a daemon on a temporary socket with an isolated markrc."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.temp_dir, '.markrc')
+        self.socket_file = os.path.join(self.temp_dir, 'run', 'dirmarks.sock')
+        self.test_dir = tempfile.mkdtemp()
+        self.env = unittest.mock.patch.dict(os.environ, {'XDG_STATE_HOME': os.path.join(self.temp_dir, 'state')})
+        self.env.start()
+        os.environ.pop('DIRMARKS_NO_USAGE', None)
+
+        marks = Marks()
+        marks.rc = self.markrc_file
+        marks.config_file = os.path.join(self.temp_dir, '.markrc.config')
+        marks.reload()
+        marks.add_mark_with_metadata('proj', self.test_dir, category='work', tags=['urgent'])
+
+        self.thread = threading.Thread(target=daemon.serve, args=(self.socket_file, marks))
+        self.thread.start()
+        for _ in range(100):
+            if daemon.is_running(self.socket_file):
+                break
+            time.sleep(0.01)
+
+    def tearDown(self):
+        """Stop the daemon and clean up."""
+        daemon.stop(self.socket_file)
+        self.thread.join(timeout=5)
+        self.env.stop()
+        shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_get_existing_and_missing(self):
+        """Test get returns the path or an error line."""
+        self.assertEqual(daemon.request(['get', 'proj'], self.socket_file), [f"+{self.test_dir}"])
+        self.assertEqual(daemon.request(['get', '0'], self.socket_file), [f"+{self.test_dir}"])
+        reply = daemon.request(['get', 'missing'], self.socket_file)
+        self.assertTrue(reply[0].startswith('-'))
+
+    def test_get_records_visit(self):
+        """Test lookups through the daemon count for the bookmark, also by index."""
+        daemon.request(['get', 'proj'], self.socket_file)
+        daemon.request(['get', '0'], self.socket_file)
+        daemon.request(['get', 'missing'], self.socket_file)
+        self.assertEqual(set(usage.scores(self.markrc_file)), {'proj'})
+        self.assertAlmostEqual(usage.scores(self.markrc_file)['proj'], 2.0, places=3)
+
+    def test_add_list_and_delete(self):
+        """Test mutations through the daemon are persisted."""
+        other_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        self.assertEqual(daemon.request(['add', 'other', other_dir, 'personal', 'a,b'], self.socket_file), ['+'])
+
+        listing = daemon.request(['list'], self.socket_file)
+        self.assertEqual(len(listing), 2)
+        self.assertIn(f"+1 => other:{other_dir}", listing)
+
+        marks = Marks()
+        marks.rc = self.markrc_file
+        marks.reload()
+        self.assertEqual(marks.get_mark_with_metadata('other')['tags'], ['a', 'b'])
+
+        self.assertEqual(daemon.request(['del', 'other'], self.socket_file), ['+'])
+        self.assertTrue(daemon.request(['get', 'other'], self.socket_file)[0].startswith('-'))
+
+    def test_add_rejects_relative_path(self):
+        """Test the daemon refuses paths relative to its own working directory."""
+        reply = daemon.request(['add', 'rel', 'some/dir'], self.socket_file)
+        self.assertTrue(reply[0].startswith('-'))
+
+    def test_reload_on_file_change(self):
+        """Test edits made by other processes are picked up."""
+        other_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        with open(self.markrc_file, 'a') as f:
+            f.write(f"external:{other_dir}\n")
+        self.assertEqual(daemon.request(['get', 'external'], self.socket_file), [f"+{other_dir}"])
+
+    def test_unreachable_socket(self):
+        """Test the client reports an unreachable daemon as None."""
+        missing = os.path.join(self.temp_dir, 'nope.sock')
+        self.assertIsNone(daemon.request(['ping'], missing))
+        self.assertFalse(daemon.is_running(missing))
+
+
+    def test_refuses_shared_directory(self):
+        """Test the daemon does not put its socket in a directory others can write to."""
+        shared = os.path.join(self.temp_dir, 'shared')
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        with unittest.mock.patch('sys.stderr') as mock_stderr:
+            self.assertFalse(daemon.serve(os.path.join(shared, 'dirmarks.sock')))
+        self.assertIn('must be a directory owned by you', mock_stderr.write.call_args.args[0])
+        self.assertEqual(os.listdir(shared), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ import unittest
 import tempfile
 import os
 import sys
+import shutil
 from unittest.mock import patch
 
 # Add the dirmarks module to the path
@@ -22,6 +23,10 @@ class TestDiscoveryCommands(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
+        # Identity tables go here, not under the real HOME
+        self.state_dir = tempfile.mkdtemp()
+        self.state_patcher = patch.dict(os.environ, {'XDG_STATE_HOME': self.state_dir})
+        self.state_patcher.start()
         self.markrc_file = os.path.join(self.temp_dir, '.markrc')
         self.marks = Marks()
         self.marks.rc = self.markrc_file
@@ -37,6 +42,8 @@ class TestDiscoveryCommands(unittest.TestCase):
         
     def tearDown(self):
         """Clean up test fixtures."""
+        self.state_patcher.stop()
+        shutil.rmtree(self.state_dir)
         if os.path.exists(self.markrc_file):
             os.remove(self.markrc_file)
         os.rmdir(self.temp_dir)
@@ -120,6 +127,10 @@ class TestDiscoveryCLI(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
+        # Identity tables go here, not under the real HOME
+        self.state_dir = tempfile.mkdtemp()
+        self.state_patcher = patch.dict(os.environ, {'XDG_STATE_HOME': self.state_dir})
+        self.state_patcher.start()
         self.markrc_file = os.path.join(self.temp_dir, '.markrc')
         self.test_dir = tempfile.mkdtemp()
         
@@ -130,6 +141,8 @@ class TestDiscoveryCLI(unittest.TestCase):
         
     def tearDown(self):
         """Clean up test fixtures."""
+        self.state_patcher.stop()
+        shutil.rmtree(self.state_dir)
         self.home_patcher.stop()
         if os.path.exists(self.markrc_file):
             os.remove(self.markrc_file)
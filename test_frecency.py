@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test suite for frecency tracking.
+Tests the decayed scores, the append-only visit log and its compaction,
+and --top and --list --sort frecency.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks import snapshot, usage
+
+DAY = 24 * 3600
+
+
+class UsageTestCase(unittest.TestCase):
+    """Isolated HOME with tracking turned on."""
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.rc = os.path.join(self.home, '.markrc')
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_STATE_HOME': os.path.join(self.home, '.state'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        os.environ.pop('DIRMARKS_NO_USAGE', None)
+        usage.start_tracking(self.rc)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+
+class TestScores(UsageTestCase):
+    """Test recording and scoring visits."""
+
+    def test_decay(self):
+        """Test a visit is worth half as much after HALF_LIFE."""
+        now = 1000 * DAY
+        usage.record(self.rc, 'proj', now - usage.HALF_LIFE)
+        usage.record(self.rc, 'docs', now)
+        scores = usage.scores(self.rc, now)
+        self.assertAlmostEqual(scores['proj'], 0.5)
+        self.assertAlmostEqual(scores['docs'], 1.0)
+
+    def test_frequency_and_recency(self):
+        """Test frequent old visits can outrank a single recent one and fade."""
+        now = 1000 * DAY
+        for i in range(4):
+            usage.record(self.rc, 'old', now - 14 * DAY + i)
+        usage.record(self.rc, 'new', now)
+        scores = usage.scores(self.rc, now)
+        self.assertGreater(scores['old'], scores['new'])
+        later = usage.scores(self.rc, now + 60 * DAY)
+        self.assertLess(later['old'], 0.2)
+
+    def test_out_of_order_and_torn_lines(self):
+        """Test late-logged visits still count and partial lines are ignored."""
+        now = 1000 * DAY
+        usage.record(self.rc, 'proj', now)
+        usage.record(self.rc, 'proj', now - usage.HALF_LIFE)
+        with open(usage.usage_file(self.rc) + '.log', 'ab') as f:
+            f.write(b'garbage\n12x\tproj\n99\t')
+        self.assertAlmostEqual(usage.scores(self.rc, now)['proj'], 1.5)
+
+    def test_first_visit_and_disabled(self):
+        """Test the first visit creates the log, and nothing is written when disabled."""
+        os.environ['XDG_STATE_HOME'] = os.path.join(self.home, 'other')
+        with patch.dict(os.environ, {'DIRMARKS_NO_USAGE': '1'}):
+            usage.record(self.rc, 'proj')
+            self.assertFalse(usage.start_tracking(self.rc))
+        self.assertFalse(os.path.exists(os.path.join(self.home, 'other')))
+        self.assertEqual(usage.scores(self.rc), {})
+        usage.record(self.rc, 'proj')
+        self.assertEqual(set(usage.scores(self.rc)), {'proj'})
+
+
+class TestCompaction(UsageTestCase):
+    """Test folding the log into the bounded score table."""
+
+    def test_compact_preserves_scores(self):
+        """Test scores are the same before and after a fold and the log restarts."""
+        now = 1000 * DAY
+        for i, key in enumerate(('a', 'b', 'a', 'c', 'a')):
+            usage.record(self.rc, key, now - i * DAY)
+        before = usage.scores(self.rc, now)
+        self.assertTrue(usage.compact(self.rc, now))
+        path = usage.usage_file(self.rc)
+        self.assertEqual(os.path.getsize(path + '.log'), 0)
+        self.assertFalse(os.path.exists(path + '.old'))
+        after = usage.scores(self.rc, now)
+        self.assertEqual(set(before), set(after))
+        for key in before:
+            self.assertAlmostEqual(before[key], after[key])
+        usage.record(self.rc, 'b', now)
+        self.assertAlmostEqual(usage.scores(self.rc, now)['b'], before['b'] + 1.0)
+
+    def test_interrupted_compaction(self):
+        """Test a log rotated by a compaction that crashed is folded, not overwritten."""
+        now = 1000 * DAY
+        for key in ('a', 'a', 'b'):
+            usage.record(self.rc, key, now)
+        with patch.object(usage, 'atomic_write', side_effect=OSError('disk full')):
+            self.assertFalse(usage.compact(self.rc, now))
+        self.assertTrue(os.path.exists(usage.usage_file(self.rc) + '.old'))
+        usage.record(self.rc, 'b', now)
+        self.assertTrue(usage.compact(self.rc, now))
+        self.assertEqual(usage.scores(self.rc, now), {'a': 2.0, 'b': 2.0})
+
+    def test_bounded(self):
+        """Test the table keeps the MAX_ENTRIES best keys and forgets faded ones."""
+        now = 1000 * DAY
+        usage.record(self.rc, 'ancient', now - 200 * DAY)
+        for key, visits in (('x', 3), ('y', 2), ('z', 1)):
+            for _ in range(visits):
+                usage.record(self.rc, key, now)
+        with patch.object(usage, 'MAX_ENTRIES', 2):
+            usage.compact(self.rc, now)
+        self.assertEqual(set(usage.scores(self.rc, now)), {'x', 'y'})
+
+    def test_record_compacts_large_log(self):
+        """Test a visit that pushes the log past COMPACT_BYTES folds it."""
+        with patch.object(usage, 'COMPACT_BYTES', 100):
+            for _ in range(20):
+                usage.record(self.rc, 'proj', 1000 * DAY)
+        self.assertLess(os.path.getsize(usage.usage_file(self.rc) + '.log'), 100)
+        self.assertAlmostEqual(usage.scores(self.rc, 1000 * DAY)['proj'], 20.0)
+
+
+class TestRankingCommands(UsageTestCase):
+    """Test the CLI records visits and ranks by them."""
+
+    def setUp(self):
+        super().setUp()
+        self.marks = Marks()
+        for name in ('alpha', 'beta', 'gamma'):
+            self.marks.add_mark(name, self.home)
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr'):
+                main()
+        return [str(call.args[0]) for call in mock_print.call_args_list]
+
+    def test_get_records_visit(self):
+        """Test --get and bare names count the bookmark, sub-paths count their bookmark."""
+        os.mkdir(os.path.join(self.home, 'sub'))
+        self.run_main('--get', 'gamma')
+        self.run_main('gamma/sub')
+        self.run_main('beta')
+        self.run_main('--get', 'missing')
+        scores = usage.scores(self.rc)
+        self.assertEqual(set(scores), {'beta', 'gamma'})
+        self.assertGreater(scores['gamma'], scores['beta'])
+
+    def test_index_counts_for_its_bookmark(self):
+        """Test `dir 0` and `dirmarks --get 0` record the key at index 0, with or without the lookup index."""
+        self.run_main('--get', '0')
+        self.run_main('0/')
+        with patch.object(snapshot, 'worth_caching', return_value=True):
+            self.assertTrue(self.marks.write_index())
+        with patch('dirmarks.main.Marks', side_effect=AssertionError('index not used')):
+            self.run_main('--get', '0')
+        self.assertEqual(set(usage.scores(self.rc)), {'alpha'})
+        self.assertAlmostEqual(usage.scores(self.rc)['alpha'], 3.0, places=3)
+
+    def test_top_and_sorted_list(self):
+        """Test --top lists visited bookmarks best first and the list keeps dir <n> indexes."""
+        self.assertEqual(self.run_main('--top'), ['No bookmark has been visited yet.'])
+        for name in ('gamma', 'gamma', 'beta'):
+            self.run_main('--get', name)
+        output = self.run_main('--top')
+        self.assertEqual(len(output), 2)
+        self.assertTrue(output[0].startswith('  gamma =>'))
+        self.assertTrue(output[1].startswith('  beta =>'))
+        self.assertEqual(len(self.run_main('--top', '1')), 1)
+
+        output = self.run_main('--list', '--sort', 'frecency')
+        self.assertEqual([line.split(' ')[0] for line in output], ['2', '1', '0'])
+        self.assertEqual([m['name'] for m in self.marks.top()], ['gamma', 'beta'])
+
+
+if __name__ == '__main__':
+    unittest.main()
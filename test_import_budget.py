@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Import-time budget tests for the CLI.
+The commands used by the shell function must not pull in colour support or
+package resources, since they run on every `dir <name>`.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import json
+import shutil
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+FORBIDDEN_MODULES = ['colorama', 'dirmarks.colors', 'importlib.resources']
+
+PROBE = """
+import sys, json
+sys.argv = json.loads(sys.argv[1])
+from dirmarks.main import main
+try:
+    main()
+except SystemExit:
+    pass
+loaded = [m for m in json.loads(sys.argv[-1]) if m in sys.modules]
+sys.stdout = sys.__stdout__
+print(json.dumps(loaded))
+"""
+
+
+class TestImportBudget(unittest.TestCase):
+    """Test which modules the fast CLI paths load."""
+
+    def setUp(self):
+        """Create an isolated HOME with one bookmark."""
+        self.home = tempfile.mkdtemp()
+        self.test_dir = tempfile.mkdtemp(dir=self.home)
+        with open(os.path.join(self.home, '.markrc'), 'w') as f:
+            f.write(f"proj:{self.test_dir}\n")
+
+    def tearDown(self):
+        """Clean up the temporary HOME."""
+        shutil.rmtree(self.home)
+
+    def loaded_modules(self, *args):
+        """Run dirmarks with args in a fresh interpreter and return forbidden modules it imported."""
+        argv = ['dirmarks', *args, json.dumps(FORBIDDEN_MODULES)]
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, json.dumps(argv)],
+            capture_output=True, text=True, cwd=REPO_ROOT,
+            env={**os.environ, 'HOME': self.home, 'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                 'PYTHONPATH': REPO_ROOT})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_get_is_colour_free(self):
+        """Test --get loads neither colour nor resource modules."""
+        self.assertEqual(self.loaded_modules('--get', 'proj'), [])
+
+    def test_bare_name_is_colour_free(self):
+        """Test the bare-name lookup loads neither colour nor resource modules."""
+        self.assertEqual(self.loaded_modules('proj'), [])
+
+    def test_add_and_delete_are_colour_free(self):
+        """Test mutations used by the shell function stay colour-free."""
+        self.assertEqual(self.loaded_modules('--add', 'other', self.test_dir), [])
+        self.assertEqual(self.loaded_modules('--delete', 'other'), [])
+
+    def test_redirected_listing_is_colour_free(self):
+        """Test listing into a pipe does not need colorama either."""
+        self.assertEqual(self.loaded_modules('--list'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test suite for the memory-mapped bookmark lookup index.
+Tests key and numeric lookups, staleness and corruption detection, and the
+--get fast path in main().
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks.fileutil import file_stamp
+from dirmarks.index import MarksIndex, IndexCorrupt
+from dirmarks import index, snapshot
+from dirmarks.main import find_bookmark, resolve_bookmark
+
+
+class TestIndexFormat(unittest.TestCase):
+    """Test building and probing the index."""
+
+    def setUp(self):
+        """Create a source file to stamp the index against."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, 'markrc')
+        with open(self.source, 'w') as f:
+            f.write('x')
+        self.index_file = os.path.join(self.temp_dir, 'index')
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, marks, list_paths):
+        stamps = (file_stamp(self.source),)
+        index.write(self.index_file, stamps, marks, list_paths)
+        return MarksIndex.open(self.index_file, [self.source])
+
+    def test_key_and_position_lookup(self):
+        """Test every key and list position resolves, including many colliding slots."""
+        marks = {f"key{i}": f"/path/{i}" for i in range(1000)}
+        mapped = self.write(marks, list(marks.values()))
+        for i in range(0, 1000, 37):
+            self.assertEqual(mapped.get(f"key{i}"), f"/path/{i}")
+            self.assertEqual(mapped.get(str(i)), f"/path/{i}")
+        self.assertIsNone(mapped.get('missing'))
+        self.assertIsNone(mapped.get('1000'))
+        mapped.close()
+
+    def test_numeric_key_wins_over_position(self):
+        """Test a literally numeric key takes precedence, as in get_mark."""
+        mapped = self.write({'1': '/named', 'a': '/a'}, ['/named', '/a'])
+        self.assertEqual(mapped.get('1'), '/named')
+        self.assertEqual(mapped.get('0'), '/named')
+        mapped.close()
+
+    def test_unicode_keys(self):
+        """Test non-ASCII keys and paths round-trip."""
+        mapped = self.write({'café': '/tmp/café'}, ['/tmp/café'])
+        self.assertEqual(mapped.get('café'), '/tmp/café')
+        mapped.close()
+
+    def test_stale_index_is_rejected(self):
+        """Test a changed source file makes the index unusable."""
+        self.write({'a': '/a'}, ['/a']).close()
+        with open(self.source, 'a') as f:
+            f.write('more')
+        self.assertIsNone(MarksIndex.open(self.index_file, [self.source]))
+
+    def test_damaged_header_is_rejected(self):
+        """Test the header checksum catches corruption."""
+        self.write({'a': '/a'}, ['/a']).close()
+        with open(self.index_file, 'r+b') as f:
+            f.seek(10)
+            f.write(b'\xff')
+        self.assertIsNone(MarksIndex.open(self.index_file, [self.source]))
+
+    def test_damaged_record_raises(self):
+        """Test record checksums catch corruption in the body."""
+        self.write({'a': '/aaaa'}, ['/aaaa']).close()
+        with open(self.index_file, 'r+b') as f:
+            data = f.read()
+            f.seek(data.index(b'a/aaaa') + 1)
+            f.write(b'/bbbb')
+        mapped = MarksIndex.open(self.index_file, [self.source])
+        with self.assertRaises(IndexCorrupt):
+            mapped.get('a')
+        mapped.close()
+
+    def test_missing_index(self):
+        """Test a missing index file opens as None."""
+        self.assertIsNone(MarksIndex.open(self.index_file, [self.source]))
+
+
+class TestIndexedGet(unittest.TestCase):
+    """Test the --get fast path against a real markrc."""
+
+    def setUp(self):
+        """Set up an isolated HOME with an old markrc."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.test_dir = tempfile.mkdtemp(dir=self.home)
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache')})
+        self.env.start()
+        self.threshold = patch.object(snapshot, 'MIN_SOURCE_BYTES', 0)
+        self.threshold.start()
+        with open(self.markrc_file, 'w') as f:
+            f.write(f"proj:{self.test_dir}|category:work\n")
+        past = time.time() - 10
+        os.utime(self.markrc_file, (past, past))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.threshold.stop()
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def test_fallback_builds_index_then_answers_from_it(self):
+        """Test the first lookup parses and indexes, later ones do not parse."""
+        self.assertEqual(resolve_bookmark('proj'), self.test_dir)
+        with patch.object(Marks, '__init__', side_effect=AssertionError('parsed')):
+            self.assertEqual(resolve_bookmark('proj'), self.test_dir)
+            self.assertEqual(resolve_bookmark('0'), self.test_dir)
+            self.assertIsNone(resolve_bookmark('nope'))
+
+    def test_index_rebuilt_by_writes(self):
+        """Test mutations rebuild the index so new marks resolve without parsing."""
+        resolve_bookmark('proj')
+        marks = Marks()
+        other = tempfile.mkdtemp(dir=self.home)
+        marks.add_mark('other', other)
+        marks.del_mark('proj')
+        with patch.object(Marks, '__init__', side_effect=AssertionError('parsed')):
+            self.assertEqual(resolve_bookmark('other'), other)
+            self.assertIsNone(resolve_bookmark('proj'))
+
+    def test_miss_parses_once(self):
+        """Test a miss without a current index loads the store once for the fallbacks."""
+        with patch('dirmarks.main.Marks', side_effect=Marks) as loaded:
+            self.assertEqual(find_bookmark(['prj']), (None, None, ['proj']))
+        self.assertEqual(loaded.call_count, 1)
+
+    def test_external_edit_falls_back(self):
+        """Test a hand-edited markrc is never answered from the old index."""
+        resolve_bookmark('proj')
+        with open(self.markrc_file, 'a') as f:
+            f.write(f"manual:{self.home}\n")
+        self.assertEqual(resolve_bookmark('manual'), self.home)
+
+
+if __name__ == '__main__':
+    unittest.main()
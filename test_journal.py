@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test suite for the journal storage backend.
+Tests journal replay, torn-write recovery and compaction.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks import storage
+from dirmarks.storage import JournalStorage, journal_file, read_journal
+
+
+class TestJournalBackend(unittest.TestCase):
+    """Test MarksEnhanced on the journal backend."""
+
+    def setUp(self):
+        """Set up an isolated HOME on the journal backend."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.journal = journal_file(self.markrc_file)
+        self.dirs = [tempfile.mkdtemp(dir=self.home) for _ in range(3)]
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'DIRMARKS_BACKEND': 'journal'})
+        self.env.start()
+        with open(self.markrc_file, 'w') as f:
+            f.write(f"base:{self.dirs[0]}|category:work\n")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def read_base(self):
+        with open(self.markrc_file) as f:
+            return f.read()
+
+    def test_mutations_only_append_to_journal(self):
+        """Test adds, updates and deletes leave the base file alone."""
+        base = self.read_base()
+        marks = Marks()
+        self.assertIsInstance(marks.storage(), JournalStorage)
+        self.assertTrue(marks.add_mark('one', self.dirs[1]))
+        self.assertTrue(marks.update_mark_tags('base', ['urgent']))
+        self.assertTrue(marks.del_mark('one'))
+
+        self.assertEqual(self.read_base(), base)
+        records = [(seq, op) for seq, op, _, _ in read_journal(self.journal)]
+        self.assertEqual(records, [(1, 'put'), (2, 'put'), (3, 'del')])
+
+    def test_replay_matches_in_memory_state(self):
+        """Test a fresh instance sees the same bookmarks, in the same order."""
+        marks = Marks()
+        marks.add_mark('one', self.dirs[1])
+        marks.add_mark_with_metadata('two', self.dirs[2], category='home', tags=['a'])
+        marks.update_mark_category('base', 'personal')
+        marks.update_mark('one', self.dirs[0])
+
+        fresh = Marks()
+        self.assertEqual(fresh.list, marks.list)
+        self.assertEqual(fresh.marks_metadata, marks.marks_metadata)
+        self.assertEqual(fresh.get_mark('0'), self.dirs[0])
+        self.assertEqual(fresh.get_mark('2'), self.dirs[0])
+
+    def test_torn_record_is_ignored_and_repaired(self):
+        """Test a half-written record is skipped on load and dropped by the next write."""
+        marks = Marks()
+        marks.add_mark('one', self.dirs[1])
+        with open(self.journal, 'ab') as f:
+            f.write(b'2\tput\ttorn:/nowhere')
+
+        fresh = Marks()
+        self.assertIsNone(fresh.get_mark('torn'))
+        self.assertTrue(fresh.add_mark('two', self.dirs[2]))
+
+        self.assertEqual(Marks().get_mark('two'), self.dirs[2])
+        self.assertEqual([seq for seq, _, _, _ in read_journal(self.journal)], [1, 2])
+
+    def test_corrupt_record_stops_replay(self):
+        """Test replay stops at the first record whose checksum does not match."""
+        marks = Marks()
+        marks.add_mark('one', self.dirs[1])
+        marks.add_mark('two', self.dirs[2])
+        with open(self.journal, 'rb') as f:
+            data = f.read()
+        with open(self.journal, 'wb') as f:
+            f.write(data.replace(b'one:', b'onE:'))
+
+        fresh = Marks()
+        self.assertIsNone(fresh.get_mark('one'))
+        self.assertIsNone(fresh.get_mark('two'))
+        self.assertEqual(fresh.get_mark('base'), self.dirs[0])
+
+    def test_compact_folds_journal_into_base(self):
+        """Test compaction writes the same markrc the text backend would."""
+        marks = Marks()
+        marks.add_mark_with_metadata('one', self.dirs[1], tags=['x', 'y'])
+        marks.update_mark_category('base', 'personal')
+        marks.del_mark('one')
+        marks.add_mark('two', self.dirs[2])
+        self.assertTrue(marks.compact())
+
+        self.assertFalse(os.path.exists(self.journal))
+        self.assertEqual(self.read_base(),
+                         f"base:{self.dirs[0]}|category:personal\ntwo:{self.dirs[2]}\n")
+        self.assertEqual(Marks().marks_metadata, marks.marks_metadata)
+
+    def test_automatic_compaction_bounds_journal(self):
+        """Test the journal is folded in once it outgrows the base file."""
+        marks = Marks()
+        with patch.object(storage, 'JOURNAL_MIN_BYTES', 512):
+            for i in range(50):
+                marks.update_mark_tags('base', [f"tag{i}"])
+                if os.path.exists(self.journal):
+                    self.assertLess(os.path.getsize(self.journal), 1024)
+        self.assertEqual(Marks().get_mark_with_metadata('base')['tags'], ['tag49'])
+
+    def test_migrate_to_text_folds_journal(self):
+        """Test leaving the journal backend leaves no journal to replay later."""
+        marks = Marks()
+        marks.add_mark('one', self.dirs[1])
+        self.assertTrue(marks.migrate_storage('text'))
+        self.assertFalse(os.path.exists(self.journal))
+        self.assertIn(f"one:{self.dirs[1]}\n", self.read_base())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test suite for multi-token jumps.
+Tests the ordered-substring matching rules, ranking by match quality and
+frecency, and `dir <word> <word>` through main(), the daemon and the shell
+function.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+import subprocess
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks.daemon import MarksDaemon
+from dirmarks import jump, usage
+
+FUNCTION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'dirmarks', 'data', 'dirmarks.function')
+
+
+class TestMatching(unittest.TestCase):
+    """Test jump.quality and jump.rank on their own."""
+
+    def test_quality(self):
+        """Test tokens must occur in order and the last one in the last component."""
+        self.assertEqual(jump.quality(['proj', 'api'], 'x', '/srv/projects/api'), jump.PATH_EXACT)
+        self.assertEqual(jump.quality(['proj', 'ap'], 'x', '/srv/projects/api/'), jump.PATH_PREFIX)
+        self.assertEqual(jump.quality(['pi'], 'x', '/srv/projects/api'), jump.PATH_INFIX)
+        self.assertEqual(jump.quality(['api', 'proj'], 'x', '/srv/projects/api'), 0)
+        self.assertEqual(jump.quality(['proj'], 'x', '/srv/projects/api'), 0)
+        self.assertEqual(jump.quality(['api'], 'x', '/srv/api/api-v2'), jump.PATH_PREFIX)
+        self.assertEqual(jump.quality(['we', 'pp'], 'webapp', '/var/www'), jump.KEY_PREFIX)
+        self.assertEqual(jump.quality(['app'], 'webapp', '/var/www'), jump.KEY_INFIX)
+
+    def test_rank(self):
+        """Test quality ranks first, then frecency, then the shorter path."""
+        table = {'a': ('a', '/srv/x/api'), 'b': ('b', '/srv/api'), 'c': ('c', '/srv/apis'),
+                 'd': ('d', '/srv/rapi'), 'api-docs': ('api-docs', '/srv/docs')}
+        self.assertEqual(jump.rank(['API'], table), ['api-docs', 'b', 'a', 'c', 'd'])
+        self.assertEqual(jump.rank(['api'], table, {'a': 2.0, 'c': 9.0}), ['api-docs', 'a', 'b', 'c', 'd'])
+        self.assertEqual(jump.rank([], table), [])
+
+
+class JumpTestCase(unittest.TestCase):
+    """Isolated HOME with a few project bookmarks."""
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_STATE_HOME': os.path.join(self.home, '.state'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        self.dirs = {}
+        for key, sub in (('shop', 'projects/shop/api'), ('blog', 'projects/blog/api'),
+                         ('web', 'projects/shop/web')):
+            self.dirs[key] = os.path.join(self.home, sub)
+            os.makedirs(self.dirs[key])
+        self.marks = Marks()
+        for key, path in self.dirs.items():
+            self.marks.add_mark(key, path)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+
+class TestMarksMatches(JumpTestCase):
+    """Test MarksEnhanced.matches."""
+
+    def test_matches(self):
+        """Test matches are ranked and follow updates and deletes."""
+        self.assertEqual([m['name'] for m in self.marks.matches(['proj', 'api'])], ['shop', 'blog'])
+        self.assertEqual([m['name'] for m in self.marks.matches(['blog', 'api'])], ['blog'])
+        os.mkdir(os.path.join(self.home, 'elsewhere'))
+        self.marks.update_mark('blog', os.path.join(self.home, 'elsewhere'))
+        self.marks.del_mark('shop')
+        self.assertEqual(self.marks.matches(['proj', 'api']), [])
+        self.assertEqual([m['name'] for m in self.marks.matches(['else'])], ['blog'])
+
+    def test_frecency_breaks_ties(self):
+        """Test the more visited of two equal matches wins."""
+        usage.start_tracking(self.marks.rc)
+        usage.record(self.marks.rc, 'blog')
+        self.assertEqual(self.marks.matches(['proj', 'api'])[0]['name'], 'blog')
+
+
+class TestJumpCommand(JumpTestCase):
+    """Test the bare-name and --get paths of main()."""
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr') as mock_stderr:
+                main()
+        output = [str(call.args[0]) for call in mock_print.call_args_list]
+        errors = ''.join(str(call.args[0]) for call in mock_stderr.write.call_args_list)
+        return output, errors
+
+    def test_tokens(self):
+        """Test several tokens jump to the best match and a name still wins."""
+        self.assertEqual(self.run_main('blog', 'api')[0], [self.dirs['blog']])
+        self.assertEqual(self.run_main('--get', 'shop', 'web')[0], [self.dirs['web']])
+        self.assertEqual(self.run_main('web')[0], [self.dirs['web']])
+        output, errors = self.run_main('shop', 'nope')
+        self.assertEqual(output, [])
+        self.assertIn('Bookmark not found.', errors)
+
+    def test_miss_falls_back(self):
+        """Test an unknown name is matched as a word and the visit counted for the match."""
+        usage.start_tracking(self.marks.rc)
+        self.assertEqual(self.run_main('--get', 'projects')[0], [])
+        self.assertEqual(self.run_main('--get', 'blo')[0], [self.dirs['blog']])
+        self.assertEqual(set(usage.scores(self.marks.rc)), {'blog'})
+
+    def test_daemon(self):
+        """Test the daemon answers multi-token gets."""
+        daemon = MarksDaemon(self.marks)
+        self.assertEqual(daemon.dispatch(['get', 'blog', 'api']), [f"+{self.dirs['blog']}"])
+        self.assertEqual(daemon.dispatch(['get', 'sho']), [f"+{self.dirs['shop']}"])
+        self.assertEqual(daemon.dispatch(['get', 'x', 'y']), ['-Bookmark not found.'])
+
+    @unittest.skipUnless(shutil.which('bash'), 'bash not available')
+    def test_shell_passes_tokens(self):
+        """Test dir hands every word to dirmarks and skips the cache for several words."""
+        script = f"""
+            dirmarks() {{ echo "call: $*" >&2; }}
+            . '{FUNCTION_FILE}'
+            dir proj api
+            dir -p blog api
+        """
+        result = subprocess.run(['bash', '-c', script], capture_output=True, text=True,
+                                env={**os.environ, 'DIRMARKS_SOCKET': os.path.join(self.home, 'none')})
+        self.assertEqual(result.stderr.splitlines(), ['call: --get proj api', 'call: --get blog api'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test suite for concurrency-safe bookmark writes.
+Tests the inter-process write lock and re-reading the store under it.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+import multiprocessing
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks import locking
+from dirmarks.locking import FileLock, LockTimeout, lock_path
+
+
+def _add_and_delete(worker_id, target):
+    """Worker for the multi-process test."""
+    marks = Marks()
+    for i in range(20):
+        marks.add_mark(f"w{worker_id}-{i}", target)
+        if i % 2:
+            marks.del_mark(f"w{worker_id}-{i}")
+
+
+class TestWriteLock(unittest.TestCase):
+    """Test writers serialize and never lose each other's changes."""
+
+    def setUp(self):
+        """Set up an isolated HOME and runtime directory."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.dirs = [tempfile.mkdtemp(dir=self.home) for _ in range(3)]
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def test_stale_instance_rereads_before_writing(self):
+        """Test a rewrite by an out-of-date instance keeps bookmarks added elsewhere."""
+        first = Marks()
+        second = Marks()
+        self.assertTrue(first.add_mark('a', self.dirs[0]))
+        self.assertTrue(first.add_mark('b', self.dirs[1]))
+
+        self.assertTrue(second.add_mark('c', self.dirs[2]))
+        self.assertTrue(second.del_mark('a'))
+        self.assertEqual(list(Marks().marks), ['b', 'c'])
+
+    def test_duplicate_check_sees_other_writers(self):
+        """Test an instance cannot add a key another process added after it loaded."""
+        first = Marks()
+        second = Marks()
+        self.assertTrue(first.add_mark('a', self.dirs[0]))
+        self.assertFalse(second.add_mark('a', self.dirs[1]))
+        self.assertEqual(Marks().get_mark('a'), self.dirs[0])
+
+    def test_lock_timeout(self):
+        """Test a writer gives up when another process holds the lock."""
+        marks = Marks()
+        with FileLock(lock_path(marks.rc)):
+            ctx = multiprocessing.get_context('fork')
+            with patch.object(locking, 'LOCK_TIMEOUT', 0.05):
+                proc = ctx.Process(target=self._expect_timeout, args=(marks,))
+                proc.start()
+                proc.join()
+        self.assertEqual(proc.exitcode, 0)
+        self.assertIsNone(Marks().get_mark('late'))
+
+    def _expect_timeout(self, marks):
+        try:
+            marks.add_mark('late', self.dirs[0])
+        except LockTimeout:
+            os._exit(0)
+        os._exit(1)
+
+    def test_untrusted_runtime_dir(self):
+        """Test a runtime directory others can write to, or a symlink, is not used."""
+        shared = os.path.join(self.home, 'shared')
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        os.symlink(self.dirs[0], os.path.join(self.home, 'link'))
+        for directory in (shared, os.path.join(self.home, 'link')):
+            with self.assertRaises(locking.UnsafeDirectory):
+                locking.private_dir(directory)
+            with FileLock(os.path.join(directory, 'x.lock')) as lock:
+                self.assertIsNone(lock.fd)
+        self.assertEqual(os.listdir(shared), [])
+        self.assertEqual(locking.private_dir(os.path.join(self.home, 'new')), os.path.join(self.home, 'new'))
+        self.assertEqual(os.stat(os.path.join(self.home, 'new')).st_mode & 0o777, 0o700)
+
+    def test_reentrant_within_batch(self):
+        """Test mutators called inside a batch do not deadlock on the held lock."""
+        marks = Marks()
+        with patch.object(locking, 'LOCK_TIMEOUT', 0.05):
+            with marks.batch():
+                marks.add_mark('a', self.dirs[0])
+                marks.update_mark('a', self.dirs[1])
+        self.assertEqual(Marks().get_mark('a'), self.dirs[1])
+
+    def test_parallel_writers_lose_nothing(self):
+        """Test concurrent processes adding and deleting end in the expected state."""
+        ctx = multiprocessing.get_context('fork')
+        procs = [ctx.Process(target=_add_and_delete, args=(w, self.dirs[0])) for w in range(4)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        expected = {f"w{w}-{i}" for w in range(4) for i in range(0, 20, 2)}
+        self.assertEqual(set(Marks().marks), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test suite for the boolean query language.
+Tests parsing, component-wise globs on the category and path tries,
+selective evaluation order and dirmarks --query on the CLI.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks import query
+from dirmarks.metaindex import MetadataIndex, PathTrie
+from dirmarks.query import QueryError, parse
+
+
+class TestParser(unittest.TestCase):
+    """Test query parsing and precedence."""
+
+    def test_precedence_and_implicit_and(self):
+        """Test NOT binds tighter than AND, which binds tighter than OR."""
+        self.assertEqual(repr(parse('tag:a tag:b OR NOT tag:c AND category:x/')),
+                         '((tag:a AND tag:b) OR (NOT tag:c AND category:x/**))')
+        self.assertEqual(repr(parse('tag:a and (tag:b or tag:c)')), '(tag:a AND (tag:b OR tag:c))')
+
+    def test_quoted_values(self):
+        """Test quotes protect spaces and parentheses in values."""
+        self.assertEqual(repr(parse('path:"/srv/my (old) project"')), 'path:/srv/my (old) project')
+
+    def test_errors(self):
+        """Test malformed queries raise QueryError."""
+        for text in ('', 'tag:a AND', '(tag:a', 'tag:a)', 'urgent', 'color:red', 'tag:', 'path:"/x'):
+            with self.assertRaises(QueryError, msg=text):
+                parse(text)
+
+
+class TestPathGlobs(unittest.TestCase):
+    """Test component-wise globbing on the path trie."""
+
+    def setUp(self):
+        self.trie = PathTrie()
+        for key, path in [('a', '/srv'), ('b', '/srv/web'), ('c', '/srv/web/static'),
+                          ('d', '/srv-old/web'), ('e', '/home/u/web')]:
+            self.trie.add(key, path)
+
+    def test_glob(self):
+        """Test '*' stays within a component and '**' spans several."""
+        self.assertEqual(self.trie.glob('/srv/*'), {'b'})
+        self.assertEqual(self.trie.glob('/srv/**'), {'a', 'b', 'c'})
+        self.assertEqual(self.trie.glob('/srv*/web'), {'b', 'd'})
+        self.assertEqual(self.trie.glob('/**/web'), {'b', 'd', 'e'})
+        self.assertEqual(self.trie.glob('/srv/web'), {'b'})
+        self.assertEqual(self.trie.glob('/nope/**'), set())
+
+    def test_estimate_bounds_glob(self):
+        """Test estimates come from the literal prefix and bound the result."""
+        for pattern in ('/srv/*', '/srv/**', '/srv*/web', '/**/web', '/srv/web', '/nope/*'):
+            self.assertGreaterEqual(self.trie.estimate(pattern), len(self.trie.glob(pattern)), pattern)
+        self.assertEqual(self.trie.estimate('/srv/**'), 3)
+
+
+class TestQueries(unittest.TestCase):
+    """Test queries against MarksEnhanced."""
+
+    def setUp(self):
+        """Set up an isolated HOME with categorized and tagged bookmarks."""
+        self.home = tempfile.mkdtemp()
+        self.srv = os.path.join(self.home, 'srv')
+        self.dirs = {}
+        for name in ('api', 'web', 'web/static', 'old', 'notes'):
+            self.dirs[name] = os.path.join(self.srv, name)
+            os.makedirs(self.dirs[name])
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        self.marks = Marks()
+        self.marks.add_mark_with_metadata('api', self.dirs['api'], 'work/backend', ['urgent'])
+        self.marks.add_mark_with_metadata('web', self.dirs['web'], 'work/web', ['urgent', 'frontend'])
+        self.marks.add_mark_with_metadata('static', self.dirs['web/static'], 'work/web', ['urgent'])
+        self.marks.add_mark_with_metadata('old', self.dirs['old'], 'work', ['urgent', 'deprecated'])
+        self.marks.add_mark_with_metadata('notes', self.dirs['notes'], 'personal', ['frontend'])
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def names(self, expression):
+        return [mark['name'] for mark in self.marks.query(expression)]
+
+    def test_combined_query(self):
+        """Test the example query from the command help."""
+        self.assertEqual(
+            self.names(f'category:work/** AND tag:urgent AND NOT tag:deprecated AND path:{self.srv}/*'),
+            ['api', 'web'])
+
+    def test_or_not_and_globs(self):
+        """Test unions, complements and tag globs, in bookmark order."""
+        self.assertEqual(self.names('tag:frontend OR category:work/backend'), ['api', 'web', 'notes'])
+        self.assertEqual(self.names('NOT category:work/'), ['notes'])
+        self.assertEqual(self.names('tag:dep* OR tag:front*'), ['web', 'old', 'notes'])
+        self.assertEqual(self.names('category:work/*'), ['api', 'web', 'static'])
+        self.assertEqual(self.names(f'path:{self.srv}/ NOT path:{self.srv}/web/**'),
+                         ['api', 'old', 'notes'])
+        self.assertEqual(self.names('tag:absent AND category:work/'), [])
+
+    def test_matches_agrees_with_evaluate(self):
+        """Test per-candidate checks and set evaluation give the same answer."""
+        index = MetadataIndex(self.marks.marks_metadata)
+        for text in ('category:work/**', 'tag:urgent NOT tag:deprecated', f'path:{self.srv}/*',
+                     'tag:front* OR category:personal', 'NOT (tag:urgent OR category:personal)'):
+            node = parse(text)
+            self.assertEqual(node.evaluate(index),
+                             {key for key in index.source if node.matches(index, key)}, text)
+
+    def test_selective_term_filters_candidates(self):
+        """Test a broad term is checked per candidate once the selective one has run."""
+        with patch.object(query.Term, 'evaluate', autospec=True,
+                          side_effect=query.Term.evaluate) as evaluate:
+            self.assertEqual(self.names(f'path:{self.srv}/** AND tag:deprecated'), ['old'])
+        self.assertEqual([call.args[0].field for call in evaluate.call_args_list], ['tag'])
+
+    def test_index_follows_path_updates(self):
+        """Test the path trie is kept current when a bookmark moves."""
+        self.marks.query('path:/**')
+        self.marks.update_mark('notes', self.dirs['web/static'])
+        self.assertEqual(self.names(f'path:{self.srv}/web/**'), ['web', 'static', 'notes'])
+        self.assertEqual(self.names(f'path:{self.srv}/notes'), [])
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', '--query', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr') as mock_stderr:
+                main()
+        output = '\n'.join(str(call.args[0]) for call in mock_print.call_args_list)
+        errors = ''.join(str(call.args[0]) for call in mock_stderr.write.call_args_list)
+        return output, errors
+
+    def test_cli(self):
+        """Test dirmarks --query prints matches and reports malformed queries."""
+        output, _ = self.run_main('category:work/', 'AND NOT tag:urgent OR tag:frontend')
+        self.assertIn('notes =>', output)
+        self.assertIn('web =>', output)
+        self.assertNotIn('api =>', output)
+
+        output, errors = self.run_main('tag:urgent AND')
+        self.assertEqual(output, '')
+        self.assertIn('Invalid query', errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test suite for incremental reloads of long-lived Marks instances.
+Tests that refresh() parses only appended data and falls back to a full
+reload after rewrites, truncation or inode changes.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks, MarksEnhanced
+from dirmarks.storage import journal_file
+
+
+class RefreshTestCase(unittest.TestCase):
+    """Isolated HOME with two bookmarks."""
+
+    backend = 'text'
+
+    def setUp(self):
+        """Set up an isolated HOME."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.dirs = [tempfile.mkdtemp(dir=self.home) for _ in range(4)]
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home,
+                                           'DIRMARKS_BACKEND': self.backend})
+        self.env.start()
+        with open(self.markrc_file, 'w') as f:
+            f.write(f"a:{self.dirs[0]}\nb:{self.dirs[1]}|category:work\n")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def no_full_reload(self):
+        return patch.object(MarksEnhanced, 'reload', side_effect=AssertionError('full reload'))
+
+
+class TestTextRefresh(RefreshTestCase):
+    """Test refresh() on the text backend."""
+
+    def test_unchanged(self):
+        """Test refresh reports no change when nothing was written."""
+        marks = Marks()
+        self.assertFalse(marks.refresh())
+
+    def test_appended_lines_parsed_incrementally(self):
+        """Test bookmarks added elsewhere are picked up without a full reload."""
+        marks = Marks()
+        Marks().add_mark_with_metadata('c', self.dirs[2], tags=['x'])
+        with open(self.markrc_file, 'a') as f:
+            f.write(f"d:{self.dirs[3]}\n")
+
+        with self.no_full_reload():
+            self.assertTrue(marks.refresh())
+            self.assertEqual(marks.get_mark_with_metadata('c')['tags'], ['x'])
+            self.assertEqual(marks.get_mark('3'), self.dirs[3])
+            # Later appends continue from the new position
+            with open(self.markrc_file, 'a') as f:
+                f.write(f"e:{self.dirs[0]}\n")
+            self.assertTrue(marks.refresh())
+        self.assertEqual(list(marks.marks), ['a', 'b', 'c', 'd', 'e'])
+
+    def test_own_writes_do_not_need_reparsing(self):
+        """Test an instance's own appends leave it up to date."""
+        marks = Marks()
+        marks.add_mark('c', self.dirs[2])
+        with open(self.markrc_file, 'a') as f:
+            f.write(f"d:{self.dirs[3]}\n")
+        with self.no_full_reload():
+            marks.refresh()
+        self.assertEqual(marks.list, [f"a:{self.dirs[0]}", f"b:{self.dirs[1]}",
+                                      f"c:{self.dirs[2]}", f"d:{self.dirs[3]}"])
+
+    def test_rewrite_falls_back_to_full_reload(self):
+        """Test a delete elsewhere (an atomic rewrite) is picked up by re-reading."""
+        marks = Marks()
+        Marks().del_mark('a')
+        self.assertTrue(marks.refresh())
+        self.assertEqual(list(marks.marks), ['b'])
+
+    def test_in_place_rewrite_that_grows_falls_back(self):
+        """Test a same-inode rewrite is not mistaken for an append."""
+        marks = Marks()
+        with open(self.markrc_file, 'r+') as f:
+            f.write(f"z:{self.dirs[2]}\nb:{self.dirs[1]}|category:work\nc:{self.dirs[3]}\n")
+        self.assertTrue(marks.refresh())
+        self.assertEqual(list(marks.marks), ['z', 'b', 'c'])
+
+    def test_truncation_falls_back(self):
+        """Test a shrunken file is re-read completely."""
+        marks = Marks()
+        with open(self.markrc_file, 'r+') as f:
+            f.truncate(len(f"a:{self.dirs[0]}\n"))
+        self.assertTrue(marks.refresh())
+        self.assertEqual(list(marks.marks), ['a'])
+
+
+class TestJournalRefresh(RefreshTestCase):
+    """Test refresh() on the journal backend."""
+
+    backend = 'journal'
+
+    def test_appended_records_replayed_incrementally(self):
+        """Test journal records written elsewhere are replayed without a full reload."""
+        marks = Marks()
+        other = Marks()
+        other.add_mark('c', self.dirs[2])
+        other.update_mark_category('a', 'home')
+        other.del_mark('b')
+        with self.no_full_reload():
+            self.assertTrue(marks.refresh())
+        self.assertEqual(marks.marks_metadata, other.marks_metadata)
+        self.assertEqual(marks.list, other.list)
+
+    def test_compaction_falls_back(self):
+        """Test a compacted journal is picked up by re-reading."""
+        marks = Marks()
+        other = Marks()
+        other.add_mark('c', self.dirs[2])
+        marks.refresh()
+        other.del_mark('a')
+        self.assertTrue(other.compact())
+        self.assertFalse(os.path.exists(journal_file(self.markrc_file)))
+        self.assertTrue(marks.refresh())
+        self.assertEqual(list(marks.marks), ['b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Test suite for following renamed and moved directories.
+Tests the identity table and what records it, the search around missing
+paths, move_mark, and --relocate-missing and --rewrite-prefix rewriting
+every path with one write.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks.storage import TextStorage
+from dirmarks import pathcheck, relocate
+
+
+class RelocateTestCase(unittest.TestCase):
+    """Isolated HOME with src/{api,web} and an empty work/."""
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.rc = os.path.join(self.home, '.markrc')
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_STATE_HOME': os.path.join(self.home, '.state'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        for sub in ('src/api', 'src/web', 'work'):
+            os.makedirs(self.path(sub))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def path(self, *parts):
+        return os.path.join(self.home, *parts)
+
+
+class TestIdentities(RelocateTestCase):
+    """Test the identity table and the search."""
+
+    def test_every_new_path_recorded(self):
+        """Test adds, updates, scans and moves record identities, checked or not."""
+        self.assertFalse(os.path.exists(relocate.identity_file(self.rc)))
+        marks = Marks()
+        marks.add_mark('api', self.path('src', 'api'))
+        self.assertEqual(relocate.identities(self.rc),
+                         {self.path('src', 'api'): pathcheck.identify(self.path('src', 'api'))})
+        self.assertEqual(os.stat(relocate.identity_file(self.rc)).st_mode & 0o777, 0o600)
+
+        marks.add_mark('unchecked', self.path('work'), verify=False)
+        marks.update_mark('api', self.path('src', 'web'), verify=False)
+        os.makedirs(self.path('src', 'api', '.git'))
+        self.assertEqual(len(marks.discover(self.path('src'))), 1)
+        os.makedirs(self.path('moved'))
+        marks.move_mark('unchecked', self.path('moved'))
+        marks.add_mark('nowhere', self.path('nowhere'), verify=False)
+        self.assertEqual(set(relocate.identities(self.rc)),
+                         {self.path(*sub) for sub in [('src', 'api'), ('src', 'web'), ('work',), ('moved',)]})
+
+    def test_dead_mount_not_stat_ed(self):
+        """Test unchecked paths on a mount that timed out are not recorded."""
+        with patch.object(pathcheck, '_mounts', [self.home, '/']), \
+                patch.object(pathcheck, 'mount_health', return_value={self.home: (False, 0.0)}), \
+                patch.object(pathcheck, 'identify') as identify:
+            Marks().add_mark('api', self.path('src', 'api'), verify=False)
+        identify.assert_not_called()
+        self.assertEqual(relocate.identities(self.rc), {})
+
+    def test_table_bounded(self):
+        """Test a bookmark moved back and forth keeps the table near the live size."""
+        marks = Marks()
+        marks.add_mark('web', self.path('src', 'web'))
+        marks.add_mark('api', self.path('src', 'api'))
+        for i in range(50):
+            self.assertTrue(marks.update_mark('api', self.path('work') if i % 2 else self.path('src', 'api')))
+        with open(relocate.identity_file(self.rc)) as f:
+            lines = f.read().splitlines()
+        self.assertLessEqual(len(lines), 8)
+        table = relocate.identities(self.rc)
+        self.assertEqual(table[self.path('work')], pathcheck.identify(self.path('work')))
+        self.assertIn(self.path('src', 'web'), table)
+
+    def test_rolled_back_batch_not_recorded(self):
+        """Test paths added in a batch that failed are not recorded when the lock is released."""
+        marks = Marks()
+        with marks._write_lock():
+            with self.assertRaises(RuntimeError):
+                with marks.batch():
+                    marks.add_mark('work', self.path('work'))
+                    raise RuntimeError('abort')
+            marks.add_mark('api', self.path('src', 'api'))
+        self.assertEqual(set(relocate.identities(self.rc)), {self.path('src', 'api')})
+
+    def test_torn_lines(self):
+        """Test damaged lines are skipped and the last record of a path wins."""
+        relocate.save(self.rc, {'/a': (1, 2)})
+        with open(relocate.identity_file(self.rc), 'a') as f:
+            f.write("x\t3\t/b\n1\t5\t/a\n7\t8")
+        self.assertEqual(relocate.identities(self.rc), {'/a': (1, 5)})
+
+    def test_search_root(self):
+        """Test the search starts above the nearest existing ancestor but never at /."""
+        self.assertEqual(relocate.search_root(self.path('src', 'gone', 'deeper')), self.home)
+        self.assertEqual(relocate.search_root(self.path('src', 'gone'), climb=0), self.path('src'))
+        self.assertIsNone(relocate.search_root('/nonexistent-dirmarks-test/x'))
+
+    def test_find_moved(self):
+        """Test moved directories are found by inode, including deeper and sibling moves."""
+        api, web = pathcheck.identify(self.path('src', 'api')), pathcheck.identify(self.path('src', 'web'))
+        os.makedirs(self.path('work', 'old'))
+        os.rename(self.path('src', 'api'), self.path('work', 'api-v2'))
+        os.rename(self.path('src', 'web'), self.path('work', 'old', 'web'))
+        missing = {self.path('src', 'api'): api, self.path('src', 'web'): web,
+                   self.path('src', 'lost'): (api[0], api[1] + 10 ** 9)}
+        self.assertEqual(relocate.find_moved(missing),
+                         {self.path('src', 'api'): self.path('work', 'api-v2'),
+                          self.path('src', 'web'): self.path('work', 'old', 'web')})
+        self.assertEqual(relocate.find_moved(missing, depth=1),
+                         {self.path('src', 'api'): self.path('work', 'api-v2')})
+
+
+class TestRelocateCommand(RelocateTestCase):
+    """Test MarksEnhanced.move_mark, --relocate-missing and --rewrite-prefix."""
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr') as mock_stderr:
+                main()
+        output = [str(call.args[0]) for call in mock_print.call_args_list]
+        errors = ''.join(str(call.args[0]) for call in mock_stderr.write.call_args_list)
+        return output, errors
+
+    def test_move_mark(self):
+        """Test a moved bookmark keeps its metadata and place, and indexes follow."""
+        marks = Marks()
+        marks.add_mark('first', self.path('work'))
+        marks.add_mark_with_metadata('api', self.path('src', 'api'), category='work', tags=['go'])
+        marks.add_mark('last', self.path('src', 'web'))
+        self.assertEqual(marks.where(self.path('src', 'api', 'x'))[0]['name'], 'api')
+        self.assertTrue(marks.move_mark('api', self.path('src', 'web')))
+        self.assertFalse(marks.move_mark('nope', self.home))
+        fresh = Marks()
+        self.assertEqual(fresh.get_mark('1'), self.path('src', 'web'))
+        self.assertEqual(fresh.get_mark_with_metadata('api')['tags'], ['go'])
+        self.assertEqual(fresh.list_by_category('work')[0]['path'], self.path('src', 'web'))
+        self.assertEqual(marks.where(self.path('src', 'api', 'x')), [])
+
+    def test_relocate_missing(self):
+        """Test moved bookmarks are rewritten with one write and others left alone."""
+        marks = Marks()
+        marks.add_mark_with_metadata('api', self.path('src', 'api'), category='work')
+        marks.add_mark('web', self.path('src', 'web'))
+        marks.add_mark('gone', self.path('work'))
+        self.assertEqual(self.run_main('--relocate-missing'), (['Relocated 0 bookmarks.'], ''))
+
+        os.rename(self.path('src', 'api'), self.path('work', 'api-v2'))
+        os.rmdir(self.path('src', 'web'))
+        with patch.object(TextStorage, 'write_all', autospec=True,
+                          side_effect=TextStorage.write_all) as write_all:
+            output, errors = self.run_main('--relocate-missing', '--depth', '2')
+        self.assertEqual(errors, '')
+        self.assertEqual(write_all.call_count, 1)
+        self.assertEqual(output, [f"  api: {self.path('src', 'api')} -> {self.path('work', 'api-v2')}",
+                                  'Relocated 1 bookmarks.'])
+        fresh = Marks()
+        self.assertEqual(fresh.get_mark_with_metadata('api')['category'], 'work')
+        self.assertEqual(fresh.get_mark('api'), self.path('work', 'api-v2'))
+        self.assertEqual(fresh.get_mark('web'), self.path('src', 'web'))
+        self.assertIn(self.path('work', 'api-v2'), relocate.identities(self.rc))
+
+        self.assertIn('Usage', self.run_main('--relocate-missing', '--depth', 'x')[1])
+
+    def test_added_then_moved(self):
+        """Test a bookmark added from the command line is found after mv."""
+        self.assertEqual(self.run_main('--add', 'api', self.path('src', 'api'))[1], '')
+        os.rename(self.path('src', 'api'), self.path('work', 'api'))
+        output, errors = self.run_main('--relocate-missing')
+        self.assertEqual((output, errors),
+                         ([f"  api: {self.path('src', 'api')} -> {self.path('work', 'api')}",
+                           'Relocated 1 bookmarks.'], ''))
+        self.assertEqual(Marks().get_mark('api'), self.path('work', 'api'))
+
+    def test_rewrite_prefix(self):
+        """Test whole components under the prefix are moved with one write, unchecked."""
+        marks = Marks()
+        marks.add_mark('nas', '/mnt/nas', verify=False)
+        marks.add_mark_with_metadata('media', '/mnt/nas/media', category='home', verify=False)
+        marks.add_mark('nas2', '/mnt/nas2/x', verify=False)
+        marks.add_mark('api', self.path('src', 'api'))
+        expected = [f"  nas: /mnt/nas -> {self.path('nas')}",
+                    f"  media: /mnt/nas/media -> {self.path('nas', 'media')}"]
+
+        self.assertEqual(self.run_main('--rewrite-prefix', '/mnt/nas/', self.path('nas'), '--dry-run')[0],
+                         expected + ['Would rewrite 2 bookmarks.'])
+        self.assertEqual(Marks().get_mark('media'), '/mnt/nas/media')
+        with patch.object(TextStorage, 'write_all', autospec=True,
+                          side_effect=TextStorage.write_all) as write_all:
+            output, errors = self.run_main('--rewrite-prefix', '/mnt/nas', self.path('nas'))
+        self.assertEqual((output, errors), (expected + ['Rewrote 2 bookmarks.'], ''))
+        self.assertEqual(write_all.call_count, 1)
+        fresh = Marks()
+        self.assertEqual(fresh.get_mark('media'), self.path('nas', 'media'))
+        self.assertEqual(fresh.get_mark_with_metadata('media')['category'], 'home')
+        self.assertEqual(fresh.get_mark('nas2'), '/mnt/nas2/x')
+        self.assertNotIn(self.path('nas', 'media'), relocate.identities(self.rc))
+        os.makedirs(self.path('home', 'api'))
+        self.run_main('--rewrite-prefix', self.path('src'), self.path('home'))
+        self.assertIn(self.path('home', 'api'), relocate.identities(self.rc))
+        self.assertEqual(self.run_main('--rewrite-prefix', '/mnt/nas', '/x')[0], ['Rewrote 0 bookmarks.'])
+        self.assertIn('Usage', self.run_main('--rewrite-prefix', '/mnt/nas')[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
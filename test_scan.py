@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test suite for bulk discovery of project directories.
+Tests the level-by-level walk, key derivation and collisions, automatic
+categories, and --scan adding everything with one write.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks.storage import TextStorage
+from dirmarks import scan
+
+
+class ScanTestCase(unittest.TestCase):
+    """Isolated HOME with a monorepo checkout."""
+
+    def setUp(self):
+        """Set up mono/{.git, services/{billing,auth}, libs/auth, node_modules/x, .hidden/y}."""
+        self.home = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        self.root = os.path.join(self.home, 'mono')
+        os.makedirs(os.path.join(self.root, '.git'))
+        for sub in ('services/billing', 'services/auth', 'libs/auth', 'node_modules/x', '.hidden/y',
+                    'services/deep/er/svc'):
+            os.makedirs(os.path.join(self.root, sub))
+            open(os.path.join(self.root, sub, 'pyproject.toml'), 'w').close()
+        os.symlink(os.path.join(self.root, 'services'), os.path.join(self.root, 'link'))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+
+class TestFind(ScanTestCase):
+    """Test scan.find and the helpers."""
+
+    def test_find(self):
+        """Test matches at every level, pruning, depth and alternatives."""
+        self.assertEqual(scan.find(self.root, '.git|pyproject.toml', depth=2),
+                         [self.root, self.path('libs', 'auth'), self.path('services', 'auth'),
+                          self.path('services', 'billing')])
+        self.assertEqual(scan.find(self.root, 'pyproject.*', depth=4)[-1], self.path('services', 'deep', 'er', 'svc'))
+        self.assertEqual(scan.find(self.root, '.git', depth=0), [self.root])
+        self.assertEqual(scan.find(os.path.join(self.home, 'none'), '.git'), [])
+
+    def test_keys(self):
+        """Test keys are made safe and collisions get the parent's name, then a number."""
+        taken = {'auth', 'proj'}
+        self.assertEqual(scan.make_key('/srv/services/auth', taken), 'services-auth')
+        self.assertEqual(scan.make_key('/srv/a b:c|d', taken), 'a-b-c-d')
+        self.assertEqual(scan.make_key('/srv/2024', taken), 'srv-2024')
+        taken |= {'services-auth', 'services-auth-2'}
+        self.assertEqual(scan.make_key('/x/services/auth', taken), 'services-auth-3')
+
+    def test_auto_category(self):
+        """Test categories follow the place under root."""
+        self.assertEqual(scan.auto_category(self.root, self.root), 'mono')
+        self.assertEqual(scan.auto_category(self.root, self.path('services', 'auth')), 'mono/services')
+        self.assertEqual(scan.auto_category(self.root, self.path('services', 'deep', 'er', 'svc')),
+                         'mono/services/deep/er')
+
+
+class TestScanCommand(ScanTestCase):
+    """Test MarksEnhanced.discover and --scan."""
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr') as mock_stderr:
+                main()
+        output = [str(call.args[0]) for call in mock_print.call_args_list]
+        errors = ''.join(str(call.args[0]) for call in mock_stderr.write.call_args_list)
+        return output, errors
+
+    def test_scan(self):
+        """Test everything is added in one write, with auto categories and distinct keys."""
+        Marks().add_mark('billing', self.home)
+        with patch.object(TextStorage, 'write_all', autospec=True,
+                          side_effect=TextStorage.write_all) as write_all, \
+                patch.object(TextStorage, 'append', side_effect=AssertionError('append')):
+            output, errors = self.run_main('--scan', self.root, '--depth', '2',
+                                           '--match', '.git|pyproject.toml', '--category', 'auto')
+        self.assertEqual(errors, '')
+        self.assertEqual(write_all.call_count, 1)
+        self.assertEqual(output[-1], 'Added 4 bookmarks.')
+        marks = Marks()
+        self.assertEqual(marks.get_mark('mono'), self.root)
+        self.assertEqual(marks.get_mark('auth'), self.path('libs', 'auth'))
+        self.assertEqual(marks.get_mark('services-auth'), self.path('services', 'auth'))
+        self.assertEqual(marks.get_mark('services-billing'), self.path('services', 'billing'))
+        self.assertEqual(marks.get_mark_with_metadata('auth')['category'], 'mono/libs')
+
+        # Scanning again adds nothing
+        self.assertEqual(self.run_main('--scan', self.root, '--match', '.git|pyproject.toml')[0],
+                         ['Added 0 bookmarks.'])
+
+    def test_fixed_category_and_errors(self):
+        """Test a fixed category is applied and bad arguments are refused."""
+        added = Marks().discover(self.root, 'pyproject.toml', 1, 'work')
+        self.assertEqual(added, [])
+        added = Marks().discover(self.root, 'pyproject.toml', 2, 'work')
+        self.assertEqual({mark['category'] for mark in added}, {'work'})
+        self.assertIn('Invalid category', self.run_main('--scan', self.root, '--category', 'a b')[1])
+        self.assertIn('Usage', self.run_main('--scan', self.root, '--depth', 'x')[1])
+        self.assertIn('Not a directory', self.run_main('--scan', os.path.join(self.home, 'none'))[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test suite for fuzzy search.
+Tests trigram ranking, that only candidates sharing trigrams are scored,
+incremental maintenance, caching of the postings and dirmarks --search.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks import search, snapshot
+from dirmarks.search import TrigramIndex, trigrams
+
+
+class TestTrigramIndex(unittest.TestCase):
+    """Test the index on its own."""
+
+    def setUp(self):
+        self.metadata = {
+            'webapp': {'path': '/var/www/html', 'category': 'work/web/frontend', 'tags': ['react']},
+            'api': {'path': '/var/www/api', 'category': 'work/web/backend', 'tags': ['node']},
+            'docs': {'path': '/home/u/documents', 'category': None, 'tags': []},
+        }
+        self.index = TrigramIndex(self.metadata)
+
+    def keys(self, text):
+        return [key for _, key in self.index.search(text)]
+
+    def test_trigrams_padded_per_word(self):
+        """Test words are lowercased and padded like pg_trgm."""
+        self.assertEqual(trigrams('Ab-c'), {'  a', ' ab', 'ab ', '  c', ' c '})
+
+    def test_ranking_and_typos(self):
+        """Test exact keys win and misspellings still find their bookmark."""
+        self.assertEqual(self.keys('docs'), ['docs'])
+        self.assertEqual(self.keys('fronted'), ['webapp'])
+        self.assertEqual(self.keys('documnets'), ['docs'])
+        self.assertEqual(self.keys('www'), ['webapp', 'api'])
+        self.assertEqual(self.keys('xyz'), [])
+        self.assertEqual(self.keys('--'), [])
+
+    def test_only_candidates_are_scored(self):
+        """Test bookmarks sharing no trigram with the query are never looked at."""
+        for i in range(2000):
+            self.metadata[f"k{i}"] = {'path': f"/data/{i}", 'category': None, 'tags': []}
+        index = TrigramIndex(self.metadata)
+        with patch.object(search, 'fields', wraps=search.fields) as fields:
+            self.assertEqual(index.search('frontend')[0][1], 'webapp')
+        self.assertEqual([call.args[0] for call in fields.call_args_list], ['webapp'])
+
+    def test_removed_ids_are_skipped_and_compacted(self):
+        """Test removals leave tombstones that the cached state drops."""
+        self.index.remove('docs')
+        self.index.add('docs2', self.metadata.pop('docs'))
+        self.metadata['docs2'] = {'path': '/home/u/documents', 'category': None, 'tags': []}
+        self.assertEqual(self.keys('documents'), ['docs2'])
+        state = self.index.state()
+        self.assertEqual(state['keys'], ['webapp', 'api', 'docs2'])
+        restored = TrigramIndex(self.metadata, state)
+        self.assertEqual(restored.postings.keys(), TrigramIndex(self.metadata).postings.keys())
+
+
+class TestMarksSearch(unittest.TestCase):
+    """Test search on MarksEnhanced."""
+
+    def setUp(self):
+        """Set up an isolated HOME with a few bookmarks."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.dirs = {name: os.path.join(self.home, name) for name in ('frontend', 'backend', 'notes')}
+        for path in self.dirs.values():
+            os.mkdir(path)
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        with open(self.markrc_file, 'w') as f:
+            f.write(f"web:{self.dirs['frontend']}|category:work/web|tags:react\n"
+                    f"api:{self.dirs['backend']}|category:work\n"
+                    f"notes:{self.dirs['notes']}\n")
+        past = time.time() - 10
+        os.utime(self.markrc_file, (past, past))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def names(self, marks, text):
+        return [mark['name'] for mark in marks.search(text)]
+
+    def test_results_carry_metadata_and_score(self):
+        """Test results look like list_by_* entries plus a score."""
+        result = Marks().search('reactt')[0]
+        self.assertEqual(result['name'], 'web')
+        self.assertEqual(result['category'], 'work/web')
+        self.assertGreater(result['score'], 0)
+
+    def test_maintained_by_mutators(self):
+        """Test mutations update the built index without a rebuild."""
+        marks = Marks()
+        marks.search('notes')
+        with patch.object(search.TrigramIndex, '__init__', side_effect=AssertionError('rebuilt')):
+            marks.update_mark_tags('notes', ['journal'])
+            marks.del_mark('api')
+            marks.add_mark('backup', self.dirs['backend'])
+            self.assertEqual(self.names(marks, 'journal'), ['notes'])
+            self.assertEqual(self.names(marks, 'backend'), ['backup'])
+
+    def test_postings_cached_with_snapshot(self):
+        """Test a second process restores the postings instead of rebuilding them."""
+        with patch.object(snapshot, 'MIN_SOURCE_BYTES', 0):
+            Marks().search('web')
+            self.assertTrue(os.path.exists(snapshot.cache_path(self.markrc_file, 'trigrams-text')))
+            with patch.object(search.TrigramIndex, 'add', side_effect=AssertionError('rebuilt')):
+                self.assertEqual(self.names(Marks(), 'frontnd'), ['web'])
+
+    def test_small_store_not_cached(self):
+        """Test small marks files do not get a cache file."""
+        Marks().search('web')
+        self.assertFalse(os.path.exists(snapshot.cache_path(self.markrc_file, 'trigrams-text')))
+
+    def test_cli(self):
+        """Test dirmarks --search prints the best matches first."""
+        with patch.object(sys, 'argv', ['dirmarks', '--search', 'fronten', '--limit', '1']):
+            with patch('builtins.print') as mock_print:
+                main()
+        lines = [str(call.args[0]) for call in mock_print.call_args_list]
+        self.assertEqual(len(lines), 1)
+        self.assertIn('web =>', lines[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
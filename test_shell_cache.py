@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test suite for the zero-fork shell lookup table.
+Tests generation, automatic regeneration, and resolution and visit
+recording from bash.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+import subprocess
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks import usage
+
+FUNCTION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'dirmarks', 'data', 'dirmarks.function')
+
+
+class TestShellCache(unittest.TestCase):
+    """Test the generated bash/zsh lookup table."""
+
+    def setUp(self):
+        """Set up an isolated markrc with a couple of bookmarks."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.temp_dir, '.markrc')
+        self.cache_file = self.markrc_file + '.sh'
+        self.env = patch.dict(os.environ, {'XDG_STATE_HOME': os.path.join(self.temp_dir, 'state')})
+        self.env.start()
+        os.environ.pop('DIRMARKS_NO_USAGE', None)
+        self.dirs = [tempfile.mkdtemp(dir=self.temp_dir) for _ in range(3)]
+
+        self.marks = Marks()
+        self.marks.rc = self.markrc_file
+        self.marks.reload()
+        self.marks.add_mark('alpha', self.dirs[0])
+        self.marks.add_mark_with_metadata('beta', self.dirs[1], category='work')
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_not_created_unless_requested(self):
+        """Test mutations do not create the table on their own."""
+        self.assertFalse(os.path.exists(self.cache_file))
+
+    def test_emit_contains_keys_and_indexes(self):
+        """Test the table maps both names and numeric indexes."""
+        self.assertTrue(self.marks.emit_shell_cache())
+        with open(self.cache_file) as f:
+            content = f.read()
+        self.assertTrue(content.startswith('# dirmarks-shell-cache '))
+        self.assertIn(f"_DIRMARKS[alpha]={self.dirs[0]}", content)
+        self.assertIn(f"_DIRMARKS[1]={self.dirs[1]}", content)
+
+    def test_unsafe_keys_are_skipped(self):
+        """Test keys that need quoting are left to the Python fallback."""
+        self.marks.add_mark('we ird', self.dirs[2])
+        self.marks.emit_shell_cache()
+        with open(self.cache_file) as f:
+            content = f.read()
+        self.assertNotIn('we ird', content)
+        self.assertIn(f"_DIRMARKS[2]={self.dirs[2]}", content)
+
+    def test_regenerated_by_mutations(self):
+        """Test add, delete and metadata updates keep the table current."""
+        self.marks.emit_shell_cache()
+
+        self.marks.add_mark('gamma', self.dirs[2])
+        with open(self.cache_file) as f:
+            self.assertIn('_DIRMARKS[gamma]=', f.read())
+
+        self.marks.del_mark('alpha')
+        with open(self.cache_file) as f:
+            self.assertNotIn('_DIRMARKS[alpha]=', f.read())
+
+        self.marks.update_mark_tags('beta', ['x'])
+        with open(self.cache_file) as f:
+            self.assertTrue(f.readline().endswith(self.marks._shell_cache_generation() + '\n'))
+
+    def test_stale_table_refreshed_on_load(self):
+        """Test a hand-edited markrc is picked up the next time dirmarks runs."""
+        self.marks.emit_shell_cache()
+        with open(self.markrc_file, 'a') as f:
+            f.write(f"manual:{self.dirs[2]}\n")
+
+        marks = Marks()
+        marks.rc = self.markrc_file
+        marks.reload()
+        marks._refresh_shell_cache()
+        with open(self.cache_file) as f:
+            self.assertIn('_DIRMARKS[manual]=', f.read())
+
+    @unittest.skipUnless(shutil.which('bash'), 'bash not available')
+    def test_bash_resolves_without_python(self):
+        """Test the dir function resolves cached names with builtins only."""
+        self.marks.emit_shell_cache()
+        script = f"""
+            dirmarks() {{ echo "unexpected call: $*" >&2; return 1; }}
+            . '{FUNCTION_FILE}'
+            if [ "${{BASH_VERSINFO[0]}}" -lt 4 ]; then echo SKIP; exit 0; fi
+            dir alpha && pwd
+            dir 1 && pwd
+        """
+        result = subprocess.run(['bash', '-c', script], capture_output=True, text=True,
+                                env={**os.environ, 'DIRMARKS_SHELL_CACHE': self.cache_file})
+        if result.stdout.strip() == 'SKIP':
+            self.skipTest('bash without associative arrays')
+        self.assertEqual(result.stderr, '')
+        self.assertEqual(result.stdout.split(), [self.dirs[0], self.dirs[1]])
+        # Both hits were logged, the index as the bookmark it stands for
+        self.assertEqual(set(usage.scores(self.markrc_file)), {'alpha', 'beta'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ import tempfile
 import os
 import sys
 import subprocess
+import shutil
 from unittest.mock import patch
 
 # Add the dirmarks module to the path
@@ -23,6 +24,10 @@ class TestShellFunctionCompatibility(unittest.TestCase):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
         self.markrc_file = os.path.join(self.temp_dir, '.markrc')
+        # Visit logs and identity tables go here, not under the temporary HOME
+        self.state_dir = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'XDG_STATE_HOME': self.state_dir})
+        self.env.start()
         self.test_dirs = [tempfile.mkdtemp() for _ in range(5)]
         
         # Create marks instance for setup
@@ -40,6 +45,8 @@ class TestShellFunctionCompatibility(unittest.TestCase):
     
     def tearDown(self):
         """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.state_dir)
         if os.path.exists(self.markrc_file):
             os.remove(self.markrc_file)
         os.rmdir(self.temp_dir)
@@ -185,10 +192,16 @@ class TestShellFunctionEnhancements(unittest.TestCase):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
         self.markrc_file = os.path.join(self.temp_dir, '.markrc')
+        # Visit logs and identity tables go here, not under the temporary HOME
+        self.state_dir = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'XDG_STATE_HOME': self.state_dir})
+        self.env.start()
         self.test_dir = tempfile.mkdtemp()
     
     def tearDown(self):
         """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.state_dir)
         if os.path.exists(self.markrc_file):
             os.remove(self.markrc_file)
         os.rmdir(self.temp_dir)
@@ -284,9 +297,15 @@ class TestShellFunctionErrorHandling(unittest.TestCase):
         """Set up test fixtures."""
         self.temp_dir = tempfile.mkdtemp()
         self.markrc_file = os.path.join(self.temp_dir, '.markrc')
+        # Visit logs and identity tables go here, not under the temporary HOME
+        self.state_dir = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'XDG_STATE_HOME': self.state_dir})
+        self.env.start()
     
     def tearDown(self):
         """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.state_dir)
         if os.path.exists(self.markrc_file):
             os.remove(self.markrc_file)
         os.rmdir(self.temp_dir)
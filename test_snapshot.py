@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test suite for the parsed-state snapshot cache.
+Tests that unchanged markrc files are loaded without parsing and that any
+change to a source file invalidates the snapshot.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks import snapshot
+
+
+class TestSnapshotCache(unittest.TestCase):
+    """Test snapshot creation, reuse and invalidation."""
+
+    def setUp(self):
+        """Set up an isolated HOME and cache directory."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.test_dir = tempfile.mkdtemp(dir=self.home)
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache')})
+        self.env.start()
+        self.threshold = patch.object(snapshot, 'MIN_SOURCE_BYTES', 0)
+        self.threshold.start()
+        self.write_markrc(f"plain:{self.test_dir}\nrich:{self.test_dir}|category:work|tags:a,b\n")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.threshold.stop()
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def write_markrc(self, content):
+        """Write the markrc and date it back so it is not considered racy."""
+        with open(self.markrc_file, 'w') as f:
+            f.write(content)
+        past = time.time() - 10
+        os.utime(self.markrc_file, (past, past))
+
+    def test_second_load_skips_parsing(self):
+        """Test an unchanged markrc is restored from the snapshot."""
+        first = Marks()
+        self.assertTrue(os.path.exists(snapshot.cache_path(first.rc, 'state-text')))
+
+        with patch.object(Marks, 'read_marks', side_effect=AssertionError('parsed again')):
+            second = Marks()
+        self.assertEqual(second.marks, first.marks)
+        self.assertEqual(second.list, first.list)
+        self.assertEqual(second.get_mark_with_metadata('rich')['tags'], ['a', 'b'])
+
+    def test_changed_file_is_parsed_again(self):
+        """Test a modified markrc invalidates the snapshot."""
+        Marks()
+        self.write_markrc(f"other:{self.test_dir}\n")
+        marks = Marks()
+        self.assertEqual(marks.list, [f"other:{self.test_dir}"])
+        self.assertIsNone(marks.get_mark('plain'))
+
+    def test_recent_files_are_not_snapshotted(self):
+        """Test files modified within the racy window are not cached."""
+        os.utime(self.markrc_file, None)
+        marks = Marks()
+        self.assertFalse(os.path.exists(snapshot.cache_path(marks.rc, 'state-text')))
+
+    def test_corrupt_snapshot_is_ignored(self):
+        """Test a damaged snapshot falls back to parsing."""
+        marks = Marks()
+        with open(snapshot.cache_path(marks.rc, 'state-text'), 'wb') as f:
+            f.write(b'\x00garbage')
+        self.assertEqual(Marks().get_mark('plain'), self.test_dir)
+
+    def test_small_files_are_not_snapshotted(self):
+        """Test markrc files below the size threshold are simply parsed."""
+        with patch.object(snapshot, 'MIN_SOURCE_BYTES', 1 << 20):
+            marks = Marks()
+        self.assertFalse(os.path.exists(snapshot.cache_path(marks.rc, 'state-text')))
+
+    def test_cache_can_be_disabled(self):
+        """Test DIRMARKS_NO_CACHE turns snapshots off."""
+        with patch.dict(os.environ, {'DIRMARKS_NO_CACHE': '1'}):
+            marks = Marks()
+        self.assertFalse(os.path.exists(snapshot.cache_path(marks.rc, 'state-text')))
+
+
+if __name__ == '__main__':
+    unittest.main()
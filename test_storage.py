@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test suite for the pluggable storage backends.
+Tests the SQLite backend, backend selection and migration between backends.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import json
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks.storage import SqliteStorage, TextStorage
+
+
+class StorageTestCase(unittest.TestCase):
+    """Isolated HOME shared by the storage tests."""
+
+    backend = None
+
+    def setUp(self):
+        """Set up an isolated HOME and test directories."""
+        self.home = tempfile.mkdtemp()
+        self.markrc_file = os.path.join(self.home, '.markrc')
+        self.dirs = [tempfile.mkdtemp(dir=self.home) for _ in range(4)]
+        env = {'HOME': self.home, 'XDG_CACHE_HOME': os.path.join(self.home, '.cache')}
+        if self.backend:
+            env['DIRMARKS_BACKEND'] = self.backend
+        self.env = patch.dict(os.environ, env)
+        self.env.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def populate(self, marks):
+        marks.add_mark_with_metadata('web', self.dirs[0], category='work/web', tags=['react', 'client-a'])
+        marks.add_mark_with_metadata('api', self.dirs[1], category='work', tags=['client-a'])
+        marks.add_mark_with_metadata('notes', self.dirs[2], category='personal')
+        marks.add_mark('plain', self.dirs[3])
+
+
+class TestSqliteBackend(StorageTestCase):
+    """Test MarksEnhanced on the SQLite backend."""
+
+    backend = 'sqlite'
+
+    def test_selected_from_environment(self):
+        """Test DIRMARKS_BACKEND selects SQLite and the text file is not written."""
+        marks = Marks()
+        self.assertIsInstance(marks.storage(), SqliteStorage)
+        self.populate(marks)
+        self.assertTrue(os.path.exists(self.markrc_file + '.db'))
+        self.assertFalse(os.path.exists(self.markrc_file))
+
+    def test_round_trip_preserves_order_and_metadata(self):
+        """Test a fresh instance reads back the same state."""
+        marks = Marks()
+        self.populate(marks)
+        fresh = Marks()
+        self.assertEqual(fresh.list, marks.list)
+        self.assertEqual(fresh.marks_metadata, marks.marks_metadata)
+
+    def test_indexed_queries(self):
+        """Test filters and statistics answered by SQLite."""
+        marks = Marks()
+        self.populate(marks)
+        self.assertEqual([m['name'] for m in marks.list_by_category('work')], ['api'])
+        self.assertEqual([m['name'] for m in marks.list_by_tag('client-a')], ['web', 'api'])
+        self.assertEqual(marks.get_category_stats(), {'personal': 1, 'work': 1, 'work/web': 1})
+        self.assertEqual(marks.get_tag_stats(), {'client-a': 2, 'react': 1})
+        self.assertEqual(marks.list_all_tags(), ['client-a', 'react'])
+        self.assertEqual(marks.list_all_categories(), ['personal', 'work', 'work/web'])
+
+    def test_updates_and_deletes(self):
+        """Test single-row changes persist."""
+        marks = Marks()
+        self.populate(marks)
+        self.assertTrue(marks.update_mark_tags('api', ['backend']))
+        self.assertTrue(marks.update_mark_category('notes', 'home'))
+        self.assertTrue(marks.del_mark('web'))
+
+        fresh = Marks()
+        self.assertIsNone(fresh.get_mark('web'))
+        self.assertEqual(fresh.get_mark_with_metadata('api')['tags'], ['backend'])
+        self.assertEqual(fresh.get_mark_with_metadata('notes')['category'], 'home')
+        self.assertEqual(fresh.list_by_tag('client-a'), [])
+        self.assertEqual(fresh.list, [f"api:{self.dirs[1]}", f"notes:{self.dirs[2]}", f"plain:{self.dirs[3]}"])
+
+
+class TestMigration(StorageTestCase):
+    """Test moving bookmarks between backends."""
+
+    def test_text_to_sqlite_and_back_is_lossless(self):
+        """Test migrating both ways reproduces the original markrc."""
+        marks = Marks()
+        self.populate(marks)
+        with open(self.markrc_file) as f:
+            original = f.read()
+
+        self.assertTrue(marks.migrate_storage('sqlite'))
+        with open(marks.config_file) as f:
+            self.assertEqual(json.load(f)['backend'], 'sqlite')
+
+        on_sqlite = Marks()
+        self.assertIsInstance(on_sqlite.storage(), SqliteStorage)
+        self.assertEqual(on_sqlite.marks_metadata, marks.marks_metadata)
+
+        os.remove(self.markrc_file)
+        self.assertTrue(on_sqlite.migrate_storage('text'))
+        with open(self.markrc_file) as f:
+            self.assertEqual(f.read(), original)
+        self.assertIsInstance(Marks().storage(), TextStorage)
+
+    def test_unknown_backend_is_rejected(self):
+        """Test migrating to an unknown backend fails without side effects."""
+        marks = Marks()
+        self.assertFalse(marks.migrate_storage('xml'))
+        self.assertFalse(os.path.exists(marks.config_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
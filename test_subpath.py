@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test suite for name/sub/path navigation.
+Tests resolving sub-paths below a bookmark, completing them, and the
+subdirectory listing cache and its invalidation.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.marks_enhanced import Marks
+from dirmarks import dircache, snapshot
+from dirmarks.main import complete_bookmarks, resolve_bookmark
+
+
+class SubpathTestCase(unittest.TestCase):
+    """Isolated HOME with a bookmarked project tree."""
+
+    def setUp(self):
+        """Set up proj/{src/{app,lib},docs,.git} and a bookmark to proj."""
+        self.home = tempfile.mkdtemp()
+        self.proj = os.path.join(self.home, 'proj')
+        for sub in ('src/app', 'src/lib', 'docs', '.git'):
+            os.makedirs(os.path.join(self.proj, sub))
+        open(os.path.join(self.proj, 'README'), 'w').close()
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        with open(os.path.join(self.home, '.markrc'), 'w') as f:
+            f.write(f"proj:{self.proj}|category:work\n")
+        self.age(self.proj, os.path.join(self.proj, 'src'), os.path.join(self.home, '.markrc'))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def age(self, *paths):
+        """Date paths back out of the racy window."""
+        past = time.time() - 10
+        for path in paths:
+            os.utime(path, (past, past))
+
+
+class TestSubpathLookup(SubpathTestCase):
+    """Test resolving name/sub/path."""
+
+    def test_get_mark(self):
+        """Test names and indexes resolve with a sub-path joined and normalized."""
+        marks = Marks()
+        self.assertEqual(marks.get_mark('proj/src/lib'), os.path.join(self.proj, 'src', 'lib'))
+        self.assertEqual(marks.get_mark('0/docs/'), os.path.join(self.proj, 'docs'))
+        self.assertEqual(marks.get_mark('proj/src/../docs'), os.path.join(self.proj, 'docs'))
+        self.assertIsNone(marks.get_mark('nope/src'))
+        self.assertIsNone(marks.get_mark('/src'))
+
+    def test_key_with_slash_wins(self):
+        """Test an existing key containing '/' is still looked up as a whole."""
+        marks = Marks()
+        marks.add_mark('proj/src', self.home)
+        self.assertEqual(marks.get_mark('proj/src'), self.home)
+
+    def test_indexed_lookup(self):
+        """Test the mapped index resolves sub-paths the same way."""
+        with patch.object(snapshot, 'MIN_SOURCE_BYTES', 0):
+            resolve_bookmark('proj')
+            with patch.object(Marks, '__init__', side_effect=AssertionError('parsed')):
+                self.assertEqual(resolve_bookmark('proj/src/app'), os.path.join(self.proj, 'src', 'app'))
+
+
+class TestSubpathCompletion(SubpathTestCase):
+    """Test completing name/sub/path and the listing cache."""
+
+    def test_complete(self):
+        """Test subdirectories are completed level by level, hidden ones on request."""
+        self.assertEqual(complete_bookmarks('proj/'), ['proj/docs/', 'proj/src/'])
+        self.assertEqual(complete_bookmarks('proj/src/l'), ['proj/src/lib/'])
+        self.assertEqual(complete_bookmarks('proj/.'), ['proj/.git/'])
+        self.assertEqual(complete_bookmarks('proj/nope/'), [])
+        self.assertEqual(Marks().complete('0/s'), ['0/src/'])
+
+    def test_listing_cached_until_directory_changes(self):
+        """Test a listing is reused while the directory's mtime is unchanged."""
+        src = os.path.join(self.proj, 'src')
+        self.assertEqual(dircache.subdirs(src), ['app', 'lib'])
+        with patch.object(os, 'scandir', side_effect=AssertionError('listed')):
+            self.assertEqual(dircache.subdirs(src), ['app', 'lib'])
+        # A fresh process reads the cache file
+        with patch.object(dircache, '_loaded', None):
+            with patch.object(os, 'scandir', side_effect=AssertionError('listed')):
+                self.assertEqual(dircache.subdirs(src), ['app', 'lib'])
+
+        os.mkdir(os.path.join(src, 'bin'))
+        self.assertEqual(dircache.subdirs(src), ['app', 'bin', 'lib'])
+
+    def test_recent_directories_not_cached(self):
+        """Test a directory changed within the racy window is listed every time."""
+        docs = os.path.join(self.proj, 'docs')
+        self.assertEqual(dircache.subdirs(docs), [])
+        self.assertNotIn(docs, dircache._load())
+
+    def test_cache_bounded(self):
+        """Test the oldest listings are dropped beyond MAX_ENTRIES."""
+        with patch.object(dircache, 'MAX_ENTRIES', 1):
+            dircache.subdirs(self.proj)
+            dircache.subdirs(os.path.join(self.proj, 'src'))
+        self.assertEqual(list(dircache._load()), [os.path.join(self.proj, 'src')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test suite for the inverted tag index.
+Tests that the index stays consistent with the bookmarks through every
+mutator, multi-tag set queries, and --tag a,b --all|--any on the CLI.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks import marks_enhanced
+from dirmarks.metaindex import TagIndex
+
+
+class TestTagIndex(unittest.TestCase):
+    """Test tag queries answered from the inverted index."""
+
+    def setUp(self):
+        """Set up an isolated HOME with tagged bookmarks."""
+        self.home = tempfile.mkdtemp()
+        self.dirs = [tempfile.mkdtemp(dir=self.home) for _ in range(4)]
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        self.marks = Marks()
+        self.marks.add_mark_with_tags('p1', self.dirs[0], ['react', 'frontend', 'client-a'])
+        self.marks.add_mark_with_tags('p2', self.dirs[1], ['vue', 'frontend', 'client-b'])
+        self.marks.add_mark_with_tags('p3', self.dirs[2], ['node', 'backend', 'client-a'])
+        self.marks.add_mark('p4', self.dirs[3])
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def names(self, results):
+        return [mark['name'] for mark in results]
+
+    def assert_consistent(self, marks):
+        """The index must answer exactly like a scan over marks_metadata."""
+        tags = {tag for metadata in marks.marks_metadata.values() for tag in metadata['tags']}
+        for tag in tags | {'absent'}:
+            expected = [key for key, metadata in marks.marks_metadata.items() if tag in metadata['tags']]
+            self.assertEqual(self.names(marks.list_by_tag(tag)), expected, tag)
+        self.assertEqual(marks.list_all_tags(), sorted(tags))
+
+    def test_all_and_any(self):
+        """Test intersections and unions come back in bookmark order."""
+        self.assertEqual(self.names(self.marks.list_by_tags(['frontend', 'client-a'])), ['p1'])
+        self.assertEqual(self.names(self.marks.list_by_tags(['client-a', 'frontend'], match_all=False)),
+                         ['p1', 'p2', 'p3'])
+        self.assertEqual(self.marks.list_by_tags(['frontend', 'absent']), [])
+        self.assertEqual(self.marks.list_by_tags([]), [])
+
+    def test_index_maintained_incrementally(self):
+        """Test mutators update the built index instead of rebuilding it."""
+        self.marks.list_by_tag('frontend')
+        with patch.object(marks_enhanced, 'MetadataIndex', side_effect=AssertionError('rebuilt')):
+            self.marks.update_mark_tags('p1', ['backend'])
+            self.marks.del_mark('p3')
+            self.marks.add_mark_with_tags('p5', self.dirs[2], ['backend', 'new'])
+            self.marks.update_mark('p2', self.dirs[1])
+            self.marks.update_mark_category('p4', 'work')
+            self.assert_consistent(self.marks)
+        self.assertEqual(self.marks.get_tag_stats(), {'backend': 2, 'new': 1})
+
+    def test_position_kept_on_tag_update(self):
+        """Test retagging keeps a bookmark's place in results."""
+        self.marks.update_mark_tags('p1', ['frontend', 'x'])
+        self.assertEqual(self.names(self.marks.list_by_tag('frontend')), ['p1', 'p2'])
+
+    def test_rebuilt_after_state_replaced(self):
+        """Test reloads and batch rollbacks cannot leave a stale index."""
+        self.marks.list_by_tag('frontend')
+        other = Marks()
+        other.update_mark_tags('p2', ['backend'])
+        self.marks.refresh()
+        self.assert_consistent(self.marks)
+
+        with self.assertRaises(RuntimeError):
+            with self.marks.batch():
+                self.marks.update_mark_tags('p1', ['gone'])
+                raise RuntimeError
+        self.assert_consistent(self.marks)
+        self.assertEqual(self.names(self.marks.list_by_tag('react')), ['p1'])
+
+    def test_duplicate_tags_counted_per_occurrence(self):
+        """Test statistics count occurrences like the original scan."""
+        index = TagIndex()
+        index.add('a', ['x', 'x'])
+        index.add('b', ['x'])
+        self.assertEqual(index.counts(), {'x': 3})
+        index.remove('a', ['x', 'x'])
+        self.assertEqual(index.counts(), {'x': 1})
+        self.assertEqual(index.keys('x'), {'b'})
+
+    def run_list(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', '--list', *args]):
+            with patch('builtins.print') as mock_print:
+                main()
+        return ''.join(str(call.args[0]) for call in mock_print.call_args_list)
+
+    def test_cli_multi_tag(self):
+        """Test --tag a,b with --all (default) and --any."""
+        output = self.run_list('--tag', 'frontend,client-a')
+        self.assertIn("'frontend' and 'client-a'", output)
+        self.assertIn('p1 =>', output)
+        self.assertNotIn('p2 =>', output)
+
+        output = self.run_list('--tag', 'vue,node', '--any')
+        self.assertIn("'vue' or 'node'", output)
+        self.assertIn('p2 =>', output)
+        self.assertIn('p3 =>', output)
+        self.assertNotIn('p1 =>', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
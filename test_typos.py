@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test suite for "did you mean" suggestions.
+Tests the Levenshtein distance, the BK-tree and its pruning, its cache
+next to the parsed-state snapshot and how it is patched after edits, and
+the suggestions and DIRMARKS_AUTOCORRECT on lookup misses.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import time
+import random
+import shutil
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks.daemon import MarksDaemon
+from dirmarks.typos import BKTree, distance, max_distance
+from dirmarks import snapshot, typos
+
+
+class TestBKTree(unittest.TestCase):
+    """Test the tree on its own."""
+
+    def test_distance(self):
+        """Test insertions, deletions, substitutions and transpositions."""
+        self.assertEqual(distance('proj', 'proj'), 0)
+        self.assertEqual(distance('proj', 'prj'), 1)
+        self.assertEqual(distance('proj', 'prok'), 1)
+        self.assertEqual(distance('proj', 'porj'), 2)
+        self.assertEqual(distance('', 'abc'), 3)
+        self.assertEqual(distance('kitten', 'sitting'), 3)
+        self.assertEqual(distance('x' * 80 + 'abc', 'y' * 70 + 'abd'), 81)
+        self.assertEqual([max_distance(n) for n in ('ab', 'abc', 'abcde')], [0, 1, 2])
+
+    def test_closest(self):
+        """Test the nearest keys are returned, and only within the tolerance."""
+        tree = BKTree(dict.fromkeys(['proj', 'prod', 'docs', 'downloads', 'project']))
+        self.assertEqual(tree.closest('projx'), ['proj'])
+        self.assertEqual(tree.closest('pro'), ['prod', 'proj'])
+        self.assertEqual(tree.closest('dwnlods'), ['downloads'])
+        self.assertEqual(tree.closest('zz'), [])
+        self.assertEqual(tree.closest('xyzw'), [])
+
+    def test_remove_and_state(self):
+        """Test removed keys are skipped, kept in the cached form, and compacted once most are."""
+        metadata = dict.fromkeys(['proj', 'prod', 'docs'])
+        tree = BKTree(metadata)
+        del metadata['proj']
+        tree.remove('proj')
+        self.assertEqual(tree.closest('projx', 1), [])
+        self.assertEqual(tree.closest('prodx'), ['prod'])
+        restored = BKTree(metadata, tree.state())
+        self.assertEqual((restored.words, restored.removed, restored.patched),
+                         (['proj', 'prod', 'docs'], {'proj'}, 0))
+        self.assertEqual(restored.closest('prodx'), ['prod'])
+        metadata['proj'] = None
+        tree.add('proj')
+        self.assertEqual(tree.closest('projx'), ['proj'])
+        del metadata['docs'], metadata['prod']
+        tree.remove('docs')
+        tree.remove('prod')
+        self.assertEqual(tree.state()['words'], ['proj'])
+
+    def test_stale_state_patched(self):
+        """Test a state built from other keys is brought up to date, not rebuilt."""
+        tree = BKTree(dict.fromkeys(['proj', 'prod', 'docs']))
+        metadata = dict.fromkeys(['proj', 'docs', 'music'])
+        with patch.object(typos, 'distance', wraps=typos.distance) as counted:
+            patched = BKTree(metadata, tree.state())
+        self.assertEqual((patched.patched, patched.removed), (2, {'prod'}))
+        self.assertLessEqual(counted.call_count, 2)
+        self.assertEqual(patched.closest('prodx'), ['proj'])
+        self.assertEqual(patched.closest('musik'), ['music'])
+
+    def test_visits_a_fraction(self):
+        """Test a lookup computes distances for a small part of a large key set."""
+        rng = random.Random(7)
+        keys = {''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(5, 12)))
+                for _ in range(2000)}
+        tree = BKTree(dict.fromkeys(keys))
+        key = sorted(keys)[100]
+        typo = key[:2] + key[3:]
+        self.assertIn(key, tree.closest(typo))
+        tree.within(typo, 1)
+        self.assertLess(tree.visited, len(keys) / 5)
+
+
+class TypoTestCase(unittest.TestCase):
+    """Isolated HOME with a few bookmarks."""
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_STATE_HOME': os.path.join(self.home, '.state'),
+                                           'XDG_RUNTIME_DIR': self.home})
+        self.env.start()
+        os.environ.pop('DIRMARKS_AUTOCORRECT', None)
+        self.marks = Marks()
+        for name in ('projects', 'downloads', 'music'):
+            os.mkdir(os.path.join(self.home, name))
+            self.marks.add_mark(name, os.path.join(self.home, name))
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr') as mock_stderr:
+                main()
+        output = [str(call.args[0]) for call in mock_print.call_args_list]
+        errors = ''.join(str(call.args[0]) for call in mock_stderr.write.call_args_list)
+        return output, errors
+
+
+class TestSuggestions(TypoTestCase):
+    """Test suggestions through MarksEnhanced, main() and the daemon."""
+
+    def test_follows_changes(self):
+        """Test the tree is kept current by adds and deletes."""
+        self.assertEqual(self.marks.suggest('musik'), ['music'])
+        self.marks.del_mark('music')
+        self.assertEqual(self.marks.suggest('musik'), [])
+        self.marks.add_mark('musak', self.home)
+        self.assertEqual(self.marks.suggest('musik'), ['musak'])
+
+    def test_cached_with_snapshot(self):
+        """Test a fresh process loads the tree instead of building it."""
+        past = time.time() - 10
+        os.utime(self.marks.rc, (past, past))
+        with patch.object(snapshot, 'MIN_SOURCE_BYTES', 0):
+            self.assertEqual(Marks().suggest('musik'), ['music'])
+            with patch.object(typos, 'distance', wraps=typos.distance) as counted:
+                with patch.object(BKTree, 'add', side_effect=AssertionError('built')):
+                    self.assertEqual(Marks().suggest('musik'), ['music'])
+            self.assertGreater(counted.call_count, 0)
+
+    def test_patched_after_add(self):
+        """Test a miss right after an add patches the cached tree instead of rebuilding it."""
+        with patch.object(snapshot, 'MIN_SOURCE_BYTES', 0):
+            self.assertEqual(Marks().suggest('musik'), ['music'])
+            self.marks.add_mark('musak', self.home)
+            added = []
+            for _ in range(2):
+                with patch.object(BKTree, 'add', autospec=True, side_effect=BKTree.add) as add:
+                    self.assertEqual(Marks().suggest('musik'), ['musak', 'music'])
+                added.append(add.call_count)
+            self.assertEqual(added, [1, 0])
+            self.marks.del_mark('musak')
+            with patch.object(BKTree, 'add', side_effect=AssertionError('built')):
+                self.assertEqual(Marks().suggest('musik'), ['music'])
+
+    def test_cli_suggests(self):
+        """Test a miss names the closest key and a far miss names none."""
+        output, errors = self.run_main('--get', 'dowloads')
+        self.assertEqual(output, [])
+        self.assertEqual(errors, 'Bookmark not found. Did you mean: downloads?\n')
+        self.assertEqual(self.run_main('qqqqqqq')[1], 'Bookmark not found.\n')
+
+    def test_autocorrect(self):
+        """Test DIRMARKS_AUTOCORRECT resolves an unambiguous typo and only suggests otherwise."""
+        os.environ['DIRMARKS_AUTOCORRECT'] = '1'
+        self.assertEqual(self.run_main('projcets')[0], [os.path.join(self.home, 'projects')])
+        self.marks.add_mark('mosic', self.home)
+        output, errors = self.run_main('mxsic')
+        self.assertEqual(output, [])
+        self.assertIn('Did you mean: mosic, music?', errors)
+
+    def test_daemon(self):
+        """Test the daemon suggests too."""
+        daemon = MarksDaemon(self.marks)
+        self.assertEqual(daemon.dispatch(['get', 'musik']), ['-Bookmark not found. Did you mean: music?'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test suite for deadline-bounded path verification.
+Tests that adding or updating a bookmark cannot hang on a dead mount, the
+per-mount memory of recent answers, the verify_timeout setting and
+--no-verify.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks import pathcheck
+
+
+class VerifyTestCase(unittest.TestCase):
+    """Isolated HOME, fresh mount memory, and a 'dead' mount at /dead."""
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home,
+                                           'DIRMARKS_VERIFY_TIMEOUT': '0.2'})
+        self.env.start()
+        self.state = patch.object(pathcheck, '_mounts', ['/dead', self.home, '/'])
+        self.state.start()
+        self.release = threading.Event()
+        self.probed = []
+        real_probe = pathcheck.probe
+
+        def fake_probe(path):
+            self.probed.append(path)
+            if path.startswith('/dead/'):
+                self.release.wait(10)
+                return pathcheck.OK
+            return real_probe(path)
+
+        self.probe = patch.object(pathcheck, 'probe', side_effect=fake_probe)
+        self.probe.start()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.release.set()
+        self.probe.stop()
+        self.state.stop()
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+
+class TestVerify(VerifyTestCase):
+    """Test MarksEnhanced.verify_path and the add/update paths."""
+
+    def test_dead_mount(self):
+        """Test adds on a hung mount give up after the timeout, then fail without probing."""
+        marks = Marks()
+        start = time.monotonic()
+        self.assertFalse(marks.add_mark('a', '/dead/a'))
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertFalse(marks.add_mark('b', '/dead/b'))
+        self.assertEqual(self.probed, ['/dead/a'])
+        self.assertTrue(marks.add_mark('c', '/dead/c', verify=False))
+        self.assertEqual(marks.get_mark('c'), '/dead/c')
+
+    def test_answered_mount_keeps_deadline(self):
+        """Test a mount that answered a moment ago still cannot hang an add."""
+        with open(pathcheck.health_file(), 'w') as f:
+            f.write(f"1\t{time.time()}\t/dead\n")
+        start = time.monotonic()
+        self.assertFalse(Marks().add_mark('a', '/dead/a'))
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(pathcheck.mount_health()['/dead'][0], False)
+
+    def test_root_never_written_off(self):
+        """Test a timeout on the root filesystem does not refuse later adds."""
+        with patch.object(pathcheck, 'check_paths', return_value={'/srv/x': pathcheck.TIMED_OUT}):
+            self.assertEqual(pathcheck.verify_dir('/srv/x'), pathcheck.TIMED_OUT)
+        self.assertNotIn('/', pathcheck.mount_health())
+        self.assertTrue(Marks().add_mark('tmp', tempfile.gettempdir()))
+
+    def test_mount_memory_shared(self):
+        """Test answers are kept in the runtime directory for other processes until they expire."""
+        self.assertFalse(Marks().add_mark('a', '/dead/a'))
+        self.assertTrue(Marks().add_mark('h', self.home))
+        health = pathcheck.mount_health()
+        self.assertEqual({mount: answered for mount, (answered, _) in health.items()},
+                         {'/dead': False, self.home: True})
+        self.assertEqual(os.stat(pathcheck.health_file()).st_mode & 0o777, 0o600)
+
+        self.assertFalse(Marks().add_mark('b', '/dead/b'))
+        self.assertEqual(self.probed, ['/dead/a', self.home])
+        with open(pathcheck.health_file(), 'w') as f:
+            f.write(f"0\t{time.time() - pathcheck.HEALTH_TTL - 1}\t/dead\nbroken\n")
+        self.assertEqual(pathcheck.mount_health(), {})
+        self.release.set()
+        self.assertTrue(Marks().add_mark('b', '/dead/b'))
+
+    def test_checked_outside_lock(self):
+        """Test paths are verified before the write lock is taken."""
+        marks = Marks()
+        depths = []
+
+        def verify_dir(path, timeout):
+            depths.append(marks._lock_depth)
+            return pathcheck.OK
+
+        with patch.object(pathcheck, 'verify_dir', side_effect=verify_dir):
+            self.assertTrue(marks.add_mark('a', self.home))
+            self.assertTrue(marks.update_mark('a', self.home))
+            self.assertEqual(marks.bulk_add([('b', self.home), ('c', self.home)]), 2)
+        self.assertEqual(depths, [0, 0, 0, 0])
+
+    def test_update_keeps_bookmark(self):
+        """Test an update to a bad path leaves the old entry in place."""
+        marks = Marks()
+        marks.add_mark('proj', self.home)
+        self.assertFalse(marks.update_mark('proj', os.path.join(self.home, 'gone')))
+        self.assertFalse(marks.update_mark('proj', '/dead/x'))
+        self.assertEqual(Marks().get_mark('proj'), self.home)
+
+    def test_timeout_setting(self):
+        """Test the environment overrides the config, which save_config preserves."""
+        marks = Marks()
+        with open(marks.config_file, 'w') as f:
+            json.dump({'verify_timeout': 7}, f)
+        del os.environ['DIRMARKS_VERIFY_TIMEOUT']
+        marks = Marks()
+        self.assertEqual(marks.verify_timeout, 7)
+        with patch.object(pathcheck, 'verify_dir', return_value=pathcheck.OK) as verify_dir:
+            marks.verify_path(self.home)
+            os.environ['DIRMARKS_VERIFY_TIMEOUT'] = '0.5'
+            marks.verify_path(self.home)
+        self.assertEqual([call.args[1] for call in verify_dir.call_args_list], [7.0, 0.5])
+        marks.save_config()
+        with open(marks.config_file) as f:
+            self.assertEqual(json.load(f)['verify_timeout'], 7)
+
+
+class TestVerifyCommands(VerifyTestCase):
+    """Test --add and --update through main()."""
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print'), patch('sys.stderr') as mock_stderr:
+                main()
+        return ''.join(str(call.args[0]) for call in mock_stderr.write.call_args_list)
+
+    def test_messages(self):
+        """Test refused paths are explained and --no-verify skips the check."""
+        self.assertIn('did not answer in time; use --no-verify', self.run_main('--add', 'a', '/dead/a'))
+        gone = os.path.join(self.home, 'gone')
+        self.assertEqual(self.run_main('--add', 'g', gone), f"Cannot bookmark {gone}: missing\n")
+        self.assertEqual(self.run_main('--add', 'a', '/dead/a', '--category', 'work', '--no-verify'), '')
+        self.assertEqual(Marks().get_mark_with_metadata('a')['category'], 'work')
+        self.assertIn('Cannot bookmark', self.run_main('--update', 'a', gone))
+        self.assertEqual(Marks().get_mark('a'), '/dead/a')
+        self.assertEqual(self.run_main('--update', 'a', gone, '--no-verify'), '')
+        self.assertEqual(Marks().get_mark('a'), gone)
+        self.assertEqual(self.probed, ['/dead/a', gone, gone])
+
+    def test_update_under_one_lock(self):
+        """Test --update replaces the entry and its metadata while holding the lock."""
+        self.assertEqual(self.run_main('--add', 'a', self.home, '--category', 'work'), '')
+        real_del_mark = Marks.del_mark
+
+        def del_mark(marks, key):
+            self.assertTrue(marks._lock_depth)
+            return real_del_mark(marks, key)
+
+        with patch.object(Marks, 'del_mark', autospec=True, side_effect=del_mark):
+            self.assertEqual(self.run_main('--update', 'a', self.home, '--tag', 'x,y'), '')
+            self.assertEqual(self.run_main('--update', 'nope', self.home), 'Bookmark not found\n')
+        self.assertEqual(Marks().get_mark_with_metadata('a')['tags'], ['x', 'y'])
+
+
+if __name__ == '__main__':
+    unittest.main()
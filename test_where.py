@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test suite for reverse lookups from a path to its bookmark.
+Tests the deepest-ancestor search on the path trie, --where and --prompt,
+and the prompt table in the shell cache used by dir_prompt.
+"""
+
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+import subprocess
+from unittest.mock import patch
+
+# Add the dirmarks module to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dirmarks.main import main
+from dirmarks.marks_enhanced import Marks
+from dirmarks import marks_enhanced
+from dirmarks.metaindex import PathTrie
+
+FUNCTION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'dirmarks', 'data', 'dirmarks.function')
+
+
+class TestDeepest(unittest.TestCase):
+    """Test the trie on its own."""
+
+    def test_deepest_ancestor(self):
+        """Test the deepest node holding keys wins and unrelated paths match nothing."""
+        trie = PathTrie()
+        trie.add('srv', '/srv')
+        trie.add('app', '/srv/app')
+        trie.add('app2', '/srv/app')
+        self.assertEqual(trie.deepest('/srv/app/src/lib'), (2, {'app', 'app2'}))
+        self.assertEqual(trie.deepest('/srv/application'), (1, {'srv'}))
+        self.assertEqual(trie.deepest('/srv'), (1, {'srv'}))
+        self.assertEqual(trie.deepest('/home'), (0, set()))
+        trie.add('root', '/')
+        self.assertEqual(trie.deepest('/home'), (0, {'root'}))
+
+
+class TestWhere(unittest.TestCase):
+    """Test where() and prompt_segment() on MarksEnhanced."""
+
+    def setUp(self):
+        """Set up an isolated HOME with nested bookmarks."""
+        self.home = tempfile.mkdtemp()
+        self.proj = os.path.join(self.home, 'proj')
+        self.src = os.path.join(self.proj, 'src')
+        os.makedirs(os.path.join(self.src, 'lib'))
+        os.makedirs(os.path.join(self.home, 'my dir', 'x'))
+        self.env = patch.dict(os.environ, {'HOME': self.home,
+                                           'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+                                           'XDG_RUNTIME_DIR': self.home,
+                                           'DIRMARKS_SHELL_CACHE': os.path.join(self.home, '.markrc.sh')})
+        self.env.start()
+        self.marks = Marks()
+        self.marks.add_mark('proj', self.proj)
+        self.marks.add_mark('code', self.src)
+        self.marks.add_mark('src', self.src)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.env.stop()
+        shutil.rmtree(self.home)
+
+    def test_where(self):
+        """Test exact and ancestor matches, in bookmark order."""
+        self.assertEqual([m['name'] for m in self.marks.where(self.src)], ['code', 'src'])
+        self.assertEqual([m['name'] for m in self.marks.where(os.path.join(self.src, 'lib'))],
+                         ['code', 'src'])
+        self.assertEqual([m['name'] for m in self.marks.where(self.proj + '/')], ['proj'])
+        self.assertEqual(self.marks.where(self.home), [])
+
+    def test_prompt_segment(self):
+        """Test the segment names the bookmark and the rest of the path."""
+        self.assertEqual(self.marks.prompt_segment(os.path.join(self.src, 'lib')), 'code/lib')
+        self.assertEqual(self.marks.prompt_segment(self.proj), 'proj')
+        self.assertIsNone(self.marks.prompt_segment(self.home))
+        with patch.object(os, 'getcwd', return_value=self.src):
+            self.assertEqual(self.marks.prompt_segment(), 'code')
+        self.assertEqual(self.marks.get_mark(self.marks.prompt_segment(os.path.join(self.src, 'lib'))),
+                         os.path.join(self.src, 'lib'))
+
+    def test_follows_moves(self):
+        """Test the path trie is kept current by updates and deletes."""
+        self.marks.where(self.src)
+        self.marks.del_mark('code')
+        self.marks.update_mark('src', self.home)
+        self.assertEqual(self.marks.prompt_segment(os.path.join(self.src, 'lib')), 'proj/src/lib')
+        self.assertEqual(self.marks.prompt_segment(self.home), 'src')
+
+    def run_main(self, *args):
+        with patch.object(sys, 'argv', ['dirmarks', *args]):
+            with patch('builtins.print') as mock_print, patch('sys.stderr') as mock_stderr:
+                main()
+        output = [str(call.args[0]) for call in mock_print.call_args_list]
+        errors = ''.join(str(call.args[0]) for call in mock_stderr.write.call_args_list)
+        return output, errors
+
+    def test_cli(self):
+        """Test --where lists the bookmarks and --prompt prints the segment."""
+        output, _ = self.run_main('--where', os.path.join(self.src, 'lib'))
+        self.assertEqual(output, [f"  code => {self.src}", f"  src => {self.src}"])
+        output, errors = self.run_main('--where', self.home)
+        self.assertEqual(output, [])
+        self.assertIn('No bookmark contains', errors)
+        self.assertEqual(self.run_main('--prompt', os.path.join(self.src, 'lib'))[0], ['code/lib'])
+        self.assertEqual(self.run_main('--prompt', self.home)[0], [])
+
+    def test_shell_cache_table(self):
+        """Test the reverse table keeps the first bookmark of a path and flags skipped paths."""
+        self.marks.emit_shell_cache()
+        with open(os.environ['DIRMARKS_SHELL_CACHE']) as f:
+            content = f.read()
+        self.assertIn(f"_DIRMARKS_WHERE[{self.src}]=code\n", content)
+        self.assertNotRegex(content, r'_DIRMARKS_WHERE\[[^]\n]*\]=src\n')
+        self.assertIn('_DIRMARKS_WHERE_COMPLETE=1', content)
+
+        self.marks.add_mark('sp', os.path.join(self.home, 'my dir'))
+        with open(os.environ['DIRMARKS_SHELL_CACHE']) as f:
+            self.assertIn('_DIRMARKS_WHERE_COMPLETE=0', f.read())
+
+    def test_old_cache_format_regenerated(self):
+        """Test a cache written in an older layout gets a new generation."""
+        with patch.object(marks_enhanced, 'SHELL_CACHE_FORMAT', 1):
+            old = self.marks._shell_cache_generation()
+        self.assertNotEqual(old, self.marks._shell_cache_generation())
+
+    @unittest.skipUnless(shutil.which('bash'), 'bash not available')
+    def test_bash_prompt_without_python(self):
+        """Test dir_prompt walks up from the cache with builtins only, and falls back otherwise."""
+        self.marks.emit_shell_cache()
+        script = f"""
+            dirmarks() {{ echo "call: $*"; }}
+            . '{FUNCTION_FILE}'
+            if [ "${{BASH_VERSINFO[0]}}" -lt 4 ]; then echo SKIP; exit 0; fi
+            dir_prompt '{os.path.join(self.src, 'lib')}'
+            dir_prompt '{self.proj}'
+            dir_prompt '{self.home}' || echo none
+        """
+        result = subprocess.run(['bash', '-c', script], capture_output=True, text=True)
+        if result.stdout.strip() == 'SKIP':
+            self.skipTest('bash without associative arrays')
+        self.assertEqual(result.stdout.splitlines(), ['code/lib', 'proj', 'none'])
+
+        self.marks.add_mark('sp', os.path.join(self.home, 'my dir'))
+        result = subprocess.run(['bash', '-c', script], capture_output=True, text=True)
+        self.assertEqual(result.stdout.splitlines()[0], f"call: --prompt {os.path.join(self.src, 'lib')}")
+
+
+if __name__ == '__main__':
+    unittest.main()